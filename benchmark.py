@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""Times conversions of generated PmWiki corpora; see lib/benchmark.py."""
+
+# Python
+import argparse
+import sys
+
+# Local
+from lib.benchmark import Benchmark, BenchmarkResults
+
+DEFAULT_CORPUS_SIZES = [10, 100, 1000]
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_CORPUS_SIZES,\
+	help="Number of pages of every corpus to benchmark. Default: {default}"\
+	.format(default=" ".join([str(size) for size in DEFAULT_CORPUS_SIZES])))
+
+parser.add_argument("--seed", type=int, default=0,\
+	help="Seed for the page generator. Default: 0")
+
+parser.add_argument("--page-size", type=int, default=4000,\
+	help="Approximate length of every generated page in characters. Default: 4000")
+
+parser.add_argument("--markup-density", type=float, default=0.15,\
+	help="Probability of a word getting markup, between 0 and 1. Default: 0.15")
+
+parser.add_argument("--repeat", type=int, default=3,\
+	help="How often to take every measurement; the fastest one counts. Default: 3")
+
+parser.add_argument("-j", "--jobs", type=int, default=1,\
+	help="--jobs for the file converter and the CLI. Default: 1")
+
+parser.add_argument("-o", "--output",\
+	help="Write the results to this JSON file.")
+
+parser.add_argument("--baseline",\
+	help="JSON results of an earlier run to compare with. Exits with status 1 on regressions.")
+
+parser.add_argument("--tolerance", type=float, default=0.1,\
+	help="How much slower than the baseline a measurement may be before it counts as "
+	"a regression, as a fraction. Default: 0.1")
+
+# Guarded, as processes of the conversion process pool might import this module.
+if __name__ == "__main__":
+	
+	args = parser.parse_args()
+	
+	results = Benchmark(corpusSizes=args.sizes,\
+		generatorOptions={"seed": args.seed, "pageSize": args.page_size, "markupDensity": args.markup_density},\
+		repeat=args.repeat,\
+		jobs=args.jobs).run()
+	
+	for name, result in sorted(results.results.items()):
+		print("{name:<24}{seconds:>10.4f}s{pagesPerSecond:>12.1f} pages/s".format(name=name, **result))
+	
+	if args.output:
+		results.save(args.output)
+	
+	if args.baseline:
+		comparison = results.compare(BenchmarkResults.load(args.baseline), tolerance=args.tolerance)
+		for name, entry in sorted(comparison.items()):
+			print("{name:<24}{ratio:>10.2f}x baseline{mark}".format(name=name, ratio=entry["ratio"],\
+				mark=" REGRESSION" if entry["regression"] else ""))
+		if any([entry["regression"] for entry in comparison.values()]):
+			sys.exit(1)
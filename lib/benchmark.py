@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+from pathlib import Path
+import json, os, platform, random, subprocess, sys, tempfile, time
+
+# Local
+from lib.pmwiki2md import AllConversions, Content
+from lib.converter import FileConverter, FilePairs
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+#==========================================================
+# Corpus
+#==========================================================
+
+class PmwikiPageGenerator(object):
+	
+	"""Generates PmWiki pages with random, but realistic markup.
+	
+	Takes:
+		- seed (int), default: 0
+			Seed of the random number generator; the same seed always
+			yields the same sequence of pages.
+		- pageSize (int), default: 4000
+			Approximate length of a page in characters.
+		- markupDensity (float), default: 0.15
+			Probability of a word getting inline markup (emphasis, links, ...).
+			The share of lists, titles, tables and pre-formatted blocks
+			among the blocks of a page grows with it as well."""
+	
+	WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit",\
+		"sed", "do", "eiusmod", "tempor", "incididunt", "ut", "labore", "et", "dolore",\
+		"magna", "aliqua", "wiki", "page", "Überschrift", "Kartensuche", "Protokoll"]
+	
+	INLINE_MARKUP = [("''", "''"), ("'''", "'''"), ("'''''", "'''''"), ("{+", "+}"), ("{-", "-}"),\
+		("[-", "-]"), ("[--", "--]"), ("[+", "+]"), ("[++", "++]"), ("'^", "^'"), ("'_", "_'"),\
+		("[@", "@]")]
+	
+	def __init__(self, seed=0, pageSize=4000, markupDensity=0.15):
+		self.random = random.Random(seed)
+		self.pageSize = pageSize
+		self.markupDensity = markupDensity
+	
+	def word(self):
+		return self.random.choice(self.__class__.WORDS)
+	
+	def url(self):
+		return "http://example.com/{a}/{b}".format(a=self.word(), b=self.random.randint(0, 9999))
+	
+	def link(self):
+		kind = self.random.random()
+		if kind < 0.3:
+			return "[[{address}]]".format(address=self.url())
+		elif kind < 0.6:
+			return "[[{address} | {name} {name2}]]".format(address=self.url(), name=self.word(), name2=self.word())
+		elif kind < 0.8:
+			return "%newwin%[[{address}]]%%".format(address=self.url())
+		else:
+			return "[[{page}]]".format(page=self.word().capitalize()+self.word().capitalize())
+	
+	def inline(self):
+		"""A word, with markup at the configured density."""
+		if self.random.random() >= self.markupDensity:
+			return self.word()
+		if self.random.random() < 0.25:
+			return self.link()
+		begin, end = self.random.choice(self.__class__.INLINE_MARKUP)
+		return "{begin}{text}{end}".format(begin=begin, end=end,\
+			text=" ".join([self.word() for i in range(0, self.random.randint(1, 3))]))
+	
+	def sentence(self):
+		return " ".join([self.inline() for i in range(0, self.random.randint(4, 16))])
+	
+	def paragraph(self):
+		lines = [self.sentence() for i in range(0, self.random.randint(1, 4))]
+		if self.random.random() < 0.3:
+			lines[0] = lines[0]+"\\\\"
+		return "\n".join(lines)
+	
+	def title(self):
+		return "!"*self.random.randint(1, 3)+" ".join([self.word() for i in range(0, 3)])
+	
+	def itemList(self):
+		"""Nested bullet and numbered list, occasionally mixing the two."""
+		indicator = self.random.choice(["*", "#"])
+		items = []
+		level = 1
+		for i in range(0, self.random.randint(2, 10)):
+			level = max(1, min(4, level+self.random.choice([-1, 0, 0, 1])))
+			itemIndicator = indicator if self.random.random() > 0.1 else self.random.choice(["*", "#"])
+			items.append(itemIndicator*level+self.random.choice(["", " "])+self.sentence())
+		return "\n".join(items)
+	
+	def preFormattedBlock(self):
+		return "[@\n{code}\n@]".format(code="\n".join(\
+			["    {a}({b}, ''{c}'');".format(a=self.word(), b=self.word(), c=self.word())\
+				for i in range(0, self.random.randint(1, 6))]))
+	
+	def table(self):
+		columns = self.random.randint(2, 5)
+		rows = ["||class=\"wikitable\"", "||"+"||".join(["!"+self.word() for i in range(0, columns)])+"||"]
+		for i in range(0, self.random.randint(1, 8)):
+			rows.append("||"+"||".join([self.inline() for i in range(0, columns)])+"||")
+		return "\n".join(rows)
+	
+	def block(self):
+		if self.random.random() >= self.markupDensity*2:
+			return self.paragraph()
+		return self.random.choice([self.title, self.itemList, self.preFormattedBlock, self.table])()
+	
+	def page(self):
+		blocks = []
+		length = 0
+		while length < self.pageSize:
+			block = self.block()
+			blocks.append(block)
+			length += len(block)+2
+		return "\n\n".join(blocks)+"\n"
+	
+	def pages(self, count):
+		return [self.page() for i in range(0, count)]
+
+class Corpus(object):
+	
+	"""Generated pages written to .pmwiki files in a directory.
+	
+	Takes:
+		- directory (Path || str): Where to write the pages to.
+		- pages ([str])"""
+	
+	SUFFIX = ".pmwiki"
+	
+	def __init__(self, directory, pages):
+		self.directory = Path(directory)
+		self.pages = pages
+	
+	@property
+	def size(self):
+		"""Total size of the pages in bytes, as UTF-8."""
+		return sum([len(page.encode("utf-8")) for page in self.pages])
+	
+	def write(self):
+		"""Write every page to its own file; returns self (chainable)."""
+		self.directory.mkdir(parents=True, exist_ok=True)
+		for index, page in enumerate(self.pages):
+			with open(str(Path(self.directory, "Page{index}{suffix}".format(index=index,\
+				suffix=self.__class__.SUFFIX))), "w", encoding="utf-8") as pageFile:
+				pageFile.write(page)
+		return self
+
+#==========================================================
+# Benchmarks
+#==========================================================
+
+class Benchmark(object):
+	
+	"""Times the conversion of generated corpora of several sizes.
+	
+	Takes:
+		- corpusSizes ([int]): Number of pages per corpus.
+		- generatorOptions ({}): Keyword arguments for PmwikiPageGenerator.
+		- repeat (int), default: 3
+			How often every measurement is taken; the fastest one counts.
+		- jobs (int), default: 1
+			--jobs for FileConverter and the CLI.
+	
+	Every corpus size gets three measurements:
+		- convert: AllConversions().convert on every page, in memory.
+		- fileConverter: FileConverter.convert from source to target directory.
+		- cli: pmwiki2md-cli.py in a new interpreter, end to end."""
+	
+	CLI_PATH = Path(Path(__file__).absolute().parent.parent, "pmwiki2md-cli.py")
+	
+	def __init__(self, corpusSizes, generatorOptions={}, repeat=3, jobs=1):
+		self.corpusSizes = corpusSizes
+		self.generatorOptions = generatorOptions
+		self.repeat = repeat
+		self.jobs = jobs
+	
+	def time(self, function):
+		"""Call function self.repeat times; returns the fastest run's duration in seconds."""
+		durations = []
+		for i in range(0, self.repeat):
+			start = time.perf_counter()
+			function()
+			durations.append(time.perf_counter()-start)
+		return min(durations)
+	
+	def timeConvert(self, corpus):
+		conversions = AllConversions()
+		def convert():
+			for page in corpus.pages:
+				conversions.convert(Content(page)).string
+		return self.time(convert)
+	
+	def timeFileConverter(self, corpus, targetDir):
+		def convert():
+			FileConverter(AllConversions, FilePairs(\
+				directoryPaths=FilePairs.DIRECTORY_PATHS(str(corpus.directory), str(targetDir)),\
+				suffixes=FilePairs.SUFFIXES("pmwiki", "md"), sourceEncoding="utf-8", targetEncoding="utf-8"),\
+				jobs=self.jobs).convert()
+		return self.time(convert)
+	
+	def timeCli(self, corpus, targetDir):
+		def convert():
+			subprocess.run([sys.executable, str(self.__class__.CLI_PATH), str(corpus.directory), str(targetDir),\
+				"--jobs", str(self.jobs), "--source-encoding", "utf-8", "--target-encoding", "utf-8"], check=True)
+		return self.time(convert)
+	
+	def run(self):
+		"""Run all measurements; returns BenchmarkResults."""
+		results = BenchmarkResults(meta={\
+			"python": platform.python_version(),\
+			"platform": platform.platform(),\
+			"generator": self.generatorOptions,\
+			"repeat": self.repeat,\
+			"jobs": self.jobs,\
+			"date": time.strftime("%Y-%m-%dT%H:%M:%S")})
+		with tempfile.TemporaryDirectory() as tempDir:
+			for corpusSize in self.corpusSizes:
+				corpus = Corpus(Path(tempDir, "pmwiki{size}".format(size=corpusSize)),\
+					PmwikiPageGenerator(**self.generatorOptions).pages(corpusSize)).write()
+				targetDir = Path(tempDir, "md{size}".format(size=corpusSize))
+				targetDir.mkdir()
+				results.add("convert", corpus, self.timeConvert(corpus))
+				results.add("fileConverter", corpus, self.timeFileConverter(corpus, targetDir))
+				results.add("cli", corpus, self.timeCli(corpus, targetDir))
+		return results
+
+class BenchmarkResults(object):
+	
+	"""Benchmark measurements, as JSON and compared to a baseline.
+	
+	Takes:
+		- meta ({}): Information about the environment and configuration.
+		- results ({}): Measurements by name; see .add."""
+	
+	def __init__(self, meta=None, results=None):
+		self.meta = meta if meta else {}
+		self.results = results if results else {}
+	
+	@classmethod
+	def load(cls, path):
+		with open(str(path), "r", encoding="utf-8") as resultsFile:
+			data = json.load(resultsFile)
+		return cls(data["meta"], data["results"])
+	
+	def save(self, path):
+		with open(str(path), "w", encoding="utf-8") as resultsFile:
+			json.dump(self.asDict, resultsFile, indent=2, sort_keys=True)
+	
+	@property
+	def asDict(self):
+		return {"meta": self.meta, "results": self.results}
+	
+	def add(self, name, corpus, seconds):
+		"""Record a measurement as "<name>/<pages>"."""
+		self.results["{name}/{pages}".format(name=name, pages=len(corpus.pages))] = {\
+			"seconds": seconds,\
+			"pages": len(corpus.pages),\
+			"bytes": corpus.size,\
+			"pagesPerSecond": len(corpus.pages)/seconds if seconds else None,\
+			"bytesPerSecond": corpus.size/seconds if seconds else None}
+	
+	def compare(self, baseline, tolerance=0.1):
+		
+		"""Compare with baseline BenchmarkResults.
+		Returns a dict with an entry per measurement found in both:
+		the ratio of this to the baseline's seconds, and whether that ratio
+		exceeds 1+tolerance, which counts as a regression."""
+		
+		comparison = {}
+		for name, result in self.results.items():
+			if name in baseline.results and baseline.results[name]["seconds"]:
+				ratio = result["seconds"]/baseline.results[name]["seconds"]
+				comparison[name] = {"ratio": ratio, "regression": ratio > 1+tolerance}
+		return comparison
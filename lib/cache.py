@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""Content-addressed cache of converted fragments of pages, for text repeated
+across pages, like navigation footers, templates and disclaimers.
+
+Pages are split into fragments at paragraph boundaries (see CachedPipeline),
+and every fragment is cached by the hash of its text and the fingerprint of
+the conversions, so nothing converted differently is ever reused."""
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+from collections import OrderedDict
+import hashlib, re, sqlite3, sys, threading
+
+# Local
+from lib.datatypes import Record
+from lib.pmwiki2md import SpanContent
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+class FragmentCacheStats(Record):
+	
+	"""How a FragmentCache fared.
+	Has:
+		- hits (int): Fragments found in memory or in the store.
+		- storeHits (int): Those of the hits found in the store only.
+		- misses (int): Fragments converted, as they weren't found.
+		- evictions (int): Fragments dropped from memory to stay within its size."""
+	
+	ATTRIBUTES = ["hits", "storeHits", "misses", "evictions"]
+	
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		for attribute in self.__class__.ATTRIBUTES:
+			if getattr(self, attribute) is None:
+				setattr(self, attribute, 0)
+	
+	@property
+	def hitRate(self):
+		"""Share of the fragments looked up that were hits, between 0 and 1."""
+		lookups = self.hits+self.misses
+		return self.hits/lookups if lookups else 0.0
+	
+	def add(self, other):
+		"""Add the counts of another FragmentCacheStats object to these."""
+		for attribute in self.__class__.ATTRIBUTES:
+			setattr(self, attribute, getattr(self, attribute)+getattr(other, attribute))
+		return self
+	
+	def __str__(self):
+		return "{hits} hits ({storeHits} from the store), {misses} misses, {evictions} evictions, "\
+			"{rate:.1%} hit rate".format(hits=self.hits, storeHits=self.storeHits, misses=self.misses,\
+			evictions=self.evictions, rate=self.hitRate)
+
+class FragmentCache(object):
+	
+	"""Converted fragments by key, least recently used ones evicted once they
+	take up more than maxBytes of memory, optionally backed by an SQLite store
+	that persists across runs.
+	
+	Pickling it (e.g. for a process pool) pickles its settings only, so every
+	process gets an empty cache of its own, sharing the store, if any.
+	Safe to use from several threads.
+	
+	Takes:
+		- maxBytes (None || int), default: None
+			Memory the cached fragments may take up, as told by sys.getsizeof;
+			MAX_BYTES if None.
+		- path (None || str), default: None
+			Path of the SQLite store; none is used if None.
+	Has:
+		- stats (FragmentCacheStats)
+		- size (int): Memory the cached fragments take up."""
+	
+	MAX_BYTES = 64<<20
+	# How long to wait for other processes writing to the store, in seconds.
+	STORE_TIMEOUT = 30
+	
+	def __init__(self, maxBytes=None, path=None):
+		self.maxBytes = maxBytes if maxBytes else self.__class__.MAX_BYTES
+		self.path = path
+		self.entries = OrderedDict()
+		self.size = 0
+		self.stats = FragmentCacheStats()
+		self.lock = threading.Lock()
+		self.store = None
+		if path is not None:
+			self.store = sqlite3.connect(path, timeout=self.__class__.STORE_TIMEOUT, check_same_thread=False)
+			self.store.execute("PRAGMA journal_mode=WAL")
+			self.store.execute("CREATE TABLE IF NOT EXISTS fragments (key BLOB PRIMARY KEY, converted TEXT NOT NULL)")
+			self.store.commit()
+	
+	def __reduce__(self):
+		return (self.__class__, (self.maxBytes, self.path))
+	
+	def close(self):
+		if self.store is not None:
+			self.store.close()
+			self.store = None
+	
+	@staticmethod
+	def entrySize(key, converted):
+		return sys.getsizeof(key)+sys.getsizeof(converted)
+	
+	def get(self, keys):
+		"""Return a list of the converted fragments of the specified keys (bytes), None where missing."""
+		with self.lock:
+			found = []
+			missing = []
+			for index, key in enumerate(keys):
+				converted = self.entries.get(key)
+				if converted is None:
+					missing.append(index)
+				else:
+					self.entries.move_to_end(key)
+				found.append(converted)
+			if missing and self.store is not None:
+				stored = {}
+				missingKeys = [keys[index] for index in missing]
+				# Within SQLite's limit of variables per statement.
+				for start in range(0, len(missingKeys), 500):
+					someKeys = missingKeys[start:start+500]
+					stored.update(self.store.execute("SELECT key, converted FROM fragments WHERE key IN ({marks})"\
+						.format(marks=", ".join(["?"]*len(someKeys))), someKeys).fetchall())
+				for index in missing:
+					converted = stored.get(keys[index])
+					if converted is not None:
+						found[index] = converted
+						self.stats.storeHits += 1
+						self.remember(keys[index], converted)
+			misses = found.count(None)
+			self.stats.misses += misses
+			self.stats.hits += len(keys)-misses
+			return found
+	
+	def put(self, items):
+		"""Cache the specified (key, converted fragment) tuples."""
+		with self.lock:
+			for key, converted in items:
+				self.remember(key, converted)
+			if self.store is not None and items:
+				with self.store:
+					self.store.executemany("INSERT OR REPLACE INTO fragments (key, converted) VALUES (?, ?)", items)
+	
+	def remember(self, key, converted):
+		"""Keep a fragment in memory, evicting the least recently used ones if it's full."""
+		size = self.__class__.entrySize(key, converted)
+		if size > self.maxBytes:
+			return
+		if key in self.entries:
+			self.size -= self.__class__.entrySize(key, self.entries.pop(key))
+		self.entries[key] = converted
+		self.size += size
+		while self.size > self.maxBytes:
+			evictedKey, evicted = self.entries.popitem(last=False)
+			self.size -= self.__class__.entrySize(evictedKey, evicted)
+			self.stats.evictions += 1
+	
+	def addStats(self, stats):
+		"""Add FragmentCacheStats, e.g. of the cache of another process, to these."""
+		with self.lock:
+			self.stats.add(stats)
+	
+	def takeStats(self):
+		"""Return the stats so far and start counting anew, e.g. to add them up across processes."""
+		with self.lock:
+			stats = self.stats
+			self.stats = FragmentCacheStats()
+			return stats
+
+class FragmentSplitter(object):
+	
+	"""Splits page texts into fragments which convert alone as they do in the page.
+	
+	A page is split after every run of blank lines, unless a region which may
+	span lines (see ConversionPipeline.spanningDelimiters), e.g. "[@" to "@]",
+	is left open at that point; then the fragment goes on to the next boundary.
+	As no token reaches from one fragment into the next, converting them one by
+	one yields what converting the whole page does.
+	Where a fragment ends only depends on the text from its beginning up to and
+	including the character after its end.
+	
+	Only pages converted by single pass pipelines are split; for other
+	pipelines, the whole page is a single fragment.
+	
+	Takes:
+		- pipeline (ConversionPipeline)"""
+	
+	PARAGRAPH_END = re.compile("\n\n+")
+	
+	def __init__(self, pipeline):
+		self.pipeline = pipeline
+	
+	def isClosed(self, text, start, end):
+		"""Whether no region which may span lines is left open at end in text[start:end]."""
+		for begin, regionEnd in self.pipeline.spanningDelimiters:
+			lastBegin = text.rfind(begin, start, end)
+			# If the last BEGIN has an END after it, so have all before it.
+			if lastBegin != -1 and text.find(regionEnd, lastBegin+len(begin), end) == -1:
+				return False
+		return True
+	
+	def ends(self, text, start=0):
+		"""Yield where the fragments of text end, but the last, from a fragment beginning at start on."""
+		if self.pipeline.engine is None:
+			return
+		for match in self.__class__.PARAGRAPH_END.finditer(text, start):
+			end = match.end()
+			if end == len(text):
+				return
+			if self.isClosed(text, start, end):
+				yield end
+				start = end
+	
+	def split(self, text):
+		"""Split a page text into fragments; returns a list of them."""
+		fragments = []
+		start = 0
+		for end in self.ends(text):
+			fragments.append(text[start:end])
+			start = end
+		fragments.append(text[start:])
+		return fragments
+
+class CachedPipeline(object):
+	
+	"""ConversionPipeline converting pages fragment by fragment (see FragmentSplitter),
+	reusing fragments converted before from a FragmentCache. Usable wherever the
+	pipeline is. Fragments not in the cache are converted all at once (see
+	ConversionPipeline.convertMany).
+	
+	Only single pass pipelines are converted by fragments; other pipelines,
+	converting with a profile, and converting chunks are left to the pipeline.
+	
+	Takes:
+		- pipeline (ConversionPipeline)
+		- cache (FragmentCache)"""
+	
+	def __init__(self, pipeline, cache):
+		self.pipeline = pipeline
+		self.cache = cache
+		self.splitter = FragmentSplitter(pipeline)
+		self.keyHash = hashlib.blake2b(pipeline.fingerprint.encode("utf-8"), digest_size=16)
+	
+	def __getattr__(self, name):
+		return getattr(self.pipeline, name)
+	
+	def split(self, text):
+		return self.splitter.split(text)
+	
+	def key(self, fragment):
+		keyHash = self.keyHash.copy()
+		keyHash.update(fragment.encode("utf-8"))
+		return keyHash.digest()
+	
+	def convertTexts(self, texts):
+		"""Convert page texts (str); returns a list of the converted texts."""
+		fragments = []
+		counts = []
+		for text in texts:
+			pageFragments = self.split(text)
+			fragments.extend(pageFragments)
+			counts.append(len(pageFragments))
+		keys = [self.key(fragment) for fragment in fragments]
+		converted = self.cache.get(keys)
+		missing = {key: fragment for key, fragment, fragmentConverted in zip(keys, fragments, converted)\
+			if fragmentConverted is None}
+		if missing:
+			convertedMissing = dict(zip(missing.keys(), self.pipeline.convertMany(list(missing.values()))))
+			self.cache.put(list(convertedMissing.items()))
+			converted = [fragmentConverted if fragmentConverted is not None else convertedMissing[key]\
+				for key, fragmentConverted in zip(keys, converted)]
+		results = []
+		position = 0
+		for count in counts:
+			results.append("".join(converted[position:position+count]))
+			position += count
+		return results
+	
+	def convert(self, content, profile=None):
+		"""Convert the content; see ConversionPipeline.convert."""
+		if self.pipeline.engine is None or profile is not None or len(content) != 1\
+			or not content[0].availableForConversion:
+			return self.pipeline.convert(content, profile)
+		return SpanContent(self.convertTexts([content.string])[0])
+	
+	def convertMany(self, texts, profile=None):
+		"""Convert many page texts (str) at once; see ConversionPipeline.convertMany."""
+		if self.pipeline.engine is None or profile is not None:
+			return self.pipeline.convertMany(texts, profile)
+		return self.convertTexts(list(texts))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""Client of a conversion daemon (see lib/daemon.py).
+
+Only uses the standard library, so a client starts without importing the
+conversions the daemon keeps warm.
+
+The protocol is JSON lines over a Unix domain socket: A client sends one JSON
+object per line and gets one JSON object per line back, in order. Requests:
+	- {"text": "..."}: Convert page text. Reply: {"markdown": "..."}
+	- {"source": "/path"}: Convert a file. Reply: {"markdown": "..."}
+	- {"source": "/path", "target": "/path"}: Convert a file to a file, written by
+	  the daemon. Reply: {"target": "/path"}
+	- {"command": "ping"}: Reply: {"pong": true}
+	- {"command": "shutdown"}: Stop the daemon. Reply: {"shutdown": true}
+Files may be read with an "encoding", and "pageFile": true has a source read as
+a page file of a PmWiki page store (wiki.d). Paths are relative to the daemon's
+working directory, so better absolute. An "id" of a request is sent back with
+its reply. A request that fails is replied to with {"error": "..."}."""
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+import json, os, socket
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+SOCKET_VARIABLE = "PMWIKI2MD_SOCKET"
+
+def defaultSocketPath():
+	"""Path of the socket: $PMWIKI2MD_SOCKET, else pmwiki2md.sock in $XDG_RUNTIME_DIR,
+	else a socket of the user in the temporary directory."""
+	if os.environ.get(SOCKET_VARIABLE):
+		return os.environ[SOCKET_VARIABLE]
+	if os.environ.get("XDG_RUNTIME_DIR"):
+		return os.path.join(os.environ["XDG_RUNTIME_DIR"], "pmwiki2md.sock")
+	return "/tmp/pmwiki2md-{uid}.sock".format(uid=os.getuid())
+
+class DaemonError(Exception): pass
+
+class ConversionClient(object):
+	
+	"""Connection to a conversion daemon; sends requests one at a time.
+	Usable as a context manager, which closes the connection.
+	
+	Takes:
+		- socketPath (None || str), default: None
+			Path of the daemon's socket; defaultSocketPath() if None."""
+	
+	def __init__(self, socketPath=None):
+		self.socketPath = socketPath if socketPath is not None else defaultSocketPath()
+		self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.socket.connect(self.socketPath)
+		self.replies = self.socket.makefile("rb")
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, *exception):
+		self.close()
+	
+	def close(self):
+		self.replies.close()
+		self.socket.close()
+	
+	def request(self, request):
+		"""Send a request (dict) and return its reply (dict),
+		raising a DaemonError if the daemon replied with an error."""
+		self.socket.sendall(json.dumps(request).encode("utf-8")+b"\n")
+		line = self.replies.readline()
+		if not line:
+			raise DaemonError("The daemon closed the connection.")
+		reply = json.loads(line.decode("utf-8"))
+		if "error" in reply:
+			raise DaemonError(reply["error"])
+		return reply
+	
+	def ping(self):
+		return self.request({"command": "ping"})["pong"]
+	
+	def shutdown(self):
+		return self.request({"command": "shutdown"})["shutdown"]
+	
+	def convert(self, text):
+		"""Return the Markdown of the specified page text."""
+		return self.request({"text": text})["markdown"]
+	
+	def convertFile(self, source, target=None, encoding=None, pageFile=False):
+		"""Convert a file. Returns its Markdown if no target is specified,
+		otherwise the daemon writes it to the target, and the target is returned."""
+		request = {"source": os.path.abspath(source)}
+		if target is not None:
+			request["target"] = os.path.abspath(target)
+		if encoding is not None:
+			request["encoding"] = encoding
+		if pageFile:
+			request["pageFile"] = True
+		reply = self.request(request)
+		return reply["target"] if target is not None else reply["markdown"]
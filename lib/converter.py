@@ -6,20 +6,40 @@
 
 # Python
 from pathlib import Path
-from collections import UserList
+from collections import UserList, deque
 from typing import NamedTuple
-from lib.pmwiki2md import Content
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import unquote_to_bytes
+import asyncio, fnmatch, hashlib, json, os, re
+from lib.pmwiki2md import SpanContent, ConversionProfile
 
 # Local
-from lib.datatypes import NamedList
+from lib.datatypes import Record
+from lib.cache import CachedPipeline
 
 # Debugging
-import sys
+from lib.debugging import getLogger
+
+log = getLogger(__name__)
 
 #=======================================================================================
 # Library
 #=======================================================================================
 
+class FileConversionError(Exception):
+	
+	"""Raised once all files are done if any of them failed to convert.
+	Has:
+		- failures ([(FilePair, str)]): Failed pairs with their error message."""
+	
+	def __init__(self, failures):
+		self.failures = failures
+		super().__init__("{count} file(s) failed to convert:\n{list}".format(\
+			count=len(failures),\
+			list="\n".join(["{path}: {error}".format(path=pair.source.path, error=error)\
+				for pair, error in failures])))
+
 class File(object):
 	
 	"""Text file handler with content cache.
@@ -29,6 +49,9 @@ class File(object):
 	
 	Takes:
 		path (Path)
+		dirEntry (None || os.DirEntry), default: None
+			The entry the file was found as, if any; its stat result
+			is reused instead of asking the file system again.
 	Has:
 		- path (Path)
 			pathlib.Path object from specified path.
@@ -38,11 +61,19 @@ class File(object):
 			Is initialized with the file's content every time
 			.content is called AND this is found to be None."""
 	
-	def __init__(self, pathObj, ignoreCodecReadErrors=False, encoding=None):
+	def __init__(self, pathObj, ignoreCodecReadErrors=False, encoding=None, dirEntry=None):
 		self.path = pathObj
 		self.ignoreCodecReadErrors = ignoreCodecReadErrors
 		self._encoding = encoding
 		self._cachedContent = None
+		self._dirEntry = dirEntry
+		self._stat = None
+	
+	def __getstate__(self):
+		# DirEntry objects can't be pickled, e.g. for a process pool.
+		state = dict(self.__dict__)
+		state["_dirEntry"] = None
+		return state
 		
 	@property
 	def exists(self):
@@ -50,8 +81,20 @@ class File(object):
 		
 	@property
 	def isDirectory(self):
+		if self._dirEntry is not None:
+			return self._dirEntry.is_dir()
 		return self.path.is_dir()
 	
+	@property
+	def stat(self):
+		"""os.stat_result of the file, from the first time it was asked for."""
+		if self._stat is None:
+			if self._dirEntry is not None:
+				self._stat = self._dirEntry.stat()
+			else:
+				self._stat = self.path.stat()
+		return self._stat
+	
 	@property
 	def parentDir(self):
 		return self.path.parent
@@ -82,6 +125,10 @@ class File(object):
 			self._cachedContent = self.read()
 		return self._cachedContent
 	
+	def clearCache(self):
+		"""Drop the cached content, e.g. once it's no longer needed."""
+		self._cachedContent = None
+	
 	def read(self):
 		
 		# Configure handling of encoding related errors while reading.
@@ -94,6 +141,31 @@ class File(object):
 		with open(str(self.path), "r", errors=errorHandler, encoding=self.encoding) as fileObj:
 			return fileObj.read()
 		
+	def readChunks(self, chunkSize):
+		
+		"""Read the file as a sequence of strings of up to chunkSize characters.
+		Bypasses the content cache."""
+		
+		if self.ignoreCodecReadErrors:
+			errorHandler="ignore"
+		else:
+			errorHandler = None
+		with open(str(self.path), "r", errors=errorHandler, encoding=self.encoding) as fileObj:
+			while True:
+				chunk = fileObj.read(chunkSize)
+				if not chunk:
+					break
+				yield chunk
+	
+	def writeChunks(self, chunks):
+		
+		"""Write the specified sequence of strings one by one and reset content cache."""
+		
+		with open(str(self.path), "w", encoding=self.encoding) as fileObj:
+			self._cachedContent = None
+			for chunk in chunks:
+				fileObj.write(chunk)
+	
 	def write(self, content):
 		
 		"""Write specified content and reset content cache."""
@@ -102,12 +174,223 @@ class File(object):
 			self._cachedContent = None
 			return fileObj.write(content)
 		
+class PmwikiPageFile(File):
+	
+	"""Page file of a PmWiki page store (wiki.d), read as the page's current text.
+	
+	A page file is a record of key=value lines, the first being "version=",
+	and the revision history in lines whose keys have a colon, e.g.
+	"diff:1700000000:1690000000:=". Reading the text only keeps the
+	lines without a colon; if the page file says it's "ordered=1", the
+	history comes last and isn't even read.
+	
+	If the page file is "urlencoded=1", values are URL encoded (PmWiki encodes
+	"%", newlines and "<"); otherwise, newlines are replaced by the value of
+	the "newline=" line, if any. The text is decoded with the "charset=" of
+	the page file, falling back to the encoding the File was made with,
+	and finally to UTF-8.
+	
+	Page files are conversion sources only; writing one raises TypeError."""
+	
+	DEFAULT_CHARSET = "utf-8"
+	# The escapes PmWiki writes; anything else needs general URL decoding.
+	PMWIKI_ESCAPES = [(b"%0a", b"\n"), (b"%3c", b"<"), (b"%25", b"%")]
+	OTHER_ESCAPE = re.compile(b"%(?!0a|3c|25)[0-9a-fA-F]{2}")
+	
+	def readRecord(self):
+		
+		"""Read the page file's keys and values, without the history, as bytes.
+		Values are returned as they are in the file, i.e. not unescaped."""
+		
+		record = {}
+		ordered = False
+		with open(str(self.path), "rb") as fileObj:
+			for line in fileObj:
+				key, separator, value = line.rstrip(b"\r\n").partition(b"=")
+				if not separator:
+					continue
+				if b":" in key:
+					if ordered:
+						break
+					continue
+				if key == b"version":
+					ordered = b"ordered=1" in value
+				record[key] = value
+		return record
+	
+	@classmethod
+	def unescape(cls, value, urlencoded=True, newline=None):
+		"""Unescape a value of a page file (bytes) as PmWiki would; see the class docstring."""
+		if urlencoded:
+			if not b"%" in value:
+				return value
+			if cls.OTHER_ESCAPE.search(value) is None:
+				# Sequentially is fine, as only the last replacement produces "%".
+				for escape, character in cls.PMWIKI_ESCAPES:
+					value = value.replace(escape, character)
+				return value
+			return unquote_to_bytes(value)
+		if newline:
+			return value.replace(newline, b"\n")
+		return value
+	
+	#OVERRIDE
+	def read(self):
+		record = self.readRecord()
+		version = record.get(b"version", b"")
+		text = self.__class__.unescape(record.get(b"text", b""), urlencoded=b"urlencoded=1" in version,\
+			newline=record.get(b"newline"))
+		charset = record.get(b"charset", b"").decode("ascii", "ignore")
+		if not charset:
+			charset = self.encoding if self.encoding else self.__class__.DEFAULT_CHARSET
+		return text.decode(charset, "ignore" if self.ignoreCodecReadErrors else "strict")
+	
+	#OVERRIDE
+	def readChunks(self, chunkSize):
+		# The text is a single line of the page file, so it's read as a whole anyway.
+		text = self.read()
+		for start in range(0, len(text), chunkSize):
+			yield text[start:start+chunkSize]
+	
+	def refuseWriting(self):
+		raise TypeError("{path} is a wiki.d page file, which is a conversion source only;"\
+			" converted pages are written to a File.".format(path=self.path))
+	
+	#OVERRIDE
+	def write(self, content):
+		self.refuseWriting()
+	
+	#OVERRIDE
+	def writeChunks(self, chunks):
+		self.refuseWriting()
+
+class SourceHash(object):
+	
+	"""Hash of a source file's text as recorded by Manifest, computed incrementally.
+	Feeding text in chunks yields the same hash as feeding it all at once."""
+	
+	def __init__(self):
+		self._hash = hashlib.sha256()
+	
+	@classmethod
+	def of(cls, chunks):
+		"""Return the hex digest for the specified sequence of strings."""
+		sourceHash = cls()
+		for chunk in chunks:
+			sourceHash.update(chunk)
+		return sourceHash.hexdigest
+	
+	def update(self, text):
+		self._hash.update(text.encode("utf-8", "surrogatepass"))
+	
+	def updating(self, chunks):
+		"""Pass the specified sequence of strings through, updating the hash with each."""
+		for chunk in chunks:
+			self.update(chunk)
+			yield chunk
+	
+	@property
+	def hexdigest(self):
+		return self._hash.hexdigest()
+
+class Manifest(object):
+	
+	"""Record of converted files for incremental conversion.
+	
+	Kept as a JSON file, typically in the target directory (see .fromDirectory).
+	For every converted source file it records its size, modification time,
+	content hash and target path, and for all of them the fingerprint of
+	the Conversions they were converted with.
+	
+	Takes:
+		path (Path || str): Path of the manifest file; it's fine if it doesn't exist yet."""
+	
+	FILE_NAME = ".pmwiki2md-manifest.json"
+	VERSION = 1
+	HASH_CHUNK_SIZE = 1<<20
+	
+	def __init__(self, path):
+		self.path = Path(path)
+		self.fingerprint = None
+		self.entries = {}
+		if self.path.exists():
+			self.load()
+	
+	@classmethod
+	def fromDirectory(cls, directory):
+		return cls(Path(directory, cls.FILE_NAME))
+	
+	@staticmethod
+	def hash(text):
+		return SourceHash.of([text])
+	
+	def load(self):
+		with open(str(self.path), "r", encoding="utf-8") as manifestFile:
+			manifest = json.load(manifestFile)
+		if manifest.get("version") == self.__class__.VERSION:
+			self.fingerprint = manifest["fingerprint"]
+			self.entries = manifest["files"]
+	
+	def save(self):
+		"""Write the manifest, replacing the previous one only once it's complete."""
+		temporaryPath = Path(str(self.path)+".tmp")
+		with open(str(temporaryPath), "w", encoding="utf-8") as manifestFile:
+			json.dump({"version": self.__class__.VERSION, "fingerprint": self.fingerprint,\
+				"files": self.entries}, manifestFile, indent=0, sort_keys=True)
+		os.replace(str(temporaryPath), str(self.path))
+	
+	def setFingerprint(self, fingerprint):
+		"""Set the fingerprint of the Conversions in use; if it changed, all entries are dropped."""
+		if not fingerprint == self.fingerprint:
+			self.entries = {}
+			self.fingerprint = fingerprint
+	
+	def isCurrent(self, pair):
+		
+		"""Is the pair's target up to date with its source?
+		
+		Size and modification time are compared first; only if they differ
+		is the source read, in chunks, to compare its hash.
+		If the hash didn't change after all, the entry gets the new stats."""
+		
+		entry = self.entries.get(str(pair.source.path))
+		if entry is None or not entry["target"] == str(pair.target.path) or not pair.target.exists:
+			return False
+		stat = pair.source.stat
+		if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+			return True
+		if entry["hash"] == SourceHash.of(pair.source.readChunks(self.__class__.HASH_CHUNK_SIZE)):
+			entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime_ns
+			return True
+		return False
+	
+	def record(self, pair, sourceHash):
+		"""Record the pair as converted from a source with the specified hash."""
+		stat = pair.source.stat
+		self.entries[str(pair.source.path)] = {"size": stat.st_size, "mtime": stat.st_mtime_ns,\
+			"hash": sourceHash, "target": str(pair.target.path)}
+	
+	def removeMissing(self, sources):
+		"""Drop entries of sources not among the specified set of source paths (str)
+		and delete their targets. Returns the list of removed source paths."""
+		removed = [source for source in self.entries if not source in sources]
+		for source in removed:
+			targetPath = Path(self.entries.pop(source)["target"])
+			if targetPath.exists():
+				targetPath.unlink()
+		return removed
+
 class FilePair(object):
 	
+	"""Source and target File of a conversion.
+	The source is of sourceClass, e.g. PmwikiPageFile for pages of a wiki.d directory."""
+	
 	def __init__(self, sourcePathObj, targetPathObj, ignoreCodecReadErrors=False,\
-		sourceEncoding=None, targetEncoding=None):
-		self.source = File(sourcePathObj, ignoreCodecReadErrors=ignoreCodecReadErrors,\
-			encoding=sourceEncoding)
+		sourceEncoding=None, targetEncoding=None, sourceDirEntry=None, sourceClass=None):
+		if sourceClass is None:
+			sourceClass = File
+		self.source = sourceClass(sourcePathObj, ignoreCodecReadErrors=ignoreCodecReadErrors,\
+			encoding=sourceEncoding, dirEntry=sourceDirEntry)
 		self.target = File(targetPathObj, ignoreCodecReadErrors=ignoreCodecReadErrors,\
 			encoding=targetEncoding)
 		
@@ -127,15 +410,15 @@ class FilePairs(UserList):
 			If non-empty, target will serve as a suffix to add to all
 			target files."""
 			
-	class DIRECTORY_PATHS(NamedList):
+	class DIRECTORY_PATHS(Record):
 		"""Source and target paths as strings."""
 		ATTRIBUTES = ["source", "target"]
 		
-	class DIRECTORIES(NamedList):
+	class DIRECTORIES(Record):
 		"""Source and target paths as pathlib.PATH objects."""
 		ATTRIBUTES = ["source", "target"]
 		
-	class SUFFIXES(NamedList):
+	class SUFFIXES(Record):
 		"""Source and target file name suffixes as strings."""
 		ATTRIBUTES = ["source", "target"]
 		
@@ -177,7 +460,8 @@ class FilePairs(UserList):
 				return True
 		return False
 		
-	def dottedSuffix(self, suffix):
+	@staticmethod
+	def dottedSuffix(suffix):
 		"""Always return the input with a dot prefixed.
 		If it already has one, nothing changes."""
 		if len(suffix) > 0:
@@ -217,21 +501,783 @@ class FilePairs(UserList):
 		
 		return filePairs
 	
+class PathFilter(object):
+	
+	"""Include and exclude glob patterns for paths relative to a source directory.
+	
+	Patterns are matched against the whole relative path, with "/" as separator,
+	using fnmatch; "*" matches "/" as well, so "Main/*" matches everything below Main.
+	
+	Takes:
+		- include ([str]), default: None
+			If specified, only files matching at least one of these are eligible.
+		- exclude ([str]), default: None
+			Files matching any of these aren't eligible, and directories matching
+			any of these aren't descended into."""
+	
+	def __init__(self, include=None, exclude=None):
+		self.include = self.compile(include)
+		self.exclude = self.compile(exclude)
+	
+	@staticmethod
+	def compile(patterns):
+		"""Compile a list of glob patterns into a single regular expression, or None if there are none."""
+		if not patterns:
+			return None
+		return re.compile("|".join(["(?:{pattern})".format(pattern=fnmatch.translate(pattern))\
+			for pattern in patterns]))
+	
+	def isExcluded(self, relativePath):
+		return self.exclude is not None and self.exclude.match(relativePath) is not None
+	
+	def isEligible(self, relativePath):
+		if self.include is not None and self.include.match(relativePath) is None:
+			return False
+		return not self.isExcluded(relativePath)
+
+class FilePairWalk(object):
+	
+	"""File pairs discovered lazily, while iterating, using os.scandir.
+	
+	Unlike FilePairs, nothing is discovered up front; every iteration walks
+	the source directory anew and yields pairs as it finds them, so conversion
+	can start right away on large trees. Source files aren't opened or
+	stat'ed to be found; the DirEntry of every source file is handed to its File.
+	
+	Takes the same as FilePairs, except pairs, and:
+		- recursive (bool), default: True
+			Descend into subdirectories. The target of a source file in a
+			subdirectory goes to the same subdirectory of the target directory,
+			which gets created once, with the first pair found in it.
+		- include ([str]), default: None
+		- exclude ([str]), default: None
+			Glob patterns; see PathFilter. Applied before the pairs are made.
+	
+	Subdirectories are walked depth first, after the files of their parent,
+	and the entries of every directory in order of their names.
+	Symbolic links to directories aren't followed."""
+	
+	def __init__(self, directoryPaths, suffixes=None, ignoreCodecReadErrors=False,\
+		sourceEncoding=None, targetEncoding=None, recursive=True, include=None, exclude=None):
+		self.suffixes = suffixes
+		self.ignoreCodecReadErrors = ignoreCodecReadErrors
+		self.sourceEncoding = sourceEncoding
+		self.targetEncoding = targetEncoding
+		self.recursive = recursive
+		self.pathFilter = PathFilter(include, exclude)
+		self.directories = FilePairs.DIRECTORIES(\
+			source=Path(directoryPaths.source),\
+			target=Path(directoryPaths.target))
+	
+	def __iter__(self):
+		return self.walk()
+	
+	def walk(self):
+		
+		"""Yield a FilePair for every eligible source file."""
+		
+		sourceSuffix = None
+		targetSuffix = ""
+		if self.suffixes:
+			if self.suffixes.source:
+				sourceSuffix = FilePairs.dottedSuffix(self.suffixes.source)
+			if self.suffixes.target:
+				targetSuffix = FilePairs.dottedSuffix(self.suffixes.target)
+		sourceRoot = str(self.directories.source)
+		targetRoot = str(self.directories.target)
+		
+		pending = [""]
+		while pending:
+			relativeDir = pending.pop()
+			with os.scandir(os.path.join(sourceRoot, relativeDir)) as entries:
+				entries = sorted(entries, key=lambda entry: entry.name)
+			
+			subDirs = []
+			targetDir = None
+			for entry in entries:
+				relativePath = relativeDir+"/"+entry.name if relativeDir else entry.name
+				
+				if entry.is_dir(follow_symlinks=False):
+					if self.recursive and not self.pathFilter.isExcluded(relativePath):
+						subDirs.append(relativePath)
+					continue
+				
+				stem, suffix = os.path.splitext(entry.name)
+				if sourceSuffix is not None and not suffix == sourceSuffix:
+					continue
+				if not self.pathFilter.isEligible(relativePath) or not entry.is_file():
+					continue
+				
+				if targetDir is None:
+					targetDir = os.path.join(targetRoot, relativeDir)
+					os.makedirs(targetDir, exist_ok=True)
+				
+				yield FilePair(Path(entry.path), Path(targetDir, stem+targetSuffix),\
+					ignoreCodecReadErrors=self.ignoreCodecReadErrors,\
+					sourceEncoding=self.sourceEncoding, targetEncoding=self.targetEncoding,\
+					sourceDirEntry=entry)
+			
+			# Reversed, so the first one is walked next.
+			pending.extend(reversed(subDirs))
+
+class PageStorePairs(object):
+	
+	"""File pairs for the pages of a PmWiki page store (wiki.d), found lazily
+	like FilePairWalk; sources are PmwikiPageFile objects.
+	
+	Files whose name isn't a page name ("Group.Page") are skipped, such as
+	".flock", ".pageindex" or deleted pages ("Group.Page,del-1700000000").
+	
+	Takes:
+		- directoryPaths (FilePairs.DIRECTORY_PATHS)
+			Page store directory and target directory.
+		- targetSuffix (str), default: "md"
+			Suffix to add to the page names for the target files.
+		- groupDirectories (bool), default: False
+			Write every group's pages to a directory of that name,
+			e.g. "Main/HomePage.md" instead of "Main.HomePage.md".
+			Target directories get created once, with their first page.
+		- include ([str]), default: None
+		- exclude ([str]), default: None
+			Glob patterns for page names; see PathFilter.
+		- ignoreCodecReadErrors (bool), default: False
+		- sourceEncoding (None || str), default: None
+			Charset of pages which don't specify one; see PmwikiPageFile.
+		- targetEncoding (None || str), default: None"""
+	
+	PAGE_NAME = re.compile("^[^.,]+\\.[^.,]+$")
+	
+	def __init__(self, directoryPaths, targetSuffix="md", groupDirectories=False, include=None, exclude=None,\
+		ignoreCodecReadErrors=False, sourceEncoding=None, targetEncoding=None):
+		self.directories = FilePairs.DIRECTORIES(\
+			source=Path(directoryPaths.source),\
+			target=Path(directoryPaths.target))
+		self.targetSuffix = FilePairs.dottedSuffix(targetSuffix) if targetSuffix else ""
+		self.groupDirectories = groupDirectories
+		self.pathFilter = PathFilter(include, exclude)
+		self.ignoreCodecReadErrors = ignoreCodecReadErrors
+		self.sourceEncoding = sourceEncoding
+		self.targetEncoding = targetEncoding
+	
+	def __iter__(self):
+		return self.walk()
+	
+	def walk(self):
+		
+		"""Yield a FilePair for every page."""
+		
+		with os.scandir(str(self.directories.source)) as entries:
+			entries = sorted(entries, key=lambda entry: entry.name)
+		createdDirs = set()
+		for entry in entries:
+			if self.__class__.PAGE_NAME.match(entry.name) is None or not self.pathFilter.isEligible(entry.name)\
+				or not entry.is_file():
+				continue
+			if self.groupDirectories:
+				group, page = entry.name.split(".")
+				targetPath = Path(self.directories.target, group, page+self.targetSuffix)
+			else:
+				targetPath = Path(self.directories.target, entry.name+self.targetSuffix)
+			if not targetPath.parent in createdDirs:
+				os.makedirs(str(targetPath.parent), exist_ok=True)
+				createdDirs.add(targetPath.parent)
+			yield FilePair(Path(entry.path), targetPath, ignoreCodecReadErrors=self.ignoreCodecReadErrors,\
+				sourceEncoding=self.sourceEncoding, targetEncoding=self.targetEncoding,\
+				sourceDirEntry=entry, sourceClass=PmwikiPageFile)
+
+class ConversionReport(object):
+	
+	"""ConversionProfile objects of the files converted by a FileConverter.
+	Has:
+		- files ({str: ConversionProfile}): Profile of every file, by source path.
+		- total (ConversionProfile): The profiles of all files added up."""
+	
+	def __init__(self):
+		self.files = {}
+		self.total = ConversionProfile()
+	
+	def add(self, pair, profile):
+		self.files[str(pair.source.path)] = profile
+		self.total.merge(profile)
+	
+	@property
+	def asDict(self):
+		return {\
+			"total": self.total.asDict,\
+			"files": {path: profile.asDict for path, profile in self.files.items()}}
+	
+	def save(self, path):
+		with open(str(path), "w", encoding="utf-8") as reportFile:
+			json.dump(self.asDict, reportFile, indent=2, sort_keys=True)
+
 class FileConverter(object):
 	
 	"""Converts files using a collection of conversions.
 	Takes:
 		conversions (Conversions)
-			Conversions object configured with the Conversion classes to be used.
-		filePairs ([FilePair])
-			List of FilePair objects configured with the file paths to be used.
-			"""
+			Conversions class configured with the Conversion classes to be used.
+			It's compiled once (see Conversions.compile), and the pipeline is
+			used for every file.
+		filePairs ([FilePair] || FilePairWalk)
+			FilePair objects configured with the file paths to be used.
+			Only iterated over once; pairs are converted as they come, so a
+			FilePairWalk is converted while it's still walking.
+		jobs (int), default: 1
+			Number of processes to convert in. With more than one, file pairs
+			are sent to a process pool in batches; every process compiles
+			the conversions once and writes the files it converted itself.
+		batchSize (None || int), default: None
+			File pairs per batch sent to a process. If None, it's chosen so
+			every process gets a few batches, up to MAX_BATCH_SIZE, or, if
+			the number of file pairs isn't known up front, STREAM_BATCH_SIZE.
+		manifest (None || Manifest), default: None
+			If specified, only pairs the manifest doesn't consider current
+			get converted, targets of sources that are gone get deleted,
+			and the manifest is updated and saved afterwards.
+		chunkSize (None || int), default: None
+			If specified, sources are read in chunks of that many characters,
+			and every chunk is converted and written as soon as possible
+			(see SinglePassEngine.convertChunks), so memory stays bounded
+			regardless of the size of a page. Needs SinglePassConversions.
+		report (None || ConversionReport), default: None
+			If specified, every file is converted with a ConversionProfile,
+			which gets added to the report.
+		pipelined (bool), default: False
+			Read, convert and write files concurrently, in stages connected
+			by bounded queues (see PipelinedConversion), so waiting for
+			storage overlaps with converting. Can't be used with chunkSize.
+		queueDepth (int), default: PipelinedConversion.QUEUE_DEPTH
+		maxBytesInFlight (int), default: PipelinedConversion.MAX_BYTES_IN_FLIGHT
+		ioThreads (int), default: PipelinedConversion.IO_THREADS
+			See PipelinedConversion; only used if pipelined.
+		fragmentCache (None || lib.cache.FragmentCache), default: None
+			If specified, pages are converted by fragments, reusing those converted
+			before (see lib.cache.CachedPipeline). Every process of a process pool
+			has a cache of its own, with the same settings; the stats of all of
+			them are added to the stats of the specified one.
+	
+	A file failing to convert doesn't stop the others; once all are done,
+	a FileConversionError lists the ones that failed."""
 	
-	def __init__(self, conversions, filePairs=[]):
+	MAX_BATCH_SIZE = 64
+	STREAM_BATCH_SIZE = 16
+	# Batches submitted to the process pool ahead of the one being waited for, per process.
+	BATCHES_AHEAD = 2
+	
+	def __init__(self, conversions, filePairs=[], jobs=1, batchSize=None, manifest=None, chunkSize=None,\
+		report=None, pipelined=False, queueDepth=None, maxBytesInFlight=None, ioThreads=None, fragmentCache=None):
+		if pipelined and chunkSize:
+			raise ValueError("Pipelined conversion reads whole files; it can't be combined with a chunkSize.")
 		self.conversions = conversions
 		self.filePairs = filePairs
+		self.jobs = jobs
+		self.batchSize = batchSize
+		self.manifest = manifest
+		self.chunkSize = chunkSize
+		self.report = report
+		self.pipelined = pipelined
+		self.queueDepth = queueDepth
+		self.maxBytesInFlight = maxBytesInFlight
+		self.ioThreads = ioThreads
+		self.fragmentCache = fragmentCache
 		
+	def getBatches(self, filePairs):
+		"""Split the specified file pairs into batches (lists) for the process pool; yields them."""
+		batchSize = self.batchSize
+		if batchSize is None:
+			if hasattr(filePairs, "__len__"):
+				batchSize = max(1, min(self.__class__.MAX_BATCH_SIZE, len(filePairs)//(self.jobs*4)))
+			else:
+				batchSize = self.__class__.STREAM_BATCH_SIZE
+		batch = []
+		for pair in filePairs:
+			batch.append(pair)
+			if len(batch) == batchSize:
+				yield batch
+				batch = []
+		if batch:
+			yield batch
+	
+	def pendingPairs(self, filePairs, sources):
+		"""Yield the pairs the manifest doesn't consider current,
+		adding the source path of every pair to the specified set."""
+		for pair in filePairs:
+			sources.add(str(pair.source.path))
+			if not self.manifest.isCurrent(pair):
+				yield pair
+	
 	def convert(self):
-		for pair in self.filePairs:
-			converted = self.conversions().convert(Content(pair.source.read()))
+		pipeline = self.conversions().compile()
+		if self.fragmentCache is not None:
+			pipeline = CachedPipeline(pipeline, self.fragmentCache)
+		filePairs = self.filePairs
+		if self.manifest:
+			self.manifest.setFingerprint(pipeline.fingerprint)
+			sources = set()
+			filePairs = self.pendingPairs(filePairs, sources)
+		failures = []
+		try:
+			if self.pipelined:
+				PipelinedConversion(self.conversions, pipeline, jobs=self.jobs, queueDepth=self.queueDepth,\
+					maxBytesInFlight=self.maxBytesInFlight, ioThreads=self.ioThreads,\
+					profile=self.report is not None, fragmentCache=self.fragmentCache).run(filePairs,\
+					lambda pair, result: self.addResult(pair, result, failures))
+			else:
+				if self.jobs > 1 and not (hasattr(filePairs, "__len__") and len(filePairs) < 2):
+					results = self.convertInProcesses(filePairs)
+				else:
+					results = ((pair, convertFilePair(pipeline, pair, self.chunkSize, self.report is not None))\
+						for pair in filePairs)
+				for pair, result in results:
+					self.addResult(pair, result, failures)
+			if self.manifest:
+				# Only now all sources are known.
+				self.manifest.removeMissing(sources)
+		finally:
+			if self.manifest:
+				self.manifest.save()
+		if failures:
+			raise FileConversionError(failures)
+	
+	def addResult(self, pair, result, failures):
+		"""Take note of a pair's FileConversionResult in the report and manifest,
+		or, if it failed, in the specified list of failures."""
+		if result.profile is not None:
+			self.report.add(pair, result.profile)
+		if result.error is None:
+			if self.manifest:
+				self.manifest.record(pair, result.sourceHash)
+		else:
+			failures.append((pair, result.error))
+	
+	def startWorkers(self):
+		"""Return a new process pool to convert in."""
+		return ProcessPoolExecutor(max_workers=self.jobs, initializer=_initializeWorker,\
+			initargs=(self.conversions, self.fragmentCache))
+	
+	def submitBatch(self, executor, batch):
+		"""Submit a batch to the process pool; returns its future.
+		If the pool is broken, the future raises the BrokenProcessPool."""
+		try:
+			return executor.submit(_convertBatch, batch, self.chunkSize, self.report is not None)
+		except BrokenProcessPool as error:
+			future = Future()
+			future.set_exception(error)
+			return future
+	
+	def batchResults(self, batch, future):
+		"""Wait for a batch and return its FileConversionResult objects.
+		Raises BrokenProcessPool if a process of the pool died before the batch was done."""
+		try:
+			results, fragmentCacheStats = future.result()
+		except BrokenProcessPool:
+			raise
+		except Exception as error:
+			# The batch as a whole didn't make it, e.g. as it couldn't be pickled.
+			return [FileConversionResult(repr(error), None, None) for pair in batch]
+		addFragmentCacheStats(self.fragmentCache, fragmentCacheStats)
+		return results
+	
+	def convertInProcesses(self, filePairs):
+		"""Convert the specified file pairs in a process pool.
+		Yields (FilePair, FileConversionResult) tuples, in order. Batches are
+		submitted while earlier ones are converted, but only BATCHES_AHEAD
+		per process, so pairs aren't taken from filePairs much earlier than needed.
+		
+		If a process dies, e.g. killed for running out of memory, it takes the pool
+		with it. The pool is replaced, and the batches that weren't done are converted
+		again one at a time, so only the batch the process died of fails."""
+		batches = self.getBatches(filePairs)
+		futures = deque()
+		executor = self.startWorkers()
+		try:
+			while True:
+				for batch in batches:
+					futures.append((batch, self.submitBatch(executor, batch)))
+					if len(futures) > self.jobs*self.__class__.BATCHES_AHEAD:
+						break
+				if not futures:
+					break
+				batch, future = futures.popleft()
+				try:
+					results = self.batchResults(batch, future)
+				except BrokenProcessPool:
+					futures.appendleft((batch, future))
+					executor.shutdown()
+					executor = self.startWorkers()
+					while futures:
+						batch, future = futures.popleft()
+						if not future.done() or isinstance(future.exception(), BrokenProcessPool):
+							future = self.submitBatch(executor, batch)
+						try:
+							results = self.batchResults(batch, future)
+						except BrokenProcessPool as error:
+							results = [FileConversionResult(repr(error), None, None) for pair in batch]
+							executor.shutdown()
+							executor = self.startWorkers()
+						for pair, result in zip(batch, results):
+							yield pair, result
+					continue
+				for pair, result in zip(batch, results):
+					yield pair, result
+		finally:
+			executor.shutdown()
+
+FileConversionResult = NamedTuple("FileConversionResult",\
+	[("error", object), ("sourceHash", object), ("profile", object)])
+
+def convertFilePair(pipeline, pair, chunkSize=None, profile=False):
+	"""Convert the specified file pair with a ConversionPipeline (see Conversions.compile).
+	If a chunkSize is specified, the file is converted in chunks; see FileConverter.
+	Returns a FileConversionResult: The error message if the pair failed,
+	the hash of its source (see SourceHash) otherwise, and, if profile is True,
+	the ConversionProfile of the pair."""
+	pairProfile = ConversionProfile() if profile else None
+	try:
+		if chunkSize:
+			sourceHash = SourceHash()
+			pair.target.writeChunks(pipeline.convertChunks(\
+				sourceHash.updating(pair.source.readChunks(chunkSize)), profile=pairProfile))
+			return FileConversionResult(None, sourceHash.hexdigest, pairProfile)
+		else:
+			source = pair.source.content
+			converted = pipeline.convert(SpanContent(source), profile=pairProfile)
 			pair.target.write(converted.string)
+			return FileConversionResult(None, Manifest.hash(source), pairProfile)
+	except Exception as error:
+		if log.debug:
+			log.debug("Failed to convert", pair.source.path, "->", pair.target.path, repr(error))
+		return FileConversionResult(repr(error), None, None)
+	finally:
+		pair.source.clearCache()
+
+def convertFilePairs(pipeline, filePairs, chunkSize=None, profile=False):
+	"""Convert the specified file pairs; returns a list of FileConversionResult
+	objects, in order. See convertFilePair."""
+	return [convertFilePair(pipeline, pair, chunkSize, profile) for pair in filePairs]
+
+def convertText(pipeline, source, profile=False):
+	"""Convert a page's text with a ConversionPipeline.
+	Returns a tuple of the converted text and, if profile is True, its ConversionProfile."""
+	textProfile = ConversionProfile() if profile else None
+	return pipeline.convert(SpanContent(source), profile=textProfile).string, textProfile
+
+def addFragmentCacheStats(fragmentCache, stats):
+	"""Add the FragmentCacheStats of a process pool's process to the specified cache's, if any."""
+	if fragmentCache is not None and stats is not None:
+		fragmentCache.addStats(stats)
+
+class ByteBudget(object):
+	
+	"""Bytes that may be in flight at once, for PipelinedConversion.
+	Something bigger than the whole budget is let through once nothing else is in flight.
+	Has to be made within a running asyncio event loop."""
+	
+	def __init__(self, limit):
+		self.limit = limit
+		self.used = 0
+		self.condition = asyncio.Condition()
+	
+	async def acquire(self, size):
+		async with self.condition:
+			await self.condition.wait_for(lambda: self.used == 0 or self.used+size <= self.limit)
+			self.used += size
+	
+	async def release(self, size):
+		async with self.condition:
+			self.used -= size
+			self.condition.notify_all()
+
+class PipelinedConversion(object):
+	
+	"""Reads, converts and writes files concurrently, in three stages connected
+	by bounded asyncio queues, so waiting for storage overlaps with converting.
+	
+	- Readers take the next pair, reserve its source's size in bytes from
+	  the byte budget and read it, in a thread pool for blocking file I/O.
+	- Converters convert the pages read; in a thread if there's one job,
+	  otherwise in a process pool, every process compiling the conversions once.
+	- Writers write the converted pages, in the same thread pool as the
+	  readers, and release their bytes from the budget.
+	
+	Takes:
+		- conversions (Conversions): Conversions class, for the process pool.
+		- pipeline (ConversionPipeline): Compiled conversions, for converting in a thread.
+		- jobs (int), default: 1
+			Pages converted at once; at least one, whatever is specified.
+		- queueDepth (None || int), default: None
+			Pages that may wait between two stages; QUEUE_DEPTH if None.
+		- maxBytesInFlight (None || int), default: None
+			Bytes of source files that may be read but not yet written;
+			MAX_BYTES_IN_FLIGHT if None.
+		- ioThreads (None || int), default: None
+			Threads for reading and writing, and number of readers and writers;
+			IO_THREADS if None.
+		- profile (bool), default: False
+			Convert with a ConversionProfile per file.
+		- fragmentCache (None || lib.cache.FragmentCache), default: None
+			Given to the processes of the process pool, and gets their stats
+			added; see FileConverter. In a thread, the pipeline is used as it is.
+	
+	Results come in the order files are done, which isn't necessarily
+	the order of the file pairs."""
+	
+	QUEUE_DEPTH = 16
+	MAX_BYTES_IN_FLIGHT = 64<<20
+	IO_THREADS = 4
+	
+	def __init__(self, conversions, pipeline, jobs=1, queueDepth=None, maxBytesInFlight=None, ioThreads=None,\
+		profile=False, fragmentCache=None):
+		self.conversions = conversions
+		self.pipeline = pipeline
+		self.jobs = max(1, jobs)
+		self.queueDepth = queueDepth if queueDepth else self.__class__.QUEUE_DEPTH
+		self.maxBytesInFlight = maxBytesInFlight if maxBytesInFlight else self.__class__.MAX_BYTES_IN_FLIGHT
+		self.ioThreads = ioThreads if ioThreads else self.__class__.IO_THREADS
+		self.profile = profile
+		self.fragmentCache = fragmentCache
+	
+	def run(self, filePairs, onResult):
+		"""Convert the specified file pairs, calling onResult(FilePair, FileConversionResult)
+		for each once it's done. Returns when all of them are."""
+		loop = asyncio.new_event_loop()
+		try:
+			with ThreadPoolExecutor(max_workers=self.ioThreads) as ioExecutor:
+				if self.jobs > 1:
+					convertExecutor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_initializeWorker,\
+						initargs=(self.conversions, self.fragmentCache))
+				else:
+					convertExecutor = ThreadPoolExecutor(max_workers=1)
+				with convertExecutor:
+					loop.run_until_complete(self.runStages(iter(filePairs), onResult, ioExecutor, convertExecutor))
+		finally:
+			loop.close()
+	
+	async def runStages(self, filePairs, onResult, ioExecutor, convertExecutor):
+		
+		loop = asyncio.get_event_loop()
+		budget = ByteBudget(self.maxBytesInFlight)
+		converting = asyncio.Queue(maxsize=self.queueDepth)
+		writing = asyncio.Queue(maxsize=self.queueDepth)
+		# Taking the next pair may walk a directory, so it's done in a thread too, one at a time.
+		nextPair = asyncio.Lock()
+		
+		def fail(pair, error):
+			onResult(pair, FileConversionResult(repr(error), None, None))
+		
+		def readSource(pair):
+			source = pair.source.read()
+			return source, Manifest.hash(source)
+		
+		async def read():
+			while True:
+				async with nextPair:
+					pair = await loop.run_in_executor(ioExecutor, next, filePairs, None)
+				if pair is None:
+					return
+				try:
+					size = (await loop.run_in_executor(ioExecutor, lambda: pair.source.stat)).st_size
+				except Exception as error:
+					fail(pair, error)
+					continue
+				await budget.acquire(size)
+				try:
+					source, sourceHash = await loop.run_in_executor(ioExecutor, readSource, pair)
+				except Exception as error:
+					await budget.release(size)
+					fail(pair, error)
+					continue
+				await converting.put((pair, size, source, sourceHash))
+		
+		async def convert():
+			while True:
+				item = await converting.get()
+				if item is None:
+					return
+				pair, size, source, sourceHash = item
+				try:
+					if self.jobs > 1:
+						converted, profile, fragmentCacheStats = await loop.run_in_executor(convertExecutor,\
+							_convertText, source, self.profile)
+						addFragmentCacheStats(self.fragmentCache, fragmentCacheStats)
+					else:
+						converted, profile = await loop.run_in_executor(convertExecutor, convertText,\
+							self.pipeline, source, self.profile)
+				except Exception as error:
+					await budget.release(size)
+					fail(pair, error)
+					continue
+				await writing.put((pair, size, converted, sourceHash, profile))
+		
+		async def write():
+			while True:
+				item = await writing.get()
+				if item is None:
+					return
+				pair, size, converted, sourceHash, profile = item
+				try:
+					await loop.run_in_executor(ioExecutor, pair.target.write, converted)
+				except Exception as error:
+					fail(pair, error)
+					continue
+				finally:
+					await budget.release(size)
+				onResult(pair, FileConversionResult(None, sourceHash, profile))
+		
+		converters = [asyncio.ensure_future(convert()) for i in range(0, self.jobs)]
+		writers = [asyncio.ensure_future(write()) for i in range(0, self.ioThreads)]
+		try:
+			await asyncio.gather(*[read() for i in range(0, self.ioThreads)])
+			for converter in converters:
+				await converting.put(None)
+			await asyncio.gather(*converters)
+			for writer in writers:
+				await writing.put(None)
+			await asyncio.gather(*writers)
+		finally:
+			for task in converters+writers:
+				task.cancel()
+
+class StreamConverter(object):
+	
+	"""Converts pages read from a stream, writing them to another, so no
+	files are needed, e.g. in a shell pipeline.
+	
+	- convertPage: One page in, its Markdown out.
+	- convertRecords: JSON lines records in, e.g. {"name": "Main.HomePage", "text": "..."},
+	  converted records out, as soon as each is done. A converted record is the record
+	  with the Markdown as its "text"; if it failed, it has an "error" instead. Any other
+	  keys of a record are kept, so records can be told apart whatever order they come in.
+	
+	Takes:
+		- conversions (Conversions): Conversions class.
+		- jobs (int), default: 1
+			Number of processes to convert records in. With more than one, records
+			are written in the order they're done, rather than the one they came in.
+		- fragmentCache (None || lib.cache.FragmentCache), default: None
+			Convert pages by fragments, reusing those converted before; see FileConverter.
+	
+	Has:
+		- pipeline (ConversionPipeline): The compiled conversions."""
+	
+	# Records per process that are read ahead, so processes don't wait for input.
+	RECORDS_AHEAD = 8
+	
+	def __init__(self, conversions, jobs=1, fragmentCache=None):
+		self.conversions = conversions
+		self.pipeline = conversions().compile()
+		if fragmentCache is not None:
+			self.pipeline = CachedPipeline(self.pipeline, fragmentCache)
+		self.jobs = jobs
+		self.fragmentCache = fragmentCache
+	
+	def convertPage(self, inStream, outStream):
+		"""Convert the page read from inStream to its end, writing the Markdown to outStream."""
+		outStream.write(convertText(self.pipeline, inStream.read())[0])
+		outStream.flush()
+	
+	def convertRecords(self, inStream, outStream):
+		"""Convert the JSON lines records read from inStream, writing each to outStream
+		once it's converted. Returns the number of records that failed."""
+		if self.jobs > 1:
+			results = self.convertRecordsInProcesses(self.readRecords(inStream))
+		else:
+			results = (self.convertRecord(record, error) for record, error in self.readRecords(inStream))
+		failed = 0
+		for record in results:
+			if "error" in record:
+				failed += 1
+			outStream.write(json.dumps(record, ensure_ascii=False)+"\n")
+			outStream.flush()
+		return failed
+	
+	@staticmethod
+	def readRecords(inStream):
+		"""Yield (record, error) for every line, one of them None; lines which aren't
+		records are reported by their line number, as a record with an error."""
+		for lineNumber, line in enumerate(inStream, 1):
+			if not line.strip():
+				continue
+			try:
+				record = json.loads(line)
+			except ValueError as error:
+				yield {"line": lineNumber}, error
+				continue
+			if not isinstance(record, dict) or not isinstance(record.get("text"), str):
+				yield dict(record, line=lineNumber) if isinstance(record, dict) else {"line": lineNumber},\
+					ValueError("A record has to be a JSON object with a \"text\" string.")
+				continue
+			yield record, None
+	
+	def convertRecord(self, record, error=None):
+		if error is None:
+			try:
+				return self.converted(record, convertText(self.pipeline, record["text"])[0])
+			except Exception as conversionError:
+				error = conversionError
+		return self.failed(record, error)
+	
+	@staticmethod
+	def converted(record, markdown):
+		converted = dict(record)
+		converted["text"] = markdown
+		return converted
+	
+	@staticmethod
+	def failed(record, error):
+		failed = {key: value for key, value in record.items() if key != "text"}
+		failed["error"] = "{name}: {error}".format(name=error.__class__.__name__, error=error)
+		return failed
+	
+	def convertRecordsInProcesses(self, records):
+		"""Convert records in a process pool, yielding converted records as they're done.
+		At most RECORDS_AHEAD records per process are taken from records at a time."""
+		with ProcessPoolExecutor(max_workers=self.jobs, initializer=_initializeWorker,\
+			initargs=(self.conversions, self.fragmentCache)) as executor:
+			futures = {}
+			records = iter(records)
+			exhausted = False
+			while True:
+				while not exhausted and len(futures) < self.jobs*self.__class__.RECORDS_AHEAD:
+					item = next(records, None)
+					if item is None:
+						exhausted = True
+						break
+					record, error = item
+					if error is not None:
+						yield self.failed(record, error)
+					else:
+						futures[executor.submit(_convertText, record["text"], False)] = record
+				if not futures:
+					return
+				done, pending = wait(futures, return_when=FIRST_COMPLETED)
+				for future in done:
+					record = futures.pop(future)
+					try:
+						converted, profile, fragmentCacheStats = future.result()
+						addFragmentCacheStats(self.fragmentCache, fragmentCacheStats)
+						yield self.converted(record, converted)
+					except Exception as error:
+						yield self.failed(record, error)
+
+# Set up once per process of a FileConverter or StreamConverter process pool.
+_workerPipeline = None
+
+def _initializeWorker(conversions, fragmentCache=None):
+	global _workerPipeline
+	_workerPipeline = conversions().compile()
+	if fragmentCache is not None:
+		_workerPipeline = CachedPipeline(_workerPipeline, fragmentCache)
+
+def _fragmentCacheStats():
+	"""The stats of the process's FragmentCache since they were last taken, or None if it has none."""
+	if isinstance(_workerPipeline, CachedPipeline):
+		return _workerPipeline.cache.takeStats()
+	return None
+
+def _convertBatch(filePairs, chunkSize, profile):
+	return convertFilePairs(_workerPipeline, filePairs, chunkSize, profile), _fragmentCacheStats()
+
+def _convertText(source, profile):
+	converted, textProfile = convertText(_workerPipeline, source, profile)
+	return converted, textProfile, _fragmentCacheStats()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""Conversion daemon: Keeps the compiled conversions warm, and converts what
+clients send it over a Unix domain socket; see lib/client.py for the protocol."""
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+from pathlib import Path
+import json, os, socket, socketserver
+
+# Local
+from lib.pmwiki2md import AllConversions, SpanContent
+from lib.converter import File, PmwikiPageFile
+from lib.client import DaemonError, defaultSocketPath
+
+# Debugging
+from lib.debugging import getLogger
+
+log = getLogger(__name__)
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+class ConversionRequestHandler(socketserver.StreamRequestHandler):
+	
+	"""Answers the JSON lines requests of one client connection, in order."""
+	
+	def handle(self):
+		for line in self.rfile:
+			if not line.strip():
+				continue
+			request = {}
+			try:
+				request = json.loads(line.decode("utf-8"))
+				if not isinstance(request, dict):
+					raise DaemonError("A request has to be a JSON object.")
+				reply = self.server.answer(request)
+			except Exception as error:
+				if not isinstance(request, dict):
+					request = {}
+				reply = {"error": "{name}: {error}".format(name=error.__class__.__name__, error=error)}
+				if log.debug:
+					log.debug("Failed to answer", line[:200], reply["error"])
+			if "id" in request:
+				reply["id"] = request["id"]
+			self.wfile.write(json.dumps(reply).encode("utf-8")+b"\n")
+			if reply.get("shutdown"):
+				# From this thread, as serve_forever runs in another one.
+				self.server.shutdown()
+
+class ConversionDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+	
+	"""Unix domain socket server converting with a pipeline compiled once.
+	Every client connection is answered by a thread of its own; they all share
+	the pipeline, which doesn't change while it converts.
+	Only the user running the daemon may connect to the socket.
+	
+	Takes:
+		- socketPath (None || str), default: None
+			Where to listen; lib.client.defaultSocketPath() if None.
+			A socket file left behind by a daemon that's gone is replaced.
+		- conversions (Conversions class), default: AllConversions"""
+	
+	daemon_threads = True
+	# Converted once on start, so the first client doesn't wait for regular expressions to compile.
+	WARM_UP_TEXT = "!! Title\n\n''emphasis'' '''strong''' [[Group.Page|link]] [@code@]\n* item\n||!a||b||\n"
+	
+	def __init__(self, socketPath=None, conversions=AllConversions):
+		self.socketPath = socketPath if socketPath is not None else defaultSocketPath()
+		self.pipeline = conversions().compile()
+		self.pipeline.convert(SpanContent(self.__class__.WARM_UP_TEXT))
+		self.removeStaleSocket()
+		umask = os.umask(0o177)
+		try:
+			super().__init__(self.socketPath, ConversionRequestHandler)
+		finally:
+			os.umask(umask)
+	
+	def removeStaleSocket(self):
+		"""Remove the socket file at self.socketPath if no daemon is listening on it."""
+		if not os.path.exists(self.socketPath):
+			return
+		probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			probe.connect(self.socketPath)
+		except (ConnectionRefusedError, FileNotFoundError):
+			os.unlink(self.socketPath)
+		else:
+			raise DaemonError("A daemon is already listening on {path}.".format(path=self.socketPath))
+		finally:
+			probe.close()
+	
+	def server_close(self):
+		#OVERRIDE
+		super().server_close()
+		if os.path.exists(self.socketPath):
+			os.unlink(self.socketPath)
+	
+	def convert(self, text):
+		return self.pipeline.convert(SpanContent(text)).string
+	
+	def answer(self, request):
+		
+		"""Return the reply (dict) to a request (dict); see lib/client.py.
+		Raises DaemonError for requests it doesn't understand."""
+		
+		if "command" in request:
+			if request["command"] == "ping":
+				return {"pong": True}
+			if request["command"] == "shutdown":
+				return {"shutdown": True}
+			raise DaemonError("Unknown command {command!r}.".format(command=request["command"]))
+		if "text" in request:
+			return {"markdown": self.convert(request["text"])}
+		if "source" in request:
+			SourceClass = PmwikiPageFile if request.get("pageFile") else File
+			source = SourceClass(Path(request["source"]), encoding=request.get("encoding"))
+			markdown = self.convert(source.content)
+			if request.get("target") is None:
+				return {"markdown": markdown}
+			File(Path(request["target"]), encoding=request.get("encoding")).write(markdown)
+			return {"target": request["target"]}
+		raise DaemonError("A request needs a \"text\", a \"source\" or a \"command\".")
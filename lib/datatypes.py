@@ -70,4 +70,90 @@ class NamedList(UserList):
 		"""Set values for member names in self.__class__.ATTRIBUTES in self.data."""
 		if attrName in self.__class__.ATTRIBUTES:
 			self.data[self._getAttrIndex(attrName)] = attrValue
-		object.__setattr__(self, "attrName", attrValue)
+		else:
+			object.__setattr__(self, attrName, attrValue)
+
+class RecordType(type):
+	
+	"""Metaclass of Record, turning ATTRIBUTES into slots.
+	Slots a class declares itself are kept, e.g. for caches of its properties."""
+	
+	def __new__(metaclass, name, bases, namespace):
+		inherited = set()
+		for base in bases:
+			for klass in base.__mro__:
+				inherited.update(getattr(klass, "__slots__", ()))
+		slots = list(namespace.get("__slots__", ()))
+		for attribute in namespace.get("ATTRIBUTES", []):
+			if not attribute in inherited and not attribute in slots:
+				slots.append(attribute)
+		namespace["__slots__"] = tuple(slots)
+		return super().__new__(metaclass, name, bases, namespace)
+
+class Record(object, metaclass=RecordType):
+	
+	"""Record of named values, fixed in number and order, for where NamedList is too slow.
+	
+	Every name in ATTRIBUTES is a slot, so reading or setting a value is as
+	fast as for any slotted attribute; no lookup of the name is involved.
+	Like NamedList, it's initialized by position, name, or both, values not
+	specified are None, and it can be iterated over, indexed and compared
+	like the list of its values, in the order of ATTRIBUTES.
+	
+	Usage:
+	  Subclass this and set the class attribute ATTRIBUTES to a list of
+	  attribute names. Names not in ATTRIBUTES need a slot of their own,
+	  declared in __slots__, as instances have no __dict__."""
+	
+	ATTRIBUTES = []
+	
+	def __init__(self, *args, **kwargs):
+		attributes = self.__class__.ATTRIBUTES
+		if len(args) > len(attributes):
+			raise TypeError("{name} takes at most {count} values.".format(\
+				name=self.__class__.__name__, count=len(attributes)))
+		for attribute, value in zip(attributes, args):
+			object.__setattr__(self, attribute, value)
+		for attribute in attributes[len(args):]:
+			object.__setattr__(self, attribute, kwargs.pop(attribute, None))
+		if kwargs:
+			raise TypeError("{name} has no attribute(s) {names}.".format(\
+				name=self.__class__.__name__, names=", ".join(sorted(kwargs.keys()))))
+	
+	@property
+	def data(self):
+		"""The values as a list, in the order of ATTRIBUTES."""
+		return [getattr(self, attribute) for attribute in self.__class__.ATTRIBUTES]
+	
+	def __iter__(self):
+		for attribute in self.__class__.ATTRIBUTES:
+			yield getattr(self, attribute)
+	
+	def __len__(self):
+		return len(self.__class__.ATTRIBUTES)
+	
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return self.data[index]
+		return getattr(self, self.__class__.ATTRIBUTES[index])
+	
+	def __eq__(self, other):
+		if isinstance(other, Record):
+			return self.__class__.ATTRIBUTES == other.__class__.ATTRIBUTES and self.data == other.data
+		if isinstance(other, (list, tuple, UserList)):
+			return self.data == list(other)
+		return NotImplemented
+	
+	# Mutable, so not hashable, like a list.
+	__hash__ = None
+	
+	def __getstate__(self):
+		return self.data
+	
+	def __setstate__(self, state):
+		self.__init__(*state)
+	
+	def __repr__(self):
+		return "{name}({values})".format(name=self.__class__.__name__, values=", ".join(\
+			["{attribute}={value!r}".format(attribute=attribute, value=getattr(self, attribute))\
+				for attribute in self.__class__.ATTRIBUTES]))
@@ -1,45 +1,255 @@
 #-*- coding: utf-8 -*-
 
+"""Level-gated debug logging with per-module switches.
+
+Every module gets its Logger by getLogger(__name__). A Logger has a method per
+level (trace, debug, info, warning, error); the methods of levels below the one
+configured for the module are all DISABLED, which does nothing and is false.
+So a disabled call costs an attribute lookup and a call doing nothing,
+and guarding it costs an attribute check alone, with arguments not even evaluated:
+	
+	if log.debug:
+		log.debug("Elements:", [element.content for element in elements])
+
+Where a message was logged from (file, line, class and function) is only looked
+up once it's known to be logged, by sys._getframe at a fixed depth.
+
+Configured by configure, or by these environment variables, which are read on
+import, so processes started later (e.g. of a process pool) are configured alike:
+	- PMWIKI2MD_DEBUG: A level for all modules, and/or levels for modules, e.g.
+	  "debug" or "info,lib.converter=trace". A level for a module applies to
+	  the modules within it, too.
+	- PMWIKI2MD_DEBUG_FILE: Path of a file to append messages to instead of printing
+	  them to standard error."""
+
 #=======================================================================================
 # Imports
 #=======================================================================================
 
 # Python
-import inspect
 import os
+import sys
 
 #=======================================================================================
 # Library
 #=======================================================================================
 
-def dprint(*args, stackLevel=1):
+LEVELS = {"trace": 5, "debug": 10, "info": 20, "warning": 30, "error": 40, "off": 100}
+DEFAULT_LEVEL = "warning"
+
+LEVEL_VARIABLE = "PMWIKI2MD_DEBUG"
+FILE_VARIABLE = "PMWIKI2MD_DEBUG_FILE"
+
+class Disabled(object):
+	
+	"""Stands in for the Logger methods of disabled levels: Does nothing, and is false."""
+	
+	__slots__ = ()
 	
-	"""Print a debugging message with automagically added context information."""
+	def __call__(self, *args, **kwargs):
+		pass
+	
+	def __bool__(self):
+		return False
+
+DISABLED = Disabled()
 
-	parentStackContext = inspect.stack()[stackLevel]
+class DebugSettings(object):
 	
-	contextLocals = parentStackContext[0].f_locals
-	className = ""
+	"""Levels and output of all loggers.
+	Has:
+		- level (int): Level of modules without one of their own.
+		- moduleLevels ({str: int}): Levels by module name.
+		- minimumLevel (int): The lowest level of all, so it's a single check
+		  to rule out that anything logs at some level.
+		- output (None || file object): Where to write to; standard error if None.
+		- ownsOutput (bool): Whether output was opened by configure, which
+		  closes it once it's replaced.
+		- loggers ({str: Logger}): Every Logger, by module name."""
+	
+	def __init__(self):
+		self.level = LEVELS[DEFAULT_LEVEL]
+		self.moduleLevels = {}
+		self.minimumLevel = self.level
+		self.output = None
+		self.ownsOutput = False
+		self.loggers = {}
+	
+	def levelOf(self, moduleName):
+		"""The level of the specified module, or of the innermost package of it with a level."""
+		name = moduleName
+		while name:
+			if name in self.moduleLevels:
+				return self.moduleLevels[name]
+			name = name.rpartition(".")[0]
+		return self.level
+	
+	def apply(self):
+		self.minimumLevel = min([self.level]+list(self.moduleLevels.values()))
+		for logger in self.loggers.values():
+			logger.apply()
+
+_settings = DebugSettings()
+
+def levelValue(level):
+	"""Return the number of a level specified by name or number."""
+	if isinstance(level, int):
+		return level
+	try:
+		return LEVELS[level.strip().lower()]
+	except KeyError:
+		raise ValueError("Unknown debug level {level!r}; known are: {levels}.".format(\
+			level=level, levels=", ".join(sorted(LEVELS.keys(), key=LEVELS.get))))
+
+def configure(level=None, modules=None, output=None):
+	
+	"""Configure all loggers, present and future.
+	Takes:
+		- level (None || str || int), default: None
+			Level of modules without one of their own; unchanged if None.
+		- modules (None || {str: str || int}), default: None
+			Levels by module name, replacing the previous ones; unchanged if None.
+		- output (None || str || file object), default: None
+			Path of a file to append to, a file object, or "-" for standard
+			error; unchanged if None."""
 	
+	if level is not None:
+		_settings.level = levelValue(level)
+	if modules is not None:
+		_settings.moduleLevels = {name: levelValue(moduleLevel) for name, moduleLevel in modules.items()}
+	if output is not None:
+		previous, ownedPrevious = _settings.output, _settings.ownsOutput
+		if output == "-":
+			_settings.output, _settings.ownsOutput = None, False
+		elif isinstance(output, str):
+			_settings.output, _settings.ownsOutput = open(output, "a", buffering=1, encoding="utf-8"), True
+		else:
+			_settings.output, _settings.ownsOutput = output, False
+		if ownedPrevious and previous is not _settings.output:
+			previous.close()
+	_settings.apply()
+
+def configureFromEnvironment(environment=None, strict=True):
+	
+	"""Configure as specified by the environment variables; see the module docstring.
+	Takes:
+		- environment (None || {str: str}), default: None
+			The environment variables; os.environ if None.
+		- strict (bool), default: True
+			Raise ValueError for unknown levels, and OSError if the file can't be
+			opened. Otherwise, what's wrong is warned about on standard error
+			and ignored, as on import, where raising would fail the import."""
+	
+	def warn(error):
+		print("pmwiki2md: Ignoring debugging settings of the environment: {error}".format(error=error),\
+			file=sys.stderr)
+	
+	if environment is None:
+		environment = os.environ
+	level = None
+	modules = {}
+	for setting in environment.get(LEVEL_VARIABLE, "").split(","):
+		if "=" in setting:
+			moduleName, settingLevel = setting.split("=", 1)
+		elif setting.strip():
+			moduleName, settingLevel = None, setting
+		else:
+			continue
+		try:
+			settingLevel = levelValue(settingLevel)
+		except ValueError as error:
+			if strict:
+				raise
+			warn(error)
+			continue
+		if moduleName is None:
+			level = settingLevel
+		else:
+			modules[moduleName.strip()] = settingLevel
+	try:
+		configure(level=level, modules=modules, output=environment.get(FILE_VARIABLE) or None)
+	except OSError as error:
+		if strict:
+			raise
+		warn(error)
+		configure(level=level, modules=modules)
+
+def write(levelName, frame, args):
+	
+	"""Write a message with the context of the specified frame."""
+
 	if len(args) == 0:
-		message  = ""
+		message = ""
 	elif len(args) == 1:
 		message = args[0]
 	else:
 		message = " ".join([str(arg) for arg in args])
 	
-	if "self" in contextLocals.keys():
-		className = "{name}.".format(\
-			name=contextLocals["self"].__class__.__name__)
-		
-	print("[DEBUG:{fileName}:{line}:{className}{functionName}] {message}"\
+	className = ""
+	contextSelf = frame.f_locals.get("self")
+	if contextSelf is not None:
+		className = "{name}.".format(name=contextSelf.__class__.__name__)
+	
+	print("[{level}:{fileName}:{line}:{className}{functionName}] {message}"\
 		.format(\
-			fileName = parentStackContext.filename.rpartition(os.sep)[2],\
-			message = message,\
-			line = parentStackContext.lineno,\
-			className = className,\
-			functionName=parentStackContext.function) )
+			level=levelName.upper(),\
+			fileName=frame.f_code.co_filename.rpartition(os.sep)[2],\
+			message=message,\
+			line=frame.f_lineno,\
+			className=className,\
+			functionName=frame.f_code.co_name),\
+		file=_settings.output if _settings.output is not None else sys.stderr)
+
+class Logger(object):
 	
+	"""Logger of a module; see the module docstring. Obtained by getLogger.
+	Has:
+		- name (str): Name of the module.
+		- level (int): Its level, as configured.
+		- trace, debug, info, warning, error: Callables taking the values
+		  to log, joined by spaces, or DISABLED."""
+	
+	def __init__(self, name):
+		self.name = name
+		self.apply()
+	
+	def apply(self):
+		"""Set the methods of the levels up as configured."""
+		self.level = _settings.levelOf(self.name)
+		for levelName, level in LEVELS.items():
+			if levelName == "off":
+				continue
+			setattr(self, levelName, self.emitter(levelName) if level >= self.level else DISABLED)
+	
+	@staticmethod
+	def emitter(levelName):
+		def emit(*args, stackLevel=1):
+			write(levelName, sys._getframe(stackLevel), args)
+		return emit
+
+def getLogger(name):
+	"""Return the Logger of the module with the specified name."""
+	logger = _settings.loggers.get(name)
+	if logger is None:
+		logger = _settings.loggers[name] = Logger(name)
+	return logger
+
+def dprint(*args, stackLevel=1):
+	
+	"""Print a debugging message with automagically added context information.
+	Logs at the debug level of the calling module; if no module logs at that level,
+	all it costs is a single check."""
+	
+	if _settings.minimumLevel > LEVELS["debug"]:
+		return
+	frame = sys._getframe(stackLevel)
+	if getLogger(frame.f_globals.get("__name__", "")).debug:
+		write("debug", frame, args)
+
 def cdprint(content):
 	"""Print .content of the ContentElement objs. in the specified Content obj."""
+	if _settings.minimumLevel > LEVELS["debug"]:
+		return
 	dprint([contentElement.content for contentElement in content], stackLevel=2)
+
+configureFromEnvironment(strict=False)
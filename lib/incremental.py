@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""Incremental re-conversion of edited pages, e.g. for a live preview.
+
+A page is converted block by block, the blocks being the fragments of a
+FragmentSplitter, and where every block ends in the source and in the output is
+kept in a BlockMap. When the page is edited, only the blocks the edit touches
+are converted again, and spliced into the previous output."""
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+from bisect import bisect_left
+
+# Local
+from lib.datatypes import Record
+from lib.cache import FragmentSplitter
+
+#=======================================================================================
+# Library
+#=======================================================================================
+
+class BlockMap(Record):
+	
+	"""Where the blocks of a page end, in its source and in its output.
+	Has:
+		- sourceEnds ([int]): Position in the source every block ends at;
+		  the last one is the length of the source.
+		- outputEnds ([int]): Likewise for the output.
+	Consists of lists of numbers only, so it can be kept as JSON, for example."""
+	
+	ATTRIBUTES = ["sourceEnds", "outputEnds"]
+
+class IncrementalConversion(Record):
+	
+	"""Result of an IncrementalConverter.
+	Has:
+		- output (str): The converted page.
+		- blockMap (BlockMap): Its blocks, for converting the next edit of it.
+		- reconverted (int): How many blocks were converted; all of them,
+		  unless the page was reconverted."""
+	
+	ATTRIBUTES = ["output", "blockMap", "reconverted"]
+
+def commonPrefixLength(first, second, step=4096):
+	"""Length of the longest common beginning of two strings, compared a step at a time."""
+	length = min(len(first), len(second))
+	position = 0
+	while position < length and first[position:position+step] == second[position:position+step]:
+		position += step
+	position = min(position, length)
+	end = min(position+step, length)
+	while position < end and first[position] == second[position]:
+		position += 1
+	return position
+
+def commonSuffixLength(first, second, limit, step=4096):
+	"""Length of the longest common ending of two strings, up to limit."""
+	firstEnd, secondEnd = len(first), len(second)
+	length = 0
+	while length < limit:
+		size = min(step, limit-length)
+		if first[firstEnd-length-size:firstEnd-length] != second[secondEnd-length-size:secondEnd-length]:
+			break
+		length += size
+	else:
+		return length
+	while length < limit and first[firstEnd-length-1] == second[secondEnd-length-1]:
+		length += 1
+	return length
+
+class IncrementalConverter(object):
+	
+	"""Converts pages, and edited versions of them, converting only the blocks an edit touched.
+	
+	The blocks before an edit were split the same way before it, so their output
+	is reused as it was. From the first block the edit touches on, the page is
+	split and converted again, until a block ends at the same place in the
+	unchanged rest of the page as a block of the previous version did. From
+	there on, the blocks are the same as before, and so is their output.
+	The output is always the same as converting the whole page.
+	
+	Takes:
+		- pipeline (ConversionPipeline): E.g. from Conversions.compile."""
+	
+	def __init__(self, pipeline):
+		self.pipeline = pipeline
+		self.splitter = FragmentSplitter(pipeline)
+	
+	def convertBlocks(self, source, start, stop=None):
+		"""Convert the blocks of source from start on, which has to be where one begins.
+		Stops after a block ending at a position stop(end) is true for, if specified.
+		Returns the list of the ends of the converted blocks and the list of their output."""
+		ends = []
+		for end in self.splitter.ends(source, start):
+			ends.append(end)
+			if stop is not None and stop(end):
+				break
+		else:
+			ends.append(len(source))
+		blocks = []
+		blockStart = start
+		for end in ends:
+			blocks.append(source[blockStart:end])
+			blockStart = end
+		return ends, self.pipeline.convertMany(blocks)
+	
+	def convert(self, source):
+		"""Convert a page; returns an IncrementalConversion."""
+		sourceEnds, outputs = self.convertBlocks(source, 0)
+		outputEnds = []
+		outputEnd = 0
+		for output in outputs:
+			outputEnd += len(output)
+			outputEnds.append(outputEnd)
+		return IncrementalConversion("".join(outputs), BlockMap(sourceEnds, outputEnds), len(outputs))
+	
+	def reconvert(self, previousSource, previousOutput, blockMap, source):
+		
+		"""Convert the edited version of a page, reusing the output of the blocks the edit didn't touch.
+		Takes:
+			- previousSource (str): The page before the edit.
+			- previousOutput (str): Its output.
+			- blockMap (BlockMap): Its BlockMap, from the IncrementalConversion it was converted in.
+			- source (str): The page after the edit.
+		Returns an IncrementalConversion."""
+		
+		sourceEnds, outputEnds = blockMap.sourceEnds, blockMap.outputEnds
+		if not sourceEnds or sourceEnds[-1] != len(previousSource) or outputEnds[-1] != len(previousOutput):
+			raise ValueError("The block map doesn't belong to the previous source and output.")
+		
+		prefix = commonPrefixLength(previousSource, source)
+		if prefix == len(source) == len(previousSource):
+			return IncrementalConversion(previousOutput, blockMap, 0)
+		suffix = commonSuffixLength(previousSource, source, min(len(previousSource), len(source))-prefix)
+		shift = len(source)-len(previousSource)
+		
+		# Blocks ending before the first changed character, not even at it, as
+		# where a block ends depends on the character after its end.
+		kept = bisect_left(sourceEnds, prefix)
+		start = sourceEnds[kept-1] if kept else 0
+		outputStart = outputEnds[kept-1] if kept else 0
+		
+		# Where a block ends in the unchanged rest as one of the previous version did,
+		# the blocks from there on are the same.
+		unchangedFrom = len(source)-suffix
+		def isPreviousEnd(end):
+			if end < unchangedFrom:
+				return False
+			index = bisect_left(sourceEnds, end-shift)
+			return index < len(sourceEnds) and sourceEnds[index] == end-shift
+		ends, outputs = self.convertBlocks(source, start, isPreviousEnd)
+		
+		newSourceEnds = sourceEnds[:kept]
+		newOutputEnds = outputEnds[:kept]
+		outputEnd = outputStart
+		for end, output in zip(ends, outputs):
+			outputEnd += len(output)
+			newSourceEnds.append(end)
+			newOutputEnds.append(outputEnd)
+		parts = [previousOutput[:outputStart]]+outputs
+		if ends[-1] != len(source):
+			# Resynchronized with a block end of the previous version.
+			resumeIndex = bisect_left(sourceEnds, ends[-1]-shift)
+			previousOutputStart = outputEnds[resumeIndex]
+			outputShift = outputEnd-previousOutputStart
+			newSourceEnds.extend([end+shift for end in sourceEnds[resumeIndex+1:]])
+			newOutputEnds.extend([end+outputShift for end in outputEnds[resumeIndex+1:]])
+			parts.append(previousOutput[previousOutputStart:])
+		return IncrementalConversion("".join(parts), BlockMap(newSourceEnds, newOutputEnds), len(outputs))
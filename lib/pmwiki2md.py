@@ -8,15 +8,18 @@
 # Python
 from collections import UserList
 from typing import NamedTuple
-import copy, os
+import os
 from urllib.parse import urlparse
+import re, hashlib, time
 
 # Local
-from lib.datatypes import NamedList
+from lib.datatypes import Record
+from lib.table import PmwikiTable, MdTable, TableTheme
 
 # Debugging
-import time
-from lib.debugging import dprint, cdprint
+from lib.debugging import getLogger
+
+log = getLogger(__name__)
 
 #=======================================================================================
 # Library
@@ -68,6 +71,11 @@ class ContentSplitByIndicator(object):
 		
 class ContentElement(object):
 	
+	"""A piece of content, and whether it's still available for conversion.
+	Slotted, as documents get broken down into a great many of these."""
+	
+	__slots__ = ("content", "conversions", "availableForConversion")
+	
 	ContentElementPartitions = NamedTuple("ContentElementPartitions",\
 		[("before", object), ("separator", object), ("after", object)])
 	
@@ -82,13 +90,20 @@ class ContentElement(object):
 		
 	def copy(self):
 		"""Return a shallow copy of this object."""
-		return copy.copy(self)
+		return self.copyWithNewContent(self.content)
 	
 	def copyWithNewContent(self, newContent):
 		"""Return a copy of this object, except with a different, specified content string."""
-		copy = self.copy()
-		copy.content = newContent
-		return copy
+		return self.__class__(newContent, self.conversions, self.availableForConversion)
+	
+	@property
+	def span(self):
+		"""Tuple of the string this element's content is part of, and where in it the content starts and ends."""
+		return (self.content, 0, len(self.content))
+	
+	def piece(self, start, end):
+		"""Return a copy of this object with the specified part of the string referenced by .span as its content."""
+		return self.copyWithNewContent(self.content[start:end])
 		
 	def getPartitioned(self, contentParts):
 		
@@ -117,9 +132,93 @@ class ContentElement(object):
 	def rpartition(self, separator):
 		return self.getPartitioned(self.content.rpartition(separator))
 	
+class DelimiterElement(ContentElement):
+	
+	"""Immutable ContentElement for delimiters and other converted indicators.
+	
+	These are never available for conversion and never change, so rather
+	than creating a new one for every "~~" or "<sub>" emitted, DelimiterElement.get
+	hands out one shared instance per string. Use that instead of instantiating
+	directly."""
+	
+	__slots__ = ()
+	
+	_SHARED = {}
+	
+	def __init__(self, content, conversions=[], availableForConversion=False):
+		object.__setattr__(self, "content", content)
+		object.__setattr__(self, "conversions", conversions)
+		object.__setattr__(self, "availableForConversion", False)
+		
+	def __setattr__(self, attrName, attrValue):
+		raise AttributeError("DelimiterElement objects are shared and can't be altered.")
+	
+	@classmethod
+	def get(cls, content):
+		"""Return the shared DelimiterElement for the specified string."""
+		try:
+			return cls._SHARED[content]
+		except KeyError:
+			return cls._SHARED.setdefault(content, cls(content))
+		
+class SpanElement(ContentElement):
+	
+	"""ContentElement referencing a part of a source string instead of holding its own.
+	
+	Takes:
+		- source (str): The string the content is a part of, typically the whole page.
+		- start (int), end (int): Where the content starts and ends in source.
+		
+	.content only gets sliced from source when it's asked for. Pieces of
+	a SpanElement are SpanElement objects referencing the same source,
+	so breaking a page down doesn't copy it."""
+	
+	__slots__ = ("source", "start", "end")
+	
+	def __init__(self, source, start, end, conversions=[], availableForConversion=True):
+		self.source = source
+		self.start = start
+		self.end = end
+		self.conversions = conversions
+		self.availableForConversion = availableForConversion
+		
+	@property
+	def content(self):
+		return self.source[self.start:self.end]
+	
+	@property
+	def isEmpty(self):
+		return self.start == self.end
+	
+	def copy(self):
+		"""Return a shallow copy of this object."""
+		return self.piece(self.start, self.end)
+	
+	def copyWithNewContent(self, newContent):
+		"""Return a ContentElement with the specified content string and otherwise the same attributes."""
+		return ContentElement(newContent, self.conversions, self.availableForConversion)
+	
+	@property
+	def span(self):
+		return (self.source, self.start, self.end)
+	
+	def piece(self, start, end):
+		return self.__class__(self.source, start, end, self.conversions, self.availableForConversion)
+	
 class Content(UserList):
 	
+	"""List of ContentElement (or nested Content) objects making up a document.
+	
+	.string is assembled with a single join and cached until the list is
+	altered through any of its list methods; nested Content objects are
+	checked for changes of their own before the cache is reused.
+	Altering .content of an element in place isn't noticed, so elements
+	should be replaced rather than changed once they're in the list."""
+	
 	def __init__(self, initialData=None):
+		self._cachedString = None
+		self._cachedNestedStrings = []
+		self._cachedLines = None
 		#dprint("initialData type: ", type(initialData))
 		if initialData is None:
 			# NOTE: This is a hackaround for an unhandled bug.
@@ -144,19 +243,98 @@ class Content(UserList):
 	def isEmpty(self):
 		return self.content == ""
 			
+	@property
+	def _cacheIsValid(self):
+		"""Whether self._cachedString is still current, including any nested Content objects."""
+		if self._cachedString is None:
+			return False
+		for nested, nestedString in self._cachedNestedStrings:
+			if not nested.string == nestedString:
+				return False
+		return True
+	
+	def _invalidateCache(self):
+		self._cachedString = None
+		self._cachedNestedStrings = []
+		self._cachedLines = None
+		
 	@property
 	def string(self):
-		string = ""
-		for item in self.data:
-			if type(item) is self.__class__:
-				string = string+item.string  
-			else: # Must be ContentElement
-				string = string+item.content
-		return string
+		if not self._cacheIsValid:
+			strings = []
+			nestedStrings = []
+			for item in self.data:
+				if isinstance(item, Content):
+					nestedString = item.string
+					nestedStrings.append((item, nestedString))
+					strings.append(nestedString)
+				else: # Must be ContentElement
+					strings.append(item.content)
+			self._cachedString = "".join(strings)
+			self._cachedNestedStrings = nestedStrings
+			self._cachedLines = None
+		return self._cachedString
 	
 	@property
 	def lines(self):
-		return self.string.split("\n")
+		"""Lines of .string; cached alongside it, so don't alter the returned list."""
+		string = self.string
+		if self._cachedLines is None:
+			self._cachedLines = string.split("\n")
+		return self._cachedLines
+	
+	#=============================
+	# List methods altering the list invalidate the cache.
+	
+	def __setitem__(self, index, item):
+		self._invalidateCache()
+		super().__setitem__(index, item)
+		
+	def __delitem__(self, index):
+		self._invalidateCache()
+		super().__delitem__(index)
+		
+	def __iadd__(self, other):
+		self._invalidateCache()
+		return super().__iadd__(other)
+	
+	def __imul__(self, n):
+		self._invalidateCache()
+		return super().__imul__(n)
+	
+	def append(self, item):
+		self._invalidateCache()
+		super().append(item)
+		
+	def insert(self, index, item):
+		self._invalidateCache()
+		super().insert(index, item)
+		
+	def pop(self, index=-1):
+		self._invalidateCache()
+		return super().pop(index)
+	
+	def remove(self, item):
+		self._invalidateCache()
+		super().remove(item)
+		
+	def clear(self):
+		self._invalidateCache()
+		super().clear()
+		
+	def reverse(self):
+		self._invalidateCache()
+		super().reverse()
+		
+	def sort(self, *args, **kwargs):
+		self._invalidateCache()
+		super().sort(*args, **kwargs)
+		
+	def extend(self, other):
+		self._invalidateCache()
+		super().extend(other)
+		
+	#=============================
 	
 	def getElementIndex(self, element):
 		
@@ -164,23 +342,92 @@ class Content(UserList):
 		
 		index = 0
 		for prospectiveElement in self.data:
-			if prospectiveElement == element:
+			if prospectiveElement is element:
 				return index
 			index += 1
 		raise IndexError("Tried to get index of ContentElement object not in list.")
 	
 	def replaceElement(self, element, replacementElements):
 		"""Replace the specified ContentElement object with a list of ContentElement objects."""
-		index = self.getElementIndex(element)
-		self.pop(index)
-		for replacementElement in reversed(replacementElements):
-			self.insert(index, replacementElement)
+		self.replaceElementAt(self.getElementIndex(element), replacementElements)
+		
+	def replaceElementAt(self, index, replacementElements):
+		"""Replace the ContentElement object at the specified index with a list of ContentElement objects."""
+		self._invalidateCache()
+		self.data[index:index+1] = replacementElements
+		
 	def copy(self):
 		new = self.__class__()
 		for element in self.data:
 			new.append(element)
 		return new
 	
+class SpanContent(Content):
+	
+	"""Content initialized from a string as a single SpanElement.
+	
+	Converted by a SinglePassEngine, the parts of the page which remain
+	unconverted stay SpanElement objects referencing the original string,
+	and new strings only exist for the converted tokens, until .string
+	joins them for the output."""
+	
+	def __init__(self, initialData=None):
+		if isinstance(initialData, str):
+			super().__init__([SpanElement(initialData, 0, len(initialData))])
+		else:
+			super().__init__(initialData)
+			
+class LineStartIndex(object):
+	
+	"""Where the lines of a document begin, by element.
+	
+	Built once per Content object from the newlines of its elements, so
+	conversions of line beginnings look them up rather than each searching
+	for newlines followed by their token. The beginning of the document is a
+	line beginning, as is the beginning of an element following one which
+	ends with a newline. Positions are in the text referenced by
+	ContentElement.span, and elements not available for conversion have none.
+	
+	Takes:
+		- content (Content || [ContentElement])
+		- atLineStart (bool), default: True
+			Whether the content begins a line."""
+	
+	def __init__(self, content, atLineStart=True):
+		self.positions = []
+		for element in content:
+			text, start, end = element.span
+			if element.availableForConversion:
+				self.positions.append(self.__class__.find(text, start, end, atLineStart))
+			else:
+				self.positions.append([])
+			if end > start:
+				atLineStart = text[end-1] == "\n"
+	
+	def __getitem__(self, elementIndex):
+		return self.positions[elementIndex]
+	
+	@staticmethod
+	def find(text, start, end, atLineStart=True):
+		"""Return the line beginnings in text between start and end, in order.
+		A newline at the very end doesn't count, as the line it begins isn't part of the text."""
+		positions = [start] if atLineStart and end > start else []
+		newline = text.find("\n", start, end-1)
+		while newline != -1:
+			positions.append(newline+1)
+			newline = text.find("\n", newline+1, end-1)
+		return positions
+	
+	@staticmethod
+	def match(patterns, text, lineStart, position, end):
+		"""Match patterns, a tuple of a compiled pattern and its "\\n"-prefixed
+		counterpart, at the specified line beginning. The newline preceding
+		the line is matched as well, unless position, where the text not yet
+		converted begins, is past it."""
+		if lineStart > position:
+			return patterns[1].match(text, lineStart-1, end)
+		return patterns[0].match(text, lineStart, end)
+
 class ConvertibleDocument(object):
 	
 	"""Tree of ConvertibleContentElements representing a convertible document."""
@@ -195,9 +442,21 @@ class ConvertibleDocument(object):
 			
 class Conversion(object):
 	
+	# ConversionProfile to record in, set by Conversions.convert when profiling.
+	profile = None
+	
 	def convert(self, content):
 		return content#OVERRIDE
 	
+	@property
+	def singlePassRules(self):
+		
+		"""SinglePassRule objects describing this conversion to a SinglePassEngine.
+		Returns None if the conversion can't be expressed as tokens found
+		in a single scan, which is the default."""
+		
+		return None#OVERRIDE
+
 class ElementByElementConversion(Conversion):
 	
 	"""Replacing ContentElement objects in a Content object with converted ones.
@@ -230,15 +489,38 @@ class ElementByElementConversion(Conversion):
 		return subElements#OVERRIDE
 	
 	def convert(self, content):
-		"""Goes through each ContentElement and converts the ones marked availableForConversion."""
-		alteredContent = content.copy()
+		
+		"""Goes through each ContentElement and converts the ones marked availableForConversion.
+		The converted content is built in one forward sweep over the elements,
+		rather than by replacing elements in a copy one by one, so a pass stays
+		linear in the element count. The specified content is left unaltered."""
+		
+		if self.profile is not None:
+			return self.convertProfiled(content)
+		convertedElements = []
 		for element in content:
 			if element.availableForConversion:
 				subElements = self.getSubElements(element)
-				convertedSubElements = self.convertSubElements(subElements)
-				alteredContent.replaceElement(element, convertedSubElements)
-		return alteredContent
+				convertedElements.extend(self.convertSubElements(subElements))
+			else:
+				convertedElements.append(element)
+		return content.__class__(convertedElements)
 	
+	def convertProfiled(self, content):
+		"""Like .convert, counting the elements split into more than one in .profile."""
+		convertedElements = []
+		elementsSplit = 0
+		for element in content:
+			if element.availableForConversion:
+				subElements = self.convertSubElements(self.getSubElements(element))
+				if len(subElements) > 1:
+					elementsSplit += 1
+				convertedElements.extend(subElements)
+			else:
+				convertedElements.append(element)
+		self.profile.record(self.__class__.__name__, elementsSplit=elementsSplit)
+		return content.__class__(convertedElements)
+
 class ConversionOfBeginEndDelimitedToSomething(ElementByElementConversion):
 	
 	"""Conversion of delimited pieces of content to something else.
@@ -256,6 +538,13 @@ class ConversionOfBeginEndDelimitedToSomething(ElementByElementConversion):
 	
 	BEGIN = None #OVERRIDE
 	END = None #OVERRIDE
+	
+	# What becomes of a BEGIN without an END; see .findEnd.
+	UNCLOSED_LITERAL = "literal"
+	UNCLOSED_TO_END = "toEnd"
+	UNCLOSED = UNCLOSED_LITERAL
+	# Whether the END may be on another line than the BEGIN.
+	SPANS_LINES = True
 	PARTITIONED_BEGIN_END_DELIMITED_ELEMENT_CLASS = NamedTuple("PartitionedBeginEndDelimitedElement", [("beginIndicator", object), ("element", object), ("endIndicator", object)])
 	
 	def __init__(self):
@@ -266,12 +555,12 @@ class ConversionOfBeginEndDelimitedToSomething(ElementByElementConversion):
 	@property
 	def beginAsContentElement(self):
 		"""The BEGIN delimiter initialized as a ContentElement object."""
-		return ContentElement(self.begin, availableForConversion=False)
+		return DelimiterElement.get(self.begin)
 	
 	@property
 	def endAsContentElement(self):
 		"""The END delimiter initialized as a ContentElement object."""
-		return ContentElement(self.end, availableForConversion=False)
+		return DelimiterElement.get(self.end)
 		
 	def convertDelimited(self, partitionedElement):#OVERRIDE
 		"""Converts the specified self.PartitionedBeginEndDelimitedElement.
@@ -306,52 +595,70 @@ class ConversionOfBeginEndDelimitedToSomething(ElementByElementConversion):
 		"""
 		
 		subElements = []
-		unprocessed = element
-		while True:
-			
-			# Get irrelevant part (partitionedByBegin.before) and relevant part plus
-			# the part we'll process in future iterations (partitionedByBegin.after)
-			partitionedByBegin = unprocessed.partition(self.begin)
-			
-			# Are we done?
-			# If partitionedByBegin.after is empty, that means there's nothing left to process.
-			if partitionedByBegin.after.isEmpty:
-				# Unprocessed shall only be added if there's something in it.
-				# This leads to clean and expectable return values with no
-				# unnecessary empty subElements at the end of the list.
-				if not unprocessed.isEmpty:
-					subElements.append(unprocessed)
-				break
-			
-			# Separate relevant part (our sub element) from future iteration part.
-			partitionedByEnd = partitionedByBegin.after.partition(self.end)
-			preceding = partitionedByBegin.before
-			unprocessed = partitionedByEnd.after # for future iterations.
+		text, position, end = element.span
+		beginStart = text.find(self.begin, position, end)
+		while beginStart != -1:
+			contentStart = beginStart+len(self.begin)
+			contentEnd, resumeAt, examinedTo = self.findEnd(text, contentStart, end)
+			if contentEnd is None:
+				# Unclosed; the BEGIN stays part of the text. So does any other BEGIN
+				# up to where the END was looked for, as there's none for them either.
+				beginStart = text.find(self.begin, examinedTo, end)
+				continue
 			subElement = self.PartitionedBeginEndDelimitedElement(\
 				beginIndicator = self.beginAsContentElement,
-				element = partitionedByEnd.before,
+				element = element.piece(contentStart, contentEnd),
 				endIndicator = self.endAsContentElement,
 			)
-			# Add our newly found content elements to the list of elements we'll eventually return.
-			if not preceding.isEmpty:
-				# .partition would have returned an empty string if there was nothing
-				# actually preceding our delimited element. Of course, we don't want
-				# that in the result, as elements in the element tree should only
-				# represent actual content, not emptyness.
-				# That's why preceding only enters the element tree when not empty.
-				subElements.append(preceding)
+			# Elements in the element tree should only represent actual content,
+			# so nothing preceding the delimited element means no element for it.
+			if beginStart > position:
+				subElements.append(element.piece(position, beginStart))
 			
 			# .convertDelimited returns a list of self.PartitionedBeginEndDelimitedElement objects.
 			# Unpack that list, and subsequently unpack the objects and add the resulting
 			# subElements.
 			for convertedSubElement in self.convertDelimited(subElement): # Go through list of subElements.
 				subElements.extend([*convertedSubElement]) #unpack subElement.
-			
+			position = resumeAt
+			beginStart = text.find(self.begin, position, end)
+		
 		# If subElements is still an empty list, we haven't found anything to convert.
 		if not subElements:
-			subElements.append(element)
+			return [element]
+		if end > position:
+			subElements.append(element.piece(position, end))
 		return subElements
 	
+	def findEnd(self, text, contentStart, end):
+		
+		"""Find the END of the region whose content starts at contentStart in text, up to end.
+		
+		Returns a tuple of the position the content ends at, the position after
+		the region, and how far the text had to be looked at to tell.
+		If there's no END (on the same line, unless SPANS_LINES), what becomes
+		of the region is up to UNCLOSED: With UNCLOSED_LITERAL, the position
+		the content ends at is None, and the BEGIN is meant to stay as it is.
+		With UNCLOSED_TO_END, the region extends as far as the END was looked for.
+		A BEGIN at the very end is unclosed either way."""
+		
+		searchEnd = end
+		if not self.__class__.SPANS_LINES:
+			newline = text.find("\n", contentStart, end)
+			if newline != -1:
+				searchEnd = newline
+		contentEnd = text.find(self.end, contentStart, searchEnd)
+		if contentEnd != -1:
+			return (contentEnd, contentEnd+len(self.end), contentEnd+len(self.end))
+		examinedTo = min(searchEnd+1, end)
+		if self.__class__.UNCLOSED == self.__class__.UNCLOSED_TO_END and contentStart < end:
+			return (searchEnd, searchEnd, examinedTo)
+		return (None, contentStart, examinedTo)
+	
+	@property
+	def singlePassRules(self):
+		return [DelimitedRule(self)]
+
 class ConversionOfBeginEndDelimitedToOtherDelimiters(ConversionOfBeginEndDelimitedToSomething):
 	
 	"""Conversion of a set of delimiters to a different set.
@@ -372,9 +679,9 @@ class ConversionOfBeginEndDelimitedToOtherDelimiters(ConversionOfBeginEndDelimit
 	
 	def convertDelimited(self, partitionedElement):
 		return [self.PartitionedBeginEndDelimitedElement(\
-			beginIndicator = ContentElement(self.to_begin, availableForConversion=False),\
+			beginIndicator = DelimiterElement.get(self.to_begin),\
 			element = partitionedElement.element,\
-			endIndicator = ContentElement(self.to_end, availableForConversion=False)
+			endIndicator = DelimiterElement.get(self.to_end)
 			)]
 		
 class ConversionBySingleCodeReplacement(ElementByElementConversion):
@@ -401,7 +708,7 @@ class ConversionBySingleCodeReplacement(ElementByElementConversion):
 		convertedSubElements = []
 		for subElement in subElements:
 			convertedSubElements.append(subElement)
-			convertedSubElements.append(ContentElement(self.new, availableForConversion=False))
+			convertedSubElements.append(DelimiterElement.get(self.new))
 		
 		# To simulate proper "".join() behaviour, cut off the excess we've likely added.
 		# In case the content element in question ended with a formatting indicator, however,
@@ -414,6 +721,10 @@ class ConversionBySingleCodeReplacement(ElementByElementConversion):
 	def getSubElements(self, element):
 		return [ContentElement(subElement) for subElement in element.content.split(self.old)]
 	
+	@property
+	def singlePassRules(self):
+		return [TokenReplacementRule(self.old, self.new)]
+	
 	def convertSubElements(self, subElements):
 		return self.interleaveWithConvertedIndicators(subElements)
 	
@@ -448,65 +759,847 @@ class ConversionByIterativeSingleCodeReplacementAtBeginOfLine(ConversionBySingle
 				maxContentLevel = maxLineLevel
 		return maxContentLevel
 
-class ListConversion(ConversionByIterativeSingleCodeReplacementAtBeginOfLine):
+class LineStartConversion(Conversion):
+	
+	"""Conversion of what lines begin with, e.g. title or list indicators.
+	
+	Line beginnings are looked up in a LineStartIndex of the content rather
+	than searched for as a newline followed by a token, so the first line of
+	the content counts, too. By default, OLD beginning a line is replaced by NEW.
+	Base class meant to be subclassed; for more than that, override:
+	  - .pattern (str): Regular expression source matching what a line begins with.
+	    It mustn't match beyond the end of its line.
+	  - .lookahead (int): How many characters .pattern looks at, at most.
+	  - .lineBeginning: Returns the new line beginning for what .pattern matched.
+	A newline ending the text before a converted line beginning goes with the
+	new line beginning, e.g. "\\n!" becomes "\\n# "."""
+	
+	OLD = None
+	NEW = None
+	
+	# Compiled .pattern of every subclass, by class.
+	_compiledPatterns = {}
+	
+	@property
+	def pattern(self):
+		return re.escape(self.__class__.OLD)#OVERRIDE
+	
+	@property
+	def priority(self):
+		"""Minimum length of what .pattern matches; see SinglePassRule.priority."""
+		return len(self.__class__.OLD)#OVERRIDE
+	
+	@property
+	def lookahead(self):
+		return len(self.__class__.OLD)#OVERRIDE
+	
+	def lineBeginning(self, old):
+		return self.__class__.NEW#OVERRIDE
+	
+	@property
+	def compiledPatterns(self):
+		"""Tuple of .pattern compiled as it is and preceded by a newline; see LineStartIndex.match."""
+		compiledPatterns = LineStartConversion._compiledPatterns.get(self.__class__)
+		if compiledPatterns is None:
+			compiledPatterns = LineStartConversion._compiledPatterns[self.__class__] =\
+				(re.compile(self.pattern), re.compile("\n(?:{pattern})".format(pattern=self.pattern)))
+		return compiledPatterns
+	
+	def convertLineBeginning(self, newline, old):
+		"""Return the DelimiterElement replacing old, and the newline preceding it if it's matched too."""
+		return DelimiterElement.get(newline+self.lineBeginning(old))
+	
+	@property
+	def singlePassRules(self):
+		return [LineStartRule(self)]
+	
+	def convertLineStarts(self, element, lineStarts):
+		"""Convert the beginnings of the lines beginning at the specified positions of the element.
+		Returns the list of ContentElement objects replacing it."""
+		text, position, end = element.span
+		subElements = []
+		for lineStart in lineStarts:
+			match = LineStartIndex.match(self.compiledPatterns, text, lineStart, position, end)
+			if match is None:
+				continue
+			newline = "\n" if lineStart > position else ""
+			subElements.append(element.piece(position, match.start()))
+			subElements.append(self.convertLineBeginning(newline, match.group()[len(newline):]))
+			position = match.end()
+		subElements.append(element.piece(position, end))
+		return subElements
 	
 	def convert(self, content):
-		
-		"""Convert nested lists from PmWiki to Markdown.
-		The class attribute OLD just takes the basic indication character
-		used to indicate a certain type of PmWiki list.
-		The class attribute NEW works the same, but for the markdown
-		counterpart."""
-		
-		# Technically, this first takes the OLD and NEW indicators
-		# as they were specified as class attributes and then
-		# assembles the actual, final indicators that will be used
-		# for conversion by the base class.
-		
-		# 'old' and 'new' as originally specified when the conversion rules were defined
-		# (e.g. as OLD and NEW class attributes). These will then get added up as the conversion
-		# code descends into deeper nested list levels (e.g. "*" becomes "***" on the third level
-		# of nesting).
-		
-		contentBeforeConversion = content
-		convertedContent = None
-		
-		# We set -1 as the range's step value to go from the highest level to the lowest.
-		# This we do so, for example, "***" get's replaced before a lower level replacement
-		# iteration has a chance of replacing "*" of "***", turning it into "**".
-		for level in range(self.highestLevel(content)+1, 0, -1):
-			# We spoof what we need to for our parent class to be none the wiser.
-			self.old = os.linesep+self.oldByLevel(level)#+" "
-			self.new = os.linesep+"  "*level+self.newByLevel(1)+" "
-			
-			# Our parent class can take over.
-			convertedContent = super().convert(contentBeforeConversion)
+		"""Convert the line beginnings of every ContentElement marked availableForConversion."""
+		lineStartIndex = LineStartIndex(content)
+		convertedElements = []
+		elementsSplit = 0
+		for elementIndex, element in enumerate(content):
+			if element.availableForConversion and lineStartIndex[elementIndex]:
+				subElements = self.convertLineStarts(element, lineStartIndex[elementIndex])
+				if len(subElements) > 1:
+					elementsSplit += 1
+				convertedElements.extend(subElements)
+			else:
+				convertedElements.append(element)
+		if self.profile is not None:
+			self.profile.record(self.__class__.__name__, elementsSplit=elementsSplit)
+		return content.__class__(convertedElements)
+
+class ListConversion(LineStartConversion):
+	
+	"""Converts nested PmWiki lists to Markdown, every line beginning in one go.
+	
+	A line beginning with a run of list indicators (see INDICATORS), e.g. "**"
+	or "*#", is a list item nested as deep as the run is long. Its last indicator
+	determines the kind of item, so the conversion whose OLD it is converts
+	the line beginning; e.g. "*#" is a numbered item nested in a bulleted one.
+	As the depth is taken from the run, deep outlines take no more passes than
+	flat ones.
+	
+	The class attribute OLD is the indicator of the kind of PmWiki list
+	this converts, NEW is its Markdown counterpart."""
+	
+	# All PmWiki list indicators, which may mix in one run.
+	INDICATORS = "*#"
+	
+	@property
+	def pattern(self):
+		indicators = "[{indicators}]".format(indicators=re.escape(self.__class__.INDICATORS))
+		return "{indicators}*{old}(?!{indicators})".format(indicators=indicators,\
+			old=re.escape(self.__class__.OLD))
+	
+	@property
+	def lookahead(self):
+		# A run reaching the end of the text matches up to there, so how far
+		# it goes on is never decided beyond the end of the match.
+		return len(self.__class__.OLD)
+	
+	def indicatorsByLevel(self, level):
+		"""Return a tuple of the old and the new line beginning for the specified level.
+		Example: For level 2 of a "*" to "-" list, that'd be ("\\n**", "\\n    - ")."""
+		old = self.__class__.OLD*level
+		return ("\n"+old, "\n"+self.lineBeginning(old))
+	
+	def lineBeginning(self, indicators):
+		"""Return the new line beginning for a run of indicators, e.g. "    1. " for "*#"."""
+		return "  "*len(indicators)+self.__class__.NEW+" "
+
+class ConversionProfile(object):
+	
+	"""Wall time and counters of conversions, by conversion class name.
+	
+	Every entry has:
+	  - calls: How often the conversion ran; passes, or tokens found by a single pass.
+	  - seconds: Wall time spent in it.
+	  - elementsBefore, elementsAfter: Number of ContentElement objects before and after.
+	  - elementsSplit: How many elements got replaced by more than one.
+	  - bytesDelta: UTF-8 bytes added, or removed if negative.
+	Profiles add up by .merge, e.g. those of all files of a run."""
+	
+	FIELDS = ("calls", "seconds", "elementsBefore", "elementsAfter", "elementsSplit", "bytesDelta")
+	
+	def __init__(self, entries=None):
+		self.entries = entries if entries else {}
+	
+	@staticmethod
+	def byteLength(text):
+		return len(text.encode("utf-8", "surrogatepass"))
+	
+	def record(self, name, **counts):
+		"""Add the specified counts (keyword arguments named after FIELDS) to the entry of name."""
+		entry = self.entries.get(name)
+		if entry is None:
+			entry = self.entries[name] = dict.fromkeys(self.__class__.FIELDS, 0)
+		for field, count in counts.items():
+			entry[field] += count
+	
+	def merge(self, other):
+		"""Add the entries of another ConversionProfile to this one; returns self (chainable)."""
+		for name, entry in other.entries.items():
+			self.record(name, **entry)
+		return self
+	
+	@property
+	def asDict(self):
+		return {name: dict(entry) for name, entry in self.entries.items()}
 
-			
-			# There might be a better way to determine that
-			# there are no lists of any greater levels anymore.
-			# Right now, we're just looking at whether there
-			# was anything to convert during the last pass.
-			if not len(convertedContent) == len(contentBeforeConversion):
-				contentBeforeConversion = convertedContent
-			level += 1
-		
-		if not convertedContent == None:
-			return convertedContent
-		else:
-			return contentBeforeConversion
-		
 class Conversions(UserList):
 	
 	def __init__(self, *conversions):
 		self.data = conversions
 		
+	@property
+	def fingerprint(self):
+		
+		"""Hash identifying how this converts.
+		Changes whenever conversions are added, removed, reordered or configured
+		differently through their upper case class attributes (OLD, NEW, BEGIN, END, ...),
+		and when a different Conversions class runs them."""
+		
+		description = [[Class.__qualname__ for Class in self.__class__.__mro__]]
+		for Conversion in self.data:
+			attributes = [(name, getattr(Conversion, name)) for name in dir(Conversion)\
+				if name.isupper() and isinstance(getattr(Conversion, name), str)]
+			description.append([Conversion.__module__, Conversion.__qualname__, attributes])
+		return hashlib.sha256(repr(description).encode("utf-8")).hexdigest()
+	
+	# Whether the conversions are converted by a SinglePassEngine; see SinglePassConversions.
+	singlePass = False
+	
+	def compile(self):
+		"""Return the ConversionPipeline of these conversions.
+		It's compiled on first use in a process, and reused from then on
+		by every Conversions object of the same class and conversions."""
+		key = (self.__class__, tuple(self.data))
+		pipeline = _compiledPipelines.get(key)
+		if pipeline is None:
+			pipeline = _compiledPipelines[key] = ConversionPipeline(self)
+			if log.debug:
+				log.debug("Compiled pipeline of", len(self.data), "conversions for", self.__class__.__name__)
+		return pipeline
+	
+	def convert(self, content, profile=None):
+		"""Convert the content with every conversion in turn; see ConversionPipeline.convert."""
+		return self.compile().convert(content, profile)
+	
+	def convertChunks(self, chunks, profile=None):
+		"""Convert text arriving as an iterable of strings; see ConversionPipeline.convertChunks."""
+		return self.compile().convertChunks(chunks, profile)
+	
+	def convertMany(self, texts, profile=None):
+		"""Convert many page texts (str) at once; see ConversionPipeline.convertMany."""
+		return self.compile().convertMany(texts, profile)
+
+# ConversionPipeline objects by Conversions class and conversions; see Conversions.compile.
+_compiledPipelines = {}
+
+#==========================================================
+# Single pass conversion
+#==========================================================
+
+class SinglePassRule(object):
+	
+	"""A kind of token a SinglePassEngine looks for, and what to emit for it.
+	
+	Base class meant to be subclassed:
+	  - .pattern (str): Regular expression source matching the token.
+	  - .priority (int): Tokens found at the same position are tried in
+	    descending order of priority, which is their (minimum) length, so
+	    the longest token wins; e.g. "'''''" before "'''" before "''".
+	  - .lookahead (int): How many characters .pattern looks at, at most,
+	    unless whatever it matches extends to the end of the text anyway.
+	    Defaults to .priority, which is right for fixed tokens.
+	  - .lineStart (bool): Whether the token is only found at line beginnings
+	    (see LineStartIndex) rather than anywhere.
+	  - .firstCharacters (None || str): The characters the token can begin with,
+	    if known; None, the default, means any. If every token's are known,
+	    the engine only tries its alternation where one of them is.
+	  - .emit: Appends the elements for a match of the element being
+	    scanned and returns the position in match.string the scan resumes at.
+	    The scan ends at match.endpos, which isn't necessarily the end of
+	    match.string, as SpanElement objects are scanned in their source.
+	    Text beyond limit may yet change (see SinglePassEngine.convertChunks),
+	    so if what to emit depends on it, a position beyond limit is to be
+	    returned, which has the match wait for more text. memo is a dict
+	    for rules to remember things about the text for the rest of the scan.
+	  - .mayEnd: Whether a match waiting for more text may be done waiting
+	    once text[start:] is known, text up to start not having been enough.
+	    text begins .endContext characters before start, or at the match,
+	    if that's closer. By default, it may, so the match is tried again
+	    whenever text arrives."""
+	
+	lineStart = False
+	endContext = 0
+	
+	@property
+	def pattern(self):
+		return ""#OVERRIDE
+	
+	@property
+	def priority(self):
+		return 0#OVERRIDE
+	
+	@property
+	def lookahead(self):
+		return self.priority#OVERRIDE
+	
+	@property
+	def firstCharacters(self):
+		return None#OVERRIDE
+	
+	def emit(self, engine, element, match, elements, limit, memo):#OVERRIDE
+		return match.end()
+	
+	def mayEnd(self, text, start):
+		return True#OVERRIDE
+
+class TokenReplacementRule(SinglePassRule):
+	
+	"""Replaces every occurrence of a token with a fixed string."""
+	
+	def __init__(self, old, new):
+		if not old:
+			raise ConversionError("Can't look for an empty token.")
+		self.old = old
+		self.new = new
+	
+	@property
+	def pattern(self):
+		return re.escape(self.old)
+	
+	@property
+	def firstCharacters(self):
+		return self.old[0]
+	
+	@property
+	def priority(self):
+		return len(self.old)
+	
+	def emit(self, engine, element, match, elements, limit, memo):
+		if self.new:
+			elements.append(DelimiterElement.get(self.new))
+		return match.end()
+
+class LineStartRule(SinglePassRule):
+	
+	"""Converts a line beginning as its LineStartConversion would.
+	Found at line beginnings only, with the newline preceding the line
+	unless the scan is past it already; see LineStartIndex.match."""
+	
+	lineStart = True
+	
+	def __init__(self, conversion):
+		self.conversion = conversion
+	
+	@property
+	def pattern(self):
+		return self.conversion.pattern
+	
+	@property
+	def priority(self):
+		return self.conversion.priority
+	
+	@property
+	def lookahead(self):
+		return self.conversion.lookahead
+	
+	def emit(self, engine, element, match, elements, limit, memo):
+		old = match.group(match.lastgroup)
+		newline = match.string[match.start():match.start(match.lastgroup)]
+		elements.append(self.conversion.convertLineBeginning(newline, old))
+		return match.end()
+
+class TableRule(SinglePassRule):
+	
+	"""Converts a block of table rows as its Pmwiki2MdTableConversion would,
+	converting the text of every cell with the engine first."""
+	
+	lineStart = True
+	
+	def __init__(self, conversion):
+		self.conversion = conversion
+	
+	@property
+	def pattern(self):
+		return re.escape(self.conversion.OLD)
+	
+	@property
+	def priority(self):
+		return len(self.conversion.OLD)
+	
+	def emit(self, engine, element, match, elements, limit, memo):
+		tableStart = match.start(match.lastgroup)
+		tableEnd, examinedTo = self.conversion.findTableEnd(match.string, tableStart, match.endpos)
+		if examinedTo > limit:
+			return examinedTo
+		if tableStart > match.start():
+			elements.append(element.piece(match.start(), tableStart))
+		def convertText(text):
+			return "".join([convertedElement.content\
+				for convertedElement in engine.convertElement(ContentElement(text), ())])
+		elements.append(self.conversion.convertTable(match.string[tableStart:tableEnd], convertText))
+		return tableEnd
+	
+	@property
+	def endContext(self):
+		return len(self.conversion.OLD)
+	
+	def mayEnd(self, text, start):
+		"""Whether a line that isn't a table row has begun. A line that has begun with
+		less than OLD is told by the next chunk, which comes with the end of this one."""
+		old = self.conversion.OLD
+		newline = text.find("\n", max(start-len(old), 0))
+		while newline != -1 and newline+1+len(old) <= len(text):
+			if not text.startswith(old, newline+1):
+				return True
+			newline = text.find("\n", newline+1)
+		return False
+
+class DelimitedRule(SinglePassRule):
+	
+	"""Finds a BEGIN/END delimited region and has the conversion convert it.
+	Elements of the converted region which are still available for conversion
+	are scanned again, so, for example, a link name gets its emphasis converted."""
+	
+	def __init__(self, conversion):
+		self.conversion = conversion
+	
+	@property
+	def pattern(self):
+		return re.escape(self.conversion.begin)
+	
+	@property
+	def firstCharacters(self):
+		return self.conversion.begin[0]
+	
+	@property
+	def priority(self):
+		return len(self.conversion.begin)
+	
+	@property
+	def endContext(self):
+		return len(self.conversion.end)-1
+	
+	def mayEnd(self, text, start):
+		"""Whether the END, or a newline if the region can't span lines, may have arrived."""
+		if not self.conversion.SPANS_LINES and text.find("\n", start) != -1:
+			return True
+		return text.find(self.conversion.end, max(start-self.endContext, 0)) != -1
+	
+	def emit(self, engine, element, match, elements, limit, memo):
+		
+		contentStart = match.end()
+		
+		# Where an END was looked for in vain for an earlier BEGIN, there's none for this one either.
+		if contentStart < memo.get(self, -1):
+			elements.append(element.piece(match.start(), contentStart))
+			return contentStart
+		
+		contentEnd, resumeAt, examinedTo = self.conversion.findEnd(match.string, contentStart, match.endpos)
+		if examinedTo > limit:
+			return examinedTo
+		
+		# Unclosed; the BEGIN stays as it is.
+		if contentEnd is None:
+			memo[self] = examinedTo
+			elements.append(element.piece(match.start(), contentStart))
+			return contentStart
+		
+		partitionedElement = self.conversion.PartitionedBeginEndDelimitedElement(\
+			beginIndicator = self.conversion.beginAsContentElement,
+			element = element.piece(contentStart, contentEnd),
+			endIndicator = self.conversion.endAsContentElement,
+		)
+		for convertedPartitionedElement in self.conversion.convertDelimited(partitionedElement):
+			for convertedElement in convertedPartitionedElement:
+				if convertedElement.availableForConversion:
+					elements.extend(engine.convertElement(convertedElement))
+				else:
+					elements.append(convertedElement)
+		return resumeAt
+
+class SinglePassEngine(object):
+	
+	"""Converts content with the rules of all its conversions in one scan.
+	
+	Instead of running one pass per conversion, the tokens of all conversions
+	are compiled into one regular expression alternation, ordered by
+	SinglePassRule.priority. Every element available for conversion is then
+	scanned once from left to right, and each token found is converted by
+	the rule it belongs to right away.
+	If the characters every token can begin with are known, the alternation is
+	prefixed with a lookahead for them, so the regular expression engine
+	skips ahead to the next candidate position instead of trying every
+	alternative at every position.
+	Rules of line beginnings are compiled into an alternation of their own,
+	which is only tried at the line beginnings of a LineStartIndex built
+	once per document.
+	
+	Takes:
+		conversions ([Conversion])
+			Conversion classes, each of which has to provide .singlePassRules."""
+	
+	def __init__(self, conversions):
+		self.rules = {}
+		# Names of the conversion classes the rules belong to, by group name.
+		self.conversionNames = {}
+		rules = []
+		for Conversion in conversions:
+			conversionRules = Conversion().singlePassRules
+			if conversionRules is None:
+				raise ConversionError("{name} can't be converted in a single pass."\
+					.format(name=Conversion.__name__))
+			rules.extend([(rule, Conversion.__name__) for rule in conversionRules])
+		
+		# sorted() is stable, so rules of equal priority keep their order.
+		alternatives = []
+		lineStartAlternatives = []
+		firstCharacters = set()
+		for index, (rule, conversionName) in enumerate(sorted(rules, key=lambda rule: -rule[0].priority)):
+			groupName = "r{index}".format(index=index)
+			self.rules[groupName] = rule
+			self.conversionNames[groupName] = conversionName
+			alternative = "(?P<{name}>{pattern})".format(name=groupName, pattern=rule.pattern)
+			if rule.lineStart:
+				lineStartAlternatives.append(alternative)
+			else:
+				alternatives.append(alternative)
+				if firstCharacters is not None and rule.firstCharacters:
+					firstCharacters.update(rule.firstCharacters)
+				else:
+					firstCharacters = None
+		if alternatives:
+			pattern = "|".join(alternatives)
+			if firstCharacters:
+				pattern = "(?=[{characters}])(?:{pattern})".format(pattern=pattern,\
+					characters="".join([re.escape(character) for character in sorted(firstCharacters)]))
+			self.pattern = re.compile(pattern)
+		else:
+			self.pattern = None
+		if lineStartAlternatives:
+			lineStartPattern = "|".join(lineStartAlternatives)
+			self.lineStartPatterns = (re.compile(lineStartPattern),\
+				re.compile("\n(?:{pattern})".format(pattern=lineStartPattern)))
+		else:
+			self.lineStartPatterns = None
+		
+		# How far beyond a position text has to be known for a token found
+		# at that position to be the same one the whole text would yield.
+		# Line beginnings are matched along with the newline preceding them.
+		self.lookahead = max([rule.lookahead+(1 if rule.lineStart else 0)\
+			for rule, conversionName in rules]) if rules else 0
+		# How much of the text before a chunk rules need to tell whether a match may end in it.
+		self.endContext = max([rule.endContext for rule, conversionName in rules]) if rules else 0
+	
+	def scan(self, element, elements, limit=None, lineStarts=(), waiting=None):
+		
+		"""Convert the specified ContentElement, appending the results to the specified list.
+		
+		The element's .span is scanned, so a SpanElement is scanned in its source
+		and the unconverted parts between tokens become pieces of the same source.
+		Rules of line beginnings are tried at the specified line beginnings,
+		positions in the same text as .span (see LineStartIndex), before any
+		token found from there on.
+		
+		If a limit (a position in the text referenced by .span) is specified,
+		the scan stops before the first token which starts at or reaches beyond it,
+		and everything before that is converted exactly as it would be if the
+		scan went on. Returns the position the conversion got up to. If a list is
+		specified as waiting, the rule of a match the scan stopped at to wait for
+		more text is appended to it; the match starts at the returned position."""
+		
+		text, position, end = element.span
+		if limit is None:
+			limit = end
+		stop = limit
+		memo = {}
+		lineStarts = iter(lineStarts if self.lineStartPatterns is not None else ())
+		lineStart = next(lineStarts, None)
+		token = self.pattern.search(text, position, end) if self.pattern is not None else None
+		while True:
+			match = None
+			while lineStart is not None and (token is None or lineStart <= token.start()):
+				if lineStart >= position:
+					match = LineStartIndex.match(self.lineStartPatterns, text, lineStart, position, end)
+					if match is not None:
+						break
+				lineStart = next(lineStarts, None)
+			if match is None:
+				match = token
+			if match is None or match.start() >= limit:
+				break
+			matchElements = []
+			resumeAt = self.rules[match.lastgroup].emit(self, element, match, matchElements, limit, memo)
+			if resumeAt > limit:
+				stop = match.start()
+				if waiting is not None:
+					waiting.append(self.rules[match.lastgroup])
+				break
+			if match.start() > position:
+				elements.append(element.piece(position, match.start()))
+			elements.extend(matchElements)
+			position = resumeAt
+			if token is not None and token.start() < position:
+				token = self.pattern.search(text, position, end)
+		if stop > position:
+			elements.append(element.piece(position, stop))
+			position = stop
+		return position
+	
+	def convertElement(self, element, lineStarts=None):
+		"""Convert the specified ContentElement and return a list of ContentElement objects.
+		If its line beginnings aren't specified, those following its newlines are used,
+		as the element isn't known to begin a line."""
+		if lineStarts is None:
+			lineStarts = LineStartIndex.find(*element.span, atLineStart=False)
+		if (self.pattern is None or self.pattern.search(*element.span) is None)\
+			and (self.lineStartPatterns is None or not lineStarts):
+			# Nothing to convert.
+			return [element]
+		elements = []
+		self.scan(element, elements, lineStarts=lineStarts)
+		return elements
+	
+	def convertChunks(self, chunks):
+		
+		"""Convert text arriving as an iterable of strings, yielding converted strings.
+		
+		Text is converted as soon as it's known well enough to convert it the same
+		way as the whole text would be, and only the rest is kept for the next chunk.
+		That's everything before a token which might continue in a chunk yet to come,
+		such as a delimited region whose END hasn't arrived; a BEGIN thus keeps
+		text pending until its END, the end of its line if the region can't span
+		lines, or the end of the text.
+		While such a token waits, the pending text isn't scanned again until its
+		rule tells the text which arrived since may end it (see SinglePassRule.mayEnd),
+		so a long region is looked for its END in once, not once per chunk.
+		The concatenated output equals that of converting the concatenated input."""
+		
+		if self.pattern is None and self.lineStartPatterns is None:
+			yield from chunks
+			return
+		pendingChunks = []
+		pendingLength = 0
+		# Whether the pending text begins a line.
+		atLineStart = True
+		# Rule of the token at the beginning of the pending text waiting for more text, if any,
+		# and the end of the pending text, from where it may end on, less its .endContext.
+		waitingRule = None
+		waitingText = ""
+		waitingFrom = 0
+		for chunk in chunks:
+			pendingChunks.append(chunk)
+			pendingLength += len(chunk)
+			if waitingRule is not None:
+				text = waitingText+chunk
+				start = waitingFrom
+				waitingText = text[max(len(text)-self.endContext, 0):]
+				waitingFrom = len(waitingText)
+				if not waitingRule.mayEnd(text, start):
+					continue
+			limit = pendingLength-self.lookahead
+			if limit <= 0:
+				continue
+			pending = "".join(pendingChunks)
+			elements = []
+			waiting = []
+			position = self.scan(SpanElement(pending, 0, len(pending)), elements, limit,\
+				LineStartIndex.find(pending, 0, len(pending), atLineStart), waiting)
+			if position > 0:
+				yield "".join([element.content for element in elements])
+				atLineStart = pending[position-1] == "\n"
+				pending = pending[position:]
+			pendingChunks = [pending]
+			pendingLength = len(pending)
+			waitingRule = waiting[0] if waiting else None
+			if waitingRule is not None:
+				# The text beyond the limit wasn't enough to go by yet.
+				waitingStart = max(limit-position-self.endContext, 0)
+				waitingText = pending[waitingStart:]
+				waitingFrom = limit-position-waitingStart
+		pending = "".join(pendingChunks)
+		if pending:
+			yield "".join([element.content for element in self.convertElement(ContentElement(pending),\
+				LineStartIndex.find(pending, 0, len(pending), atLineStart))])
+	
+	def convertMany(self, texts):
+		
+		"""Convert every page text (str) of the specified iterable; returns a list of the converted texts.
+		
+		Meant for many small pages, for which setting up a Content object and its
+		LineStartIndex costs about as much as converting. Every page is scanned
+		as a SpanElement of its own, which no token reaches beyond, and its
+		converted elements are joined right away. The results equal converting
+		every page as SpanContent by itself."""
+		
+		converted = []
+		for text in texts:
+			elements = []
+			self.scan(SpanElement(text, 0, len(text)), elements,\
+				lineStarts=LineStartIndex.find(text, 0, len(text)) if self.lineStartPatterns is not None else ())
+			converted.append("".join([element.content for element in elements]))
+		return converted
+	
 	def convert(self, content):
+		"""Convert every ContentElement marked availableForConversion and return a new Content object."""
+		lineStartIndex = LineStartIndex(content) if self.lineStartPatterns is not None else None
+		convertedElements = []
+		for elementIndex, element in enumerate(content):
+			if element.availableForConversion:
+				convertedElements.extend(self.convertElement(element,\
+					lineStartIndex[elementIndex] if lineStartIndex is not None else ()))
+			else:
+				convertedElements.append(element)
+		return content.__class__(convertedElements)
+
+class ProfiledRule(SinglePassRule):
+	
+	"""Wraps a SinglePassRule, recording every token it converts in a ConversionProfile.
+	What a token's entry records includes converting what it delimits, e.g. emphasis in a link name,
+	which is also recorded on its own."""
+	
+	def __init__(self, rule, name, profile):
+		self.rule = rule
+		self.name = name
+		self.profile = profile
+	
+	def emit(self, engine, element, match, elements, limit, memo):
+		firstEmitted = len(elements)
+		start = time.perf_counter()
+		resumeAt = self.rule.emit(engine, element, match, elements, limit, memo)
+		seconds = time.perf_counter()-start
+		text, elementStart, elementEnd = element.span
+		emitted = elements[firstEmitted:]
+		self.profile.record(self.name, calls=1, seconds=seconds,\
+			elementsBefore=1, elementsAfter=len(emitted),\
+			elementsSplit=1 if match.start() > elementStart or resumeAt < elementEnd else 0,\
+			bytesDelta=sum([ConversionProfile.byteLength(emittedElement.content) for emittedElement in emitted])\
+				-ConversionProfile.byteLength(text[match.start():resumeAt]))
+		return resumeAt
+	
+	@property
+	def endContext(self):
+		return self.rule.endContext
+	
+	def mayEnd(self, text, start):
+		return self.rule.mayEnd(text, start)
+
+class ProfilingSinglePassEngine(SinglePassEngine):
+	
+	"""A SinglePassEngine recording its conversions in a ConversionProfile.
+	Shares the compiled rules of the specified engine, so making one per
+	conversion is cheap, and the engine itself is left without any overhead.
+	Besides an entry per conversion class, the whole scan is recorded as TOTAL."""
+	
+	TOTAL = "SinglePassEngine"
+	
+	def __init__(self, engine, profile):
+		self.rules = {groupName: ProfiledRule(rule, engine.conversionNames[groupName], profile)\
+			for groupName, rule in engine.rules.items()}
+		self.conversionNames = engine.conversionNames
+		self.pattern = engine.pattern
+		self.lineStartPatterns = engine.lineStartPatterns
+		self.lookahead = engine.lookahead
+		self.endContext = engine.endContext
+		self.profile = profile
+	
+	def convert(self, content):
+		start = time.perf_counter()
+		convertedContent = super().convert(content)
+		seconds = time.perf_counter()-start
+		self.profile.record(self.__class__.TOTAL, calls=1, seconds=seconds,\
+			elementsBefore=len(content), elementsAfter=len(convertedContent),\
+			bytesDelta=ConversionProfile.byteLength(convertedContent.string)\
+				-ConversionProfile.byteLength(content.string))
+		return convertedContent
+
+class SinglePassConversions(Conversions):
+	
+	"""Conversions converted by a SinglePassEngine rather than one pass each.
+	The engine is built when the conversions are compiled; see Conversions.compile."""
+	
+	singlePass = True
+	
+	@property
+	def engine(self):
+		return self.compile().engine
+
+class ConversionPipeline(object):
+	
+	"""Conversions compiled for converting any number of documents.
+	
+	Compiling instantiates every conversion once and, for SinglePassConversions,
+	builds the SinglePassEngine with the tokens and DelimiterElement objects of
+	all conversions, rejecting tokens claimed by more than one of them.
+	Nothing about a pipeline changes while it converts, so it's reused for
+	every document, and can be shared by threads. Usually obtained by
+	Conversions.compile, rather than by instantiating it directly.
+	
+	Takes:
+		- conversions (Conversions)
+	Has:
+		- spanningDelimiters ((str, str)): BEGIN and END of every delimited
+		  conversion whose regions may span lines, so a text can be told
+		  to have none left open at some point (see lib.cache)."""
+	
+	def __init__(self, conversions):
+		instances = tuple([Conversion() for Conversion in conversions.data])
+		self.__class__.checkConflicts(instances)
+		attributes = {\
+			"conversionClasses": tuple(conversions.data),\
+			"conversions": instances,\
+			"engine": SinglePassEngine(conversions.data) if conversions.singlePass else None,\
+			"fingerprint": conversions.fingerprint,\
+			"spanningDelimiters": tuple([(conversion.begin, conversion.end) for conversion in instances\
+				if isinstance(conversion, ConversionOfBeginEndDelimitedToSomething) and conversion.SPANS_LINES])}
+		for name, value in attributes.items():
+			object.__setattr__(self, name, value)
+	
+	def __setattr__(self, name, value):
+		raise AttributeError("ConversionPipeline objects are immutable.")
+	
+	@staticmethod
+	def checkConflicts(conversions):
+		"""Raise a ConversionError if two of the specified Conversion objects convert the same token,
+		as only one of them would ever get to convert it."""
+		claimedBy = {}
+		for conversion in conversions:
+			for rule in conversion.singlePassRules or []:
+				token = (rule.lineStart, rule.pattern)
+				if token in claimedBy and claimedBy[token] is not conversion:
+					raise ConversionError("{first} and {second} both convert {token!r}.".format(\
+						first=claimedBy[token].__class__.__name__, second=conversion.__class__.__name__,\
+						token=rule.pattern))
+				claimedBy[token] = conversion
+	
+	def convert(self, content, profile=None):
+		"""Convert the content and return a new Content object.
+		If a ConversionProfile is specified, every conversion gets recorded in it."""
+		if self.engine is not None:
+			if profile is None:
+				return self.engine.convert(content)
+			return ProfilingSinglePassEngine(self.engine, profile).convert(content)
+		if profile is not None:
+			return self.convertProfiled(content, profile)
 		contentBeingConverted = content
-		for Conversion in self.data:
-			contentBeingConverted = Conversion().convert(contentBeingConverted)
+		for conversion in self.conversions:
+			contentBeingConverted = conversion.convert(contentBeingConverted)
 		return contentBeingConverted
 	
+	def convertMany(self, texts, profile=None):
+		"""Convert every page text (str) of the specified iterable; returns a list of the converted texts.
+		With SinglePassConversions, and without a profile, the setup per page is
+		skipped (see SinglePassEngine.convertMany); the results are the same either way."""
+		if self.engine is None or profile is not None:
+			return [self.convert(SpanContent(text), profile).string for text in texts]
+		return self.engine.convertMany(texts)
+	
+	def convertProfiled(self, content, profile):
+		# The conversions record in the profile, so they're not the shared ones.
+		contentBeingConverted = content
+		for Conversion in self.conversionClasses:
+			conversion = Conversion()
+			conversion.profile = profile
+			contentBeforeConversion = contentBeingConverted
+			start = time.perf_counter()
+			contentBeingConverted = conversion.convert(contentBeforeConversion)
+			seconds = time.perf_counter()-start
+			profile.record(Conversion.__name__, calls=1, seconds=seconds,\
+				elementsBefore=len(contentBeforeConversion), elementsAfter=len(contentBeingConverted),\
+				bytesDelta=ConversionProfile.byteLength(contentBeingConverted.string)\
+					-ConversionProfile.byteLength(contentBeforeConversion.string))
+		return contentBeingConverted
+	
+	def convertChunks(self, chunks, profile=None):
+		"""Convert text arriving as an iterable of strings; see SinglePassEngine.convertChunks.
+		Needs SinglePassConversions."""
+		if self.engine is None:
+			raise ConversionError("Converting in chunks needs SinglePassConversions.")
+		if profile is None:
+			return self.engine.convertChunks(chunks)
+		return ProfilingSinglePassEngine(self.engine, profile).convertChunks(chunks)
+
 #==========================================================
 # Conversions
 #==========================================================
@@ -563,15 +1656,112 @@ class Pmwiki2MdBigBigEndConversion(ConversionBySingleCodeReplacement):
 	NEW = "</sup>"
 
 # Titles/Headers
-class Pmwiki2MdTitle1Conversion(ConversionBySingleCodeReplacement):
-	OLD = "\n!"
-	NEW = "\n# "
-class Pmwiki2MdTitle2Conversion(ConversionBySingleCodeReplacement):
-	OLD = "\n!!"
-	NEW = "\n## "
-class Pmwiki2MdTitle3Conversion(ConversionBySingleCodeReplacement):
-	OLD = "\n!!!"
-	NEW = "\n### "
+class Pmwiki2MdTitle1Conversion(LineStartConversion):
+	OLD = "!"
+	NEW = "# "
+class Pmwiki2MdTitle2Conversion(LineStartConversion):
+	OLD = "!!"
+	NEW = "## "
+class Pmwiki2MdTitle3Conversion(LineStartConversion):
+	OLD = "!!!"
+	NEW = "### "
+
+# Indentation and blocks
+class Pmwiki2MdIndentConversion(LineStartConversion):
+	
+	"""Converts indented lines ("->", "-->", ...) to block quotes nested as deep."""
+	
+	OLD = "->"
+	NEW = "> "
+	MAX_LEVEL = 8
+	
+	@property
+	def pattern(self):
+		return "-{{1,{maxLevel}}}>".format(maxLevel=self.__class__.MAX_LEVEL)
+	
+	@property
+	def lookahead(self):
+		return self.__class__.MAX_LEVEL+1
+	
+	def lineBeginning(self, old):
+		return self.__class__.NEW*(len(old)-1)
+
+class Pmwiki2MdDivBlockConversion(LineStartConversion):
+	
+	"""Removes the markup of styled blocks (">>frame<<", ">><<"), which Markdown has no equivalent for.
+	The text of the block is kept as it is."""
+	
+	OLD = ">>"
+	NEW = ""
+	MAX_LENGTH = 128
+	
+	@property
+	def pattern(self):
+		return ">>[^\n]{{0,{maxLength}}}?<<".format(maxLength=self.__class__.MAX_LENGTH)
+	
+	@property
+	def priority(self):
+		return len(">><<")
+	
+	@property
+	def lookahead(self):
+		return self.__class__.MAX_LENGTH+len(">><<")
+
+# Tables
+class Pmwiki2MdTableConversion(Conversion):
+	
+	"""Converts PmWiki tables, blocks of lines beginning with "||", to GitHub flavoured
+	Markdown tables; see lib.table.PmwikiTable and lib.table.MdTable.
+	
+	Tables are found at the line beginnings of a LineStartIndex, and every table
+	is parsed and rendered in one go, in time linear to its size. Converted by a
+	SinglePassEngine, the text of every cell is converted by the engine before
+	the widths of the columns are measured. Converted on its own, cells keep
+	their markup, as a rendered table isn't available for conversion anymore."""
+	
+	OLD = "||"
+	THEME = TableTheme()
+	
+	def findTableEnd(self, text, start, end):
+		"""Return where the table beginning at start ends, before the newline
+		of its last row, and up to where text was examined to find out."""
+		old = self.__class__.OLD
+		lineEnd = text.find("\n", start, end)
+		while lineEnd != -1 and text.startswith(old, lineEnd+1, end):
+			lineEnd = text.find("\n", lineEnd+1, end)
+		if lineEnd == -1:
+			return end, end
+		return lineEnd, min(lineEnd+1+len(old), end)
+	
+	def convertTable(self, code, convertText=None):
+		"""Return a ContentElement with the Markdown table for the specified PmWiki table code."""
+		return ContentElement(MdTable(PmwikiTable().fromCode(code, convertText)).render(self.__class__.THEME),\
+			availableForConversion=False)
+	
+	@property
+	def singlePassRules(self):
+		return [TableRule(self)]
+	
+	def convert(self, content):
+		"""Convert the tables of every ContentElement marked availableForConversion."""
+		lineStartIndex = LineStartIndex(content)
+		convertedElements = []
+		for elementIndex, element in enumerate(content):
+			text, position, end = element.span
+			subElements = []
+			for lineStart in lineStartIndex[elementIndex]:
+				if lineStart < position or not text.startswith(self.__class__.OLD, lineStart, end):
+					continue
+				tableEnd, examinedTo = self.findTableEnd(text, lineStart, end)
+				subElements.append(element.piece(position, lineStart))
+				subElements.append(self.convertTable(text[lineStart:tableEnd]))
+				position = tableEnd
+			if subElements:
+				subElements.append(element.piece(position, end))
+				convertedElements.extend(subElements)
+			else:
+				convertedElements.append(element)
+		return content.__class__(convertedElements)
 
 # Sub and Superscript
 class Pmwiki2MdSubscriptConversion(ConversionOfBeginEndDelimitedToOtherDelimiters):
@@ -607,6 +1797,7 @@ class Pmwiki2MdLinkSpecialClosingTagConversion(ConversionBySingleCodeReplacement
 class Pmwiki2MdLinkConversion(ConversionOfBeginEndDelimitedToOtherDelimiters):
 	BEGIN = "[["
 	END = "]]"
+	SPANS_LINES = False
 	
 	# For nameless links.
 	TO_BEGIN = "<"
@@ -618,8 +1809,13 @@ class Pmwiki2MdLinkConversion(ConversionOfBeginEndDelimitedToOtherDelimiters):
 	TO_NAMED_ADDRESS_BEGIN = "("
 	TO_NAMED_ADDRESS_END = ")"
 	
-	class PARTITIONED_BEGIN_END_DELIMITED_ELEMENT_CLASS(NamedList):
+	class PARTITIONED_BEGIN_END_DELIMITED_ELEMENT_CLASS(Record):
+		
+		"""A link's delimiters and element, with the address and name parsed from the latter.
+		They're parsed once per element; see .addressAndName."""
+		
 		ATTRIBUTES = ["beginIndicator", "element", "endIndicator"]
+		__slots__ = ("_parsedElement", "_addressAndName")
 		
 		@property
 		def name(self):
@@ -635,6 +1831,15 @@ class Pmwiki2MdLinkConversion(ConversionOfBeginEndDelimitedToOtherDelimiters):
 		
 		@property
 		def addressAndName(self):
+			"""Returns a tuple with the link address first and the name second,
+			as parsed by .parseAddressAndName the first time it's asked for
+			since .element was set."""
+			if getattr(self, "_parsedElement", None) is not self.element:
+				self._addressAndName = self.parseAddressAndName(self.element.content)
+				self._parsedElement = self.element
+			return self._addressAndName
+		
+		def parseAddressAndName(self, linkText):
 			"""Returns a tuple with the link address first and the name second.
 			This is meant to be overriden in order to customize link processing."""
 			
@@ -642,7 +1847,7 @@ class Pmwiki2MdLinkConversion(ConversionOfBeginEndDelimitedToOtherDelimiters):
 			# doesn't have fixed positions, depending on whether there was
 			# a name in the original formatting or not, so we hardcore the
 			# positions.
-			partitionedLink = self.element.content.rpartition(" | ")
+			partitionedLink = linkText.rpartition(" | ")
 			if partitionedLink[0]:
 				return partitionedLink[0::2]
 			else:
@@ -689,23 +1894,23 @@ class Pmwiki2MdLinkConversion(ConversionOfBeginEndDelimitedToOtherDelimiters):
 		if partitionedElement.isNameless:
 			return [
 			self.PartitionedBeginEndDelimitedElement(\
-				beginIndicator = ContentElement(self.to_begin, availableForConversion=False),
+				beginIndicator = DelimiterElement.get(self.to_begin),
 				element = ContentElement(partitionedElement.address, availableForConversion=False),
-				endIndicator = ContentElement(self.to_end, availableForConversion=False)
+				endIndicator = DelimiterElement.get(self.to_end)
 			)]
 		else:
 			return [\
 			# Link name.
 			self.PartitionedBeginEndDelimitedElement(\
-				beginIndicator = ContentElement(self.to_namedNameBegin, availableForConversion=False),
+				beginIndicator = DelimiterElement.get(self.to_namedNameBegin),
 				element = ContentElement(partitionedElement.name, availableForConversion=True),
-				endIndicator = ContentElement(self.to_namedNameEnd, availableForConversion=False)
+				endIndicator = DelimiterElement.get(self.to_namedNameEnd)
 			),
 			# Link address.
 			self.PartitionedBeginEndDelimitedElement(\
-				beginIndicator = ContentElement(self.to_namedAddressBegin, availableForConversion=False),
+				beginIndicator = DelimiterElement.get(self.to_namedAddressBegin),
 				element = ContentElement(partitionedElement.address, availableForConversion=False),
-				endIndicator = ContentElement(self.to_namedAddressEnd, availableForConversion=False)
+				endIndicator = DelimiterElement.get(self.to_namedAddressEnd)
 			)]
 		
 class Pmwiki2MdImageUrlConversion(ConversionOfBeginEndDelimitedToOtherDelimiters):
@@ -786,11 +1991,12 @@ class Pmwiki2MdPreFormattedBlockConversion(Pmwiki2MdPreFormattedInlineConversion
 	TO_BEGIN = "```\n"
 	TO_END = "```"
 	
-class AllConversions(Conversions):
+class AllConversions(SinglePassConversions):
 	def __init__(self):
-		self.data = [\
+		super().__init__(\
 			Pmwiki2MdPreFormattedBlockConversion,\
 			Pmwiki2MdPreFormattedInlineConversion,\
+			Pmwiki2MdTableConversion,\
 			Pmwiki2MdBoldConversion,\
 			Pmwiki2MdItalicConversion,\
 			Pmwiki2MdItalicBoldConversion,\
@@ -809,6 +2015,8 @@ class AllConversions(Conversions):
 			Pmwiki2MdTitle3Conversion,\
 			Pmwiki2MdTitle2Conversion,\
 			Pmwiki2MdTitle1Conversion,\
+			Pmwiki2MdIndentConversion,\
+			Pmwiki2MdDivBlockConversion,\
 			Pmwiki2MdSubscriptConversion,\
 			Pmwiki2MdSuperscriptConversion,\
 			Pmwiki2MdBulletListConversion,\
@@ -817,4 +2025,4 @@ class AllConversions(Conversions):
 			Pmwiki2MdLinkConversion,\
 			Pmwiki2MdLinkWindowTargetConversion,\
 			Pmwiki2MdLinkSpecialClosingTagConversion,\
-			]
+			)
@@ -8,8 +8,11 @@ class Row(object):
 	
 	"""Table row with Cell objects."""
 	
-	def __init__(self, cells=[]):
-		self.cells = cells
+	__slots__ = ("cells",)
+	
+	def __init__(self, cells=None):
+		# Not a default of [], which every Row would share.
+		self.cells = cells if cells is not None else []
 		
 	def addCell(self, cell):
 		"""Add a new cell to the table.
@@ -78,10 +81,20 @@ class Row(object):
 		return self._getCellListByType(pad, headersRequested=False)
 	
 class Cell(object):
-	"""Table cell; typically part of a Row object."""
-	def __init__(self, text="", isHeader=False):
+	
+	"""Table cell; typically part of a Row object.
+	align is None, or one of ALIGN_LEFT, ALIGN_CENTER and ALIGN_RIGHT."""
+	
+	__slots__ = ("text", "isHeader", "align")
+	
+	ALIGN_LEFT = "left"
+	ALIGN_CENTER = "center"
+	ALIGN_RIGHT = "right"
+	
+	def __init__(self, text="", isHeader=False, align=None):
 		self.text = text
 		self.isHeader = isHeader
+		self.align = align
 		
 class Table(object):
 	"""Table made up of Row objects."""
@@ -133,22 +146,67 @@ class TableFromCode(Table):
 	
 class PmwikiTable(TableFromCode):
 	
-	"""Table initialized from pmwiki code."""
+	"""Table initialized from pmwiki code.
 	
-	def fromCode(self, code):
-		"""Initialize table from pmwiki code.
+	Every line is a row of cells separated by "||", e.g. "||!Name||!Value||",
+	whereas a line with no "||" but the one it begins with, e.g.
+	"||class=wikitable border=1", holds attributes of the table, which are
+	ignored. A cell beginning with "!" is a header cell. Spaces around the text
+	of a cell align it: Before it to the right, after it to the left, and on
+	both sides to the center. Text after the last "||" of a row is ignored."""
+	
+	SEPARATOR = "||"
+	
+	def fromCode(self, code, convertText=None):
+		
+		"""Initialize table from pmwiki code, in one pass over it.
 		Takes:
-			code (str)"""
+			code (str)
+			convertText (None || callable), default: None
+				If specified, the text of every cell is replaced by what it
+				returns for it, e.g. to convert markup within cells.
+		Returns: self (chainable)"""
 		
+		separator = self.__class__.SEPARATOR
 		rows = []
 		for rowText in code.split("\n"):
+			if not rowText.startswith(separator):
+				continue
+			cellStart = len(separator)
+			cellEnd = rowText.find(separator, cellStart)
+			if cellEnd == -1:
+				# Table attributes.
+				continue
 			row = Row()
-			for cellText in rowText.strip("||").split("||"):
-				cell = Cell(cellText.strip())
-				if cell.text.startswith("!"):
-					cell.isHeader = True
-				row.addCell(cell)
+			while cellEnd != -1:
+				cellText = rowText[cellStart:cellEnd]
+				text = cellText.strip()
+				isHeader = text.startswith("!")
+				if isHeader:
+					text = text[1:].strip()
+				if convertText is not None:
+					text = convertText(text)
+				row.addCell(Cell(text, isHeader, self.__class__.alignment(cellText)))
+				cellStart = cellEnd+len(separator)
+				cellEnd = rowText.find(separator, cellStart)
 			rows.append(row)
+		self.rows = rows
+		return self
+	
+	@staticmethod
+	def alignment(cellText):
+		"""Cell.align of a cell's text, as indicated by spaces around it."""
+		if not cellText.strip():
+			return None
+		spaceBefore = cellText.startswith(" ")
+		spaceAfter = cellText.endswith(" ")
+		if spaceBefore and spaceAfter:
+			return Cell.ALIGN_CENTER
+		if spaceBefore:
+			return Cell.ALIGN_RIGHT
+		if spaceAfter:
+			return Cell.ALIGN_LEFT
+		return None
 			
 class TableFromTableByConversion(Table):
 	
@@ -179,20 +237,85 @@ class TableTheme(object):
 	@property
 	def verticalBorder(self):
 		return " | "
+	@property
+	def leftBorder(self):
+		return "| "
+	@property
+	def rightBorder(self):
+		return " |"
+	@property
+	def alignmentIndicator(self):
+		return ":"
+	@property
+	def minimumColumnWidth(self):
+		return 3
 	
 class MdTable(TableFromTableByConversion):
 	
+	"""GitHub flavoured Markdown table.
+	
+	Rendered with the first row as the header row if it has header cells,
+	and an empty header row otherwise, as a Markdown table always has one.
+	Header cells in other rows are rendered in bold. Columns are padded to
+	the width of their widest cell, and aligned as the first row's cells are."""
+	
 	def fromTable(self, table):
 		self.rows = table.rows
 	
+	@staticmethod
+	def escape(text):
+		"""Escape what would end a cell early."""
+		return text.replace("|", "\\|").replace("\n", " ")
+	
+	def renderRow(self, texts, widths, theme):
+		return theme.leftBorder+theme.verticalBorder.join([text.ljust(width)\
+			for text, width in zip(texts, widths)])+theme.rightBorder
+	
+	def renderSeparator(self, alignments, widths, theme):
+		separators = []
+		for align, width in zip(alignments, widths):
+			separator = theme.headerSeparator*width
+			if align in (Cell.ALIGN_LEFT, Cell.ALIGN_CENTER):
+				separator = theme.alignmentIndicator+separator[1:]
+			if align in (Cell.ALIGN_RIGHT, Cell.ALIGN_CENTER):
+				separator = separator[:-1]+theme.alignmentIndicator
+			separators.append(separator)
+		return theme.leftBorder+theme.verticalBorder.join(separators)+theme.rightBorder
+	
 	def render(self, theme, withHeadersIfAvailable=True):
-		renderedRows = []
-		if self.headers and withHeadersIfAvailable:
-			headerCells = [t for t in self.headers]
-			headerSeparatorCells = [theme.headerSeparator*3 for i in range(0, len(self.headers))]
-			renderedRows.append(theme.verticalBorder.join(headerCells))
-			renderedRows.append(theme.verticalBorder.join(headerSeparatorCells))
-		for row in self.rows:
-			renderedCells = theme.verticalBorder.join([c.text for c in row.cells])
-			renderedRows.append(renderedCells)
+		
+		"""Render the table, in time linear to its size."""
+		
+		if not self.hasRows:
+			return ""
+		columns = max([len(row.cells) for row in self.rows])
+		if withHeadersIfAvailable and self.hasHeaders:
+			headerRow, rows = self.rows[0], self.rows[1:]
+			header = [self.__class__.escape(cell.text) for cell in headerRow.cells]
+		else:
+			headerRow, rows = None, self.rows
+			header = []
+		header.extend([""]*(columns-len(header)))
+		
+		body = []
+		for row in rows:
+			texts = []
+			for cell in row.cells:
+				text = self.__class__.escape(cell.text)
+				if cell.isHeader and text:
+					text = "**{text}**".format(text=text)
+				texts.append(text)
+			texts.extend([""]*(columns-len(texts)))
+			body.append(texts)
+		
+		widths = [max(theme.minimumColumnWidth, len(text)) for text in header]
+		for texts in body:
+			for column, text in enumerate(texts):
+				if len(text) > widths[column]:
+					widths[column] = len(text)
+		alignments = [cell.align for cell in self.rows[0].cells]
+		alignments.extend([None]*(columns-len(alignments)))
+		
+		renderedRows = [self.renderRow(header, widths, theme), self.renderSeparator(alignments, widths, theme)]
+		renderedRows.extend([self.renderRow(texts, widths, theme) for texts in body])
 		return "\n".join(renderedRows)
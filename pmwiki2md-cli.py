@@ -3,18 +3,44 @@
 
 # Python
 import argparse
+import os
+import sys
 
 # Local
-from lib import converter
-from lib.converter import FileConverter, FilePairs
+from lib import debugging
+from lib.converter import FileConverter, FilePairs, FilePairWalk, PageStorePairs, Manifest, ConversionReport,\
+	PipelinedConversion, StreamConverter
+from lib.cache import FragmentCache
 from lib.pmwiki2md import AllConversions as Conversions
 
 DEFAULT_SOURCE_SUFFIX = "pmwiki"
 DEFAULT_TARGET_SUFFIX = "md"
 
+def positiveInt(value):
+	"""argparse type of numbers of at least 1."""
+	try:
+		number = int(value)
+	except ValueError:
+		raise argparse.ArgumentTypeError("{value!r} isn't a number.".format(value=value))
+	if number < 1:
+		raise argparse.ArgumentTypeError("{value} isn't at least 1.".format(value=value))
+	return number
+
 parser = argparse.ArgumentParser()
-parser.add_argument("source", help="Directory of files to be converted.")
-parser.add_argument("target", help="Directory to write converted files to.")
+parser.add_argument("source", nargs="?", help="Directory of files to be converted.")
+parser.add_argument("target", nargs="?", help="Directory to write converted files to.")
+
+parser.add_argument("--filter",\
+	help="Convert a page read from standard input, and write it to standard output, instead of "
+	"converting a directory.",\
+	action="store_true")
+
+parser.add_argument("--batch",\
+	help="Read JSON lines records of pages from standard input, e.g. {\"name\": \"Main.HomePage\", \"text\": \"...\"}, "
+	"and write every record to standard output once it's converted, with the Markdown as its \"text\", "
+	"or an \"error\" if it failed. Other keys are kept. With more than one job, records are written "
+	"in the order they're done. Exits with status 1 if any record failed.",\
+	action="store_true")
 
 parser.add_argument("--source-suffix",\
 	help="Only source files with that suffix will be considered for conversion. Default:"
@@ -36,12 +62,166 @@ parser.add_argument("--source-encoding",\
 parser.add_argument("--target-encoding",\
 	help="Text encoding for target files. Consult python documentation for available encodings and their codes.")
 
-args = parser.parse_args()
+parser.add_argument("-j", "--jobs", type=positiveInt,\
+	help="Number of processes to convert files in. Default: Number of CPUs ({default})."\
+	.format(default=os.cpu_count()),\
+	default=os.cpu_count())
+
+parser.add_argument("--incremental",\
+	help="Only convert source files which changed since the last run, and delete converted files "
+	"whose source is gone. Keeps track using a manifest file in the target directory ({name})."\
+	.format(name=Manifest.FILE_NAME),\
+	action="store_true")
+
+parser.add_argument("--chunk-size", type=positiveInt,\
+	help="Read, convert and write files in chunks of this many characters, keeping memory "
+	"bounded on very large pages. Converts whole files at once if not specified.")
+
+parser.add_argument("--profile", metavar="REPORT",\
+	help="Record wall time and element counts of every conversion, per file and for the whole "
+	"run, and write them to this JSON file.")
+
+parser.add_argument("-r", "--recursive",\
+	help="Also convert files in subdirectories of the source directory, to the same subdirectories "
+	"of the target directory.",\
+	action="store_true")
+
+parser.add_argument("--include", metavar="GLOB", nargs="+",\
+	help="Only convert source files whose path relative to the source directory matches one of "
+	"these patterns (\"*\" matches \"/\" as well).")
+
+parser.add_argument("--exclude", metavar="GLOB", nargs="+",\
+	help="Don't convert source files, or descend into directories, whose path relative to the "
+	"source directory matches one of these patterns.")
+
+parser.add_argument("--wiki-d",\
+	help="The source directory is a PmWiki page store (wiki.d); convert the current text of its pages. "
+	"Target files are named after the pages, e.g. Main.HomePage.md. --source-suffix and "
+	"--recursive don't apply.",\
+	action="store_true")
+
+parser.add_argument("--group-directories",\
+	help="With --wiki-d: Write the pages of every group to a directory of that name, e.g. Main/HomePage.md.",\
+	action="store_true")
+
+parser.add_argument("--pipelined",\
+	help="Read, convert and write files concurrently, so waiting for slow (e.g. network) storage "
+	"overlaps with converting. Can't be combined with --chunk-size.",\
+	action="store_true")
+
+parser.add_argument("--queue-depth", type=positiveInt,\
+	help="With --pipelined: Files that may wait between reading, converting and writing. Default: "
+	"{default}".format(default=PipelinedConversion.QUEUE_DEPTH))
+
+parser.add_argument("--max-bytes-in-flight", type=positiveInt,\
+	help="With --pipelined: Bytes of source files that may be read, but not written yet. Default: "
+	"{default}".format(default=PipelinedConversion.MAX_BYTES_IN_FLIGHT))
+
+parser.add_argument("--io-threads", type=positiveInt,\
+	help="With --pipelined: Threads reading and writing files. Default: "
+	"{default}".format(default=PipelinedConversion.IO_THREADS))
+
+parser.add_argument("--fragment-cache",\
+	help="Convert pages paragraph by paragraph, reusing paragraphs converted before, e.g. footers and "
+	"templates repeated across pages. Prints how many were reused to standard error.",\
+	action="store_true")
+
+parser.add_argument("--fragment-cache-bytes", type=int,\
+	help="With --fragment-cache: Memory the cached paragraphs may take up, per process. Default: "
+	"{default}".format(default=FragmentCache.MAX_BYTES))
+
+parser.add_argument("--fragment-cache-store", metavar="PATH",\
+	help="With --fragment-cache: SQLite database to keep converted paragraphs in across runs; "
+	"created if it doesn't exist.")
+
+parser.add_argument("--debug", metavar="LEVELS",\
+	help="Log debugging messages of this level and above: A level for all modules and/or levels for "
+	"modules, e.g. \"debug\" or \"info,lib.converter=trace\". Levels: {levels}. Default: {default}"\
+	.format(levels=", ".join(sorted(debugging.LEVELS, key=debugging.LEVELS.get)), default=debugging.DEFAULT_LEVEL))
+
+parser.add_argument("--debug-file",\
+	help="Append debugging messages to this file instead of printing them to standard error.")
 
-converter = FileConverter(conversions=Conversions, filePairs=FilePairs(\
-	directoryPaths=FilePairs.DIRECTORY_PATHS(args.source, args.target),\
-	suffixes=FilePairs.SUFFIXES(args.source_suffix, args.target_suffix),\
-	ignoreCodecReadErrors=args.ignore_codec_read_errors,\
-	sourceEncoding=args.source_encoding,\
-	targetEncoding=args.target_encoding))
-converter.convert()
+# Guarded, as processes of the conversion process pool might import this module.
+if __name__ == "__main__":
+	
+	args = parser.parse_args()
+	
+	# Through the environment, so processes of the conversion process pool log alike.
+	if args.debug:
+		os.environ[debugging.LEVEL_VARIABLE] = args.debug
+	if args.debug_file:
+		os.environ[debugging.FILE_VARIABLE] = args.debug_file
+	try:
+		debugging.configureFromEnvironment()
+	except (ValueError, OSError) as error:
+		parser.error(str(error))
+	
+	fragmentCache = None
+	if args.fragment_cache:
+		fragmentCache = FragmentCache(maxBytes=args.fragment_cache_bytes, path=args.fragment_cache_store)
+	elif args.fragment_cache_bytes or args.fragment_cache_store:
+		parser.error("--fragment-cache-bytes and --fragment-cache-store need --fragment-cache.")
+	
+	def printFragmentCacheStats():
+		if fragmentCache is not None:
+			print("Fragment cache: {stats}".format(stats=fragmentCache.stats), file=sys.stderr)
+	
+	if args.filter or args.batch:
+		if args.source or args.target:
+			parser.error("--filter and --batch read standard input, and take no source or target.")
+		if args.source_encoding:
+			sys.stdin.reconfigure(encoding=args.source_encoding)
+		if args.target_encoding:
+			sys.stdout.reconfigure(encoding=args.target_encoding)
+		if args.ignore_codec_read_errors:
+			sys.stdin.reconfigure(errors="ignore")
+		streamConverter = StreamConverter(Conversions, jobs=args.jobs if args.batch else 1, fragmentCache=fragmentCache)
+		try:
+			if args.filter:
+				streamConverter.convertPage(sys.stdin, sys.stdout)
+			elif streamConverter.convertRecords(sys.stdin, sys.stdout):
+				sys.exit(1)
+		finally:
+			printFragmentCacheStats()
+		sys.exit(0)
+	if args.source is None or args.target is None:
+		parser.error("the source and target directories are required, unless converting with --filter or --batch.")
+	if args.pipelined and args.chunk_size:
+		parser.error("Pipelined conversion reads whole files; --pipelined can't be combined with --chunk-size.")
+	
+	report = ConversionReport() if args.profile else None
+	
+	pairOptions = {\
+		"directoryPaths": FilePairs.DIRECTORY_PATHS(args.source, args.target),\
+		"suffixes": FilePairs.SUFFIXES(args.source_suffix, args.target_suffix),\
+		"ignoreCodecReadErrors": args.ignore_codec_read_errors,\
+		"sourceEncoding": args.source_encoding,\
+		"targetEncoding": args.target_encoding}
+	if args.wiki_d:
+		filePairs = PageStorePairs(pairOptions["directoryPaths"], targetSuffix=args.target_suffix,\
+			groupDirectories=args.group_directories, include=args.include, exclude=args.exclude,\
+			ignoreCodecReadErrors=args.ignore_codec_read_errors,\
+			sourceEncoding=args.source_encoding, targetEncoding=args.target_encoding)
+	elif args.recursive or args.include or args.exclude:
+		filePairs = FilePairWalk(recursive=args.recursive, include=args.include, exclude=args.exclude,\
+			**pairOptions)
+	else:
+		filePairs = FilePairs(**pairOptions)
+	
+	fileConverter = FileConverter(conversions=Conversions, filePairs=filePairs,\
+		jobs=args.jobs,\
+		manifest=Manifest.fromDirectory(args.target) if args.incremental else None,\
+		chunkSize=args.chunk_size,\
+		report=report,\
+		pipelined=args.pipelined,\
+		queueDepth=args.queue_depth,\
+		maxBytesInFlight=args.max_bytes_in_flight,\
+		ioThreads=args.io_threads,\
+		fragmentCache=fragmentCache)
+	try:
+		fileConverter.convert()
+	finally:
+		printFragmentCacheStats()
+		if report is not None:
+			report.save(args.profile)
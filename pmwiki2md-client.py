@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""Converts with a running pmwiki2md-daemon.py, without importing the conversions.
+Reads the page from standard input if no source is specified, and writes the
+Markdown to standard output if no target is specified."""
+
+# Python
+import argparse
+import sys
+
+# Local
+from lib.client import ConversionClient, DaemonError, defaultSocketPath
+
+parser = argparse.ArgumentParser()
+parser.add_argument("source", nargs="?", help="File to convert.")
+parser.add_argument("target", nargs="?", help="File for the daemon to write the converted page to.")
+
+parser.add_argument("--socket",\
+	help="Path of the daemon's Unix domain socket. Default: {default}"\
+	.format(default=defaultSocketPath()),\
+	default=None)
+
+parser.add_argument("--encoding",\
+	help="Text encoding of the source and target files.")
+
+parser.add_argument("--wiki-d",\
+	help="The source is a page file of a PmWiki page store (wiki.d).",\
+	action="store_true")
+
+if __name__ == "__main__":
+	
+	args = parser.parse_args()
+	
+	try:
+		with ConversionClient(args.socket) as client:
+			if args.source is None:
+				sys.stdout.write(client.convert(sys.stdin.read()))
+			elif args.target is None:
+				sys.stdout.write(client.convertFile(args.source, encoding=args.encoding, pageFile=args.wiki_d))
+			else:
+				client.convertFile(args.source, args.target, encoding=args.encoding, pageFile=args.wiki_d)
+	except (DaemonError, OSError) as error:
+		sys.exit("pmwiki2md-client: {error}".format(error=error))
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+"""Keeps the conversions warm and converts for clients over a Unix domain socket;
+see lib/daemon.py, and pmwiki2md-client.py for a client."""
+
+# Python
+import argparse
+import signal
+import sys
+
+# Local
+from lib.client import DaemonError, defaultSocketPath
+from lib.daemon import ConversionDaemon
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument("--socket",\
+	help="Path of the Unix domain socket to listen on. Default: {default}"\
+	.format(default=defaultSocketPath()),\
+	default=None)
+
+if __name__ == "__main__":
+	
+	args = parser.parse_args()
+	
+	try:
+		daemon = ConversionDaemon(socketPath=args.socket)
+	except DaemonError as error:
+		parser.error(str(error))
+	# Leave through the finally clause below, removing the socket file.
+	signal.signal(signal.SIGTERM, lambda signalNumber, frame: sys.exit(0))
+	try:
+		daemon.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		daemon.server_close()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+import unittest
+
+# Local
+from lib.benchmark import PmwikiPageGenerator, BenchmarkResults
+
+# DEBUG
+from lib.debugging import dprint
+
+#=======================================================================================
+# Tests
+#=======================================================================================
+
+class PmwikiPageGeneratorTest(unittest.TestCase):
+	
+	def test_seeded(self):
+		self.assertEqual(PmwikiPageGenerator(seed=3).pages(3), PmwikiPageGenerator(seed=3).pages(3))
+		self.assertNotEqual(PmwikiPageGenerator(seed=3).pages(3), PmwikiPageGenerator(seed=4).pages(3))
+	
+	def test_markupDensity(self):
+		plain = PmwikiPageGenerator(markupDensity=0).page()
+		marked = PmwikiPageGenerator(markupDensity=0.5).page()
+		for markup in ["[[", "''", "[@", "||"]:
+			self.assertFalse(markup in plain)
+			self.assertTrue(markup in marked)
+	
+	def test_pageSize(self):
+		self.assertTrue(len(PmwikiPageGenerator(pageSize=10000).page()) >= 10000)
+
+class BenchmarkResultsTest(unittest.TestCase):
+	
+	def test_compare(self):
+		baseline = BenchmarkResults(results={"convert/10": {"seconds": 1.0}, "cli/10": {"seconds": 2.0}})
+		results = BenchmarkResults(results={"convert/10": {"seconds": 1.05}, "cli/10": {"seconds": 2.5},\
+			"convert/100": {"seconds": 1.0}})
+		comparison = results.compare(baseline, tolerance=0.1)
+		self.assertEqual(sorted(comparison.keys()), ["cli/10", "convert/10"])
+		self.assertFalse(comparison["convert/10"]["regression"])
+		self.assertTrue(comparison["cli/10"]["regression"])
+
+#=======================================================================================
+
+if __name__ == "__main__":
+	unittest.main()
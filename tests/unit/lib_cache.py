@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+import unittest
+import os, pickle, tempfile
+
+# Local
+from lib.cache import FragmentCache, CachedPipeline
+from lib.pmwiki2md import AllConversions, SpanContent
+
+#=======================================================================================
+# Tests
+#=======================================================================================
+
+class CachedPipelineTest(unittest.TestCase):
+	
+	TEXTS = [\
+		"!! Title\n\n''a'' [[Main.Page|b]]\n\n\n* item\n** item\n\n||!x||y||\n||1||2||\n\nend",\
+		"[@\ncode\n\n''not emphasis''\n@]\n\n'''after'''",\
+		"x '^up\n\nstill up^' y\n\nz '_down\n\nnever closed",\
+		"\n\nleading\n\n",\
+		"",\
+	]
+	
+	def setUp(self):
+		self.pipeline = AllConversions().compile()
+	
+	def test_split(self):
+		cachedPipeline = CachedPipeline(self.pipeline, FragmentCache())
+		self.assertEqual(cachedPipeline.split("a\n\nb\n\n\nc"), ["a\n\n", "b\n\n\n", "c"])
+		self.assertEqual(cachedPipeline.split("a [@\n\nb @]\n\nc"), ["a [@\n\nb @]\n\n", "c"])
+		self.assertEqual(cachedPipeline.split("a\n\n"), ["a\n\n"])
+	
+	def test_convertMatchesWhole(self):
+		cachedPipeline = CachedPipeline(self.pipeline, FragmentCache())
+		for repetition in range(2):
+			for text in self.__class__.TEXTS:
+				self.assertEqual(cachedPipeline.convert(SpanContent(text)).string,\
+					self.pipeline.convert(SpanContent(text)).string)
+		self.assertEqual(cachedPipeline.convertMany(self.__class__.TEXTS),\
+			[self.pipeline.convert(SpanContent(text)).string for text in self.__class__.TEXTS])
+		self.assertGreater(cachedPipeline.cache.stats.hits, 0)
+		self.assertGreater(cachedPipeline.cache.stats.misses, 0)
+	
+	def test_eviction(self):
+		cache = FragmentCache(maxBytes=FragmentCache.entrySize(b"k"*16, "v"*100)*3)
+		cache.put([(bytes([number])*16, "v"*100) for number in range(5)])
+		self.assertEqual(len(cache.entries), 3)
+		self.assertEqual(cache.stats.evictions, 2)
+		cache.get([bytes([2])*16])
+		cache.put([(bytes([9])*16, "v"*100)])
+		self.assertEqual(cache.get([bytes([number])*16 for number in [2, 3]]), ["v"*100, None])
+	
+	def test_store(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, "fragments.db")
+			cache = FragmentCache(path=path)
+			CachedPipeline(self.pipeline, cache).convertMany(self.__class__.TEXTS)
+			cache.close()
+			# As it would arrive in a process of a process pool.
+			cache = pickle.loads(pickle.dumps(FragmentCache(maxBytes=1000, path=path)))
+			self.assertEqual((cache.maxBytes, len(cache.entries)), (1000, 0))
+			cachedPipeline = CachedPipeline(self.pipeline, cache)
+			self.assertEqual(cachedPipeline.convertMany(self.__class__.TEXTS),\
+				[self.pipeline.convert(SpanContent(text)).string for text in self.__class__.TEXTS])
+			self.assertEqual(cache.stats.misses, 0)
+			self.assertEqual(cache.stats.storeHits, cache.stats.hits)
+			cache.close()
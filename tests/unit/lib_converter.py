@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+import unittest
+import tempfile
+import os
+from pathlib import Path
+
+# Local
+from lib.pmwiki2md import Conversion, Conversions
+
+# DEBUG
+from lib.debugging import dprint
+
+#=======================================================================================
+# Tests
+#=======================================================================================
+
+class WorkerKillingConversion(Conversion):
+	
+	"""Ends the process converting it if the content contains KILL, like a worker killed for running out of memory."""
+	
+	def convert(self, content):
+		if "KILL" in "".join([element.content for element in content]):
+			os._exit(1)
+		return content
+
+class WorkerKillingConversions(Conversions):
+	def __init__(self):
+		super().__init__(WorkerKillingConversion)
+
+class FileConverterTest(unittest.TestCase):
+	
+	PAGES = {
+		"a": "''test''",
+		"b": "!!Title\n* ''item'' [[http://example.com | Example]]\n** sub item",
+		"c": "[@\n''pre''\n@] '''bold''' {-strike-}",
+		"d": "plain",
+		"e": "[[HomePage]] %newwin%[[http://example.com]]%%",
+	}
+	
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.sourceDir = Path(self.tempDir.name, "source")
+		self.sourceDir.mkdir()
+		for name, text in self.__class__.PAGES.items():
+			with open(str(Path(self.sourceDir, name+".pmwiki")), "w", encoding="utf-8") as pageFile:
+				pageFile.write(text)
+	
+	def tearDown(self):
+		self.tempDir.cleanup()
+	
+	def convertDir(self, targetDirName, conversions=None, **kwargs):
+		from lib.converter import FileConverter, FilePairs
+		from lib.pmwiki2md import AllConversions
+		if conversions is None:
+			conversions = AllConversions
+		targetDir = Path(self.tempDir.name, targetDirName)
+		targetDir.mkdir(exist_ok=True)
+		filePairs = FilePairs(\
+			directoryPaths=FilePairs.DIRECTORY_PATHS(str(self.sourceDir), str(targetDir)),\
+			suffixes=FilePairs.SUFFIXES("pmwiki", "md"),\
+			sourceEncoding="utf-8", targetEncoding="utf-8")
+		FileConverter(conversions, filePairs, **kwargs).convert()
+		return targetDir
+	
+	def readDir(self, path):
+		contents = {}
+		for filePath in Path(path).iterdir():
+			if filePath.name.startswith("."):
+				continue
+			with open(str(filePath), "r", encoding="utf-8") as convertedFile:
+				contents[filePath.name] = convertedFile.read()
+		return contents
+	
+	def test_parallelMatchesSerial(self):
+		serialDir = self.convertDir("serial")
+		parallelDir = self.convertDir("parallel", jobs=2, batchSize=2)
+		self.assertEqual(len(self.readDir(serialDir)), len(self.__class__.PAGES))
+		self.assertEqual(self.readDir(serialDir), self.readDir(parallelDir))
+	
+	def test_parallelFailureKeepsOthers(self):
+		from lib.converter import FileConversionError
+		with open(str(Path(self.sourceDir, "broken.pmwiki")), "wb") as brokenFile:
+			brokenFile.write(b"\xff\xfe\xfa")
+		with self.assertRaises(FileConversionError) as context:
+			self.convertDir("parallel", jobs=2, batchSize=1)
+		self.assertEqual([pair.source.name for pair, error in context.exception.failures], ["broken.pmwiki"])
+		self.assertEqual(len(self.readDir(Path(self.tempDir.name, "parallel"))), len(self.__class__.PAGES))
+	
+	def test_parallelDeadWorkerKeepsOthers(self):
+		from lib.converter import FileConversionError
+		# Enough pages that others are still being converted when the process dies.
+		for index in range(0, 20):
+			with open(str(Path(self.sourceDir, "f{index}.pmwiki".format(index=index))), "w", encoding="utf-8") as pageFile:
+				pageFile.write("plain")
+		with open(str(Path(self.sourceDir, "c2.pmwiki")), "w", encoding="utf-8") as killingFile:
+			killingFile.write("KILL")
+		with self.assertRaises(FileConversionError) as context:
+			self.convertDir("parallel", conversions=WorkerKillingConversions, jobs=2, batchSize=1)
+		self.assertEqual([pair.source.name for pair, error in context.exception.failures], ["c2.pmwiki"])
+		self.assertIn("BrokenProcessPool", context.exception.failures[0][1])
+		converted = self.readDir(Path(self.tempDir.name, "parallel"))
+		self.assertEqual(len(converted), len(self.__class__.PAGES)+20)
+		self.assertEqual(converted["a.md"], self.__class__.PAGES["a"])
+
+	def test_fragmentCache(self):
+		from lib.cache import FragmentCache
+		serialDir = self.convertDir("serial")
+		for jobs in [1, 2]:
+			fragmentCache = FragmentCache()
+			cachedDir = self.convertDir("cached{jobs}".format(jobs=jobs), jobs=jobs, batchSize=2, fragmentCache=fragmentCache)
+			self.assertEqual(self.readDir(serialDir), self.readDir(cachedDir))
+			self.assertEqual(fragmentCache.stats.hits+fragmentCache.stats.misses, len(self.__class__.PAGES))
+	
+	def test_pipelinedMatchesSerial(self):
+		from lib.converter import FileConversionError
+		serialDir = self.convertDir("serial")
+		self.assertEqual(self.readDir(serialDir),\
+			self.readDir(self.convertDir("pipelined", pipelined=True, queueDepth=1, maxBytesInFlight=8)))
+		self.assertEqual(self.readDir(serialDir), self.readDir(self.convertDir("pipelinedNoJobs", pipelined=True, jobs=0)))
+		with open(str(Path(self.sourceDir, "broken.pmwiki")), "wb") as brokenFile:
+			brokenFile.write(b"\xff\xfe\xfa")
+		with self.assertRaises(FileConversionError) as context:
+			self.convertDir("pipelinedInProcesses", pipelined=True, jobs=2)
+		self.assertEqual([pair.source.name for pair, error in context.exception.failures], ["broken.pmwiki"])
+		self.assertEqual(self.readDir(serialDir), self.readDir(Path(self.tempDir.name, "pipelinedInProcesses")))
+	
+	def test_chunkedMatchesWhole(self):
+		wholeDir = self.convertDir("whole")
+		chunkedDir = self.convertDir("chunked", chunkSize=3)
+		self.assertEqual(self.readDir(wholeDir), self.readDir(chunkedDir))
+		
+	def test_report(self):
+		from lib.converter import ConversionReport
+		report = ConversionReport()
+		self.convertDir("profiled", jobs=2, batchSize=2, report=report)
+		self.assertEqual(sorted([Path(path).name for path in report.files.keys()]),\
+			sorted([name+".pmwiki" for name in self.__class__.PAGES.keys()]))
+		self.assertEqual(report.total.entries["Pmwiki2MdItalicConversion"]["calls"], 4)
+	
+	def test_incremental(self):
+		from lib.converter import Manifest
+		targetDir = Path(self.tempDir.name, "incremental")
+		manifest = lambda: Manifest.fromDirectory(targetDir)
+		self.convertDir("incremental", manifest=manifest())
+		self.assertEqual(len(manifest().entries), len(self.__class__.PAGES))
+		
+		# Unchanged sources are skipped, even if touched.
+		for name in ["a", "d"]:
+			with open(str(Path(targetDir, name+".md")), "w", encoding="utf-8") as targetFile:
+				targetFile.write("untouched")
+		os.utime(str(Path(self.sourceDir, "d.pmwiki")), ns=(0, 0))
+		# Changed sources get converted, deleted ones get their targets deleted.
+		with open(str(Path(self.sourceDir, "a.pmwiki")), "w", encoding="utf-8") as sourceFile:
+			sourceFile.write("''changed''")
+		os.remove(str(Path(self.sourceDir, "e.pmwiki")))
+		
+		self.convertDir("incremental", manifest=manifest())
+		converted = self.readDir(targetDir)
+		self.assertEqual(converted["a.md"], "_changed_")
+		self.assertEqual(converted["d.md"], "untouched")
+		self.assertFalse("e.md" in converted)
+		self.assertEqual(len(manifest().entries), len(self.__class__.PAGES)-1)
+		
+	def test_walk(self):
+		from lib.converter import FileConverter, FilePairs, FilePairWalk, Manifest
+		from lib.pmwiki2md import AllConversions
+		for relativePath in ["Main/HomePage.pmwiki", "Main/Sub/Deep.pmwiki", "Site/Edit.pmwiki",\
+			"Site/skip.txt", "Private/Secret.pmwiki"]:
+			Path(self.sourceDir, relativePath).parent.mkdir(parents=True, exist_ok=True)
+			with open(str(Path(self.sourceDir, relativePath)), "w", encoding="utf-8") as pageFile:
+				pageFile.write("''{name}''".format(name=Path(relativePath).stem))
+		targetDir = Path(self.tempDir.name, "walk")
+		walk = FilePairWalk(FilePairs.DIRECTORY_PATHS(str(self.sourceDir), str(targetDir)),\
+			suffixes=FilePairs.SUFFIXES("pmwiki", "md"), sourceEncoding="utf-8", targetEncoding="utf-8",\
+			exclude=["Private", "b.*"])
+		
+		# Lazy: nothing's found, or created, before iterating.
+		pairs = iter(walk)
+		self.assertFalse(targetDir.exists())
+		self.assertEqual([str(pair.source.path.relative_to(self.sourceDir)) for pair in pairs],\
+			["a.pmwiki", "c.pmwiki", "d.pmwiki", "e.pmwiki",\
+			"Main/HomePage.pmwiki", "Main/Sub/Deep.pmwiki", "Site/Edit.pmwiki"])
+		self.assertTrue(Path(targetDir, "Main", "Sub").is_dir())
+		self.assertFalse(Path(targetDir, "Private").exists())
+		
+		included = FilePairWalk(FilePairs.DIRECTORY_PATHS(str(self.sourceDir), str(targetDir)),\
+			suffixes=FilePairs.SUFFIXES("pmwiki", "md"), include=["Main/*"])
+		self.assertEqual([pair.target.path.relative_to(targetDir).as_posix() for pair in included],\
+			["Main/HomePage.md", "Main/Sub/Deep.md"])
+		
+		FileConverter(AllConversions, walk, jobs=2, batchSize=2, manifest=Manifest.fromDirectory(targetDir)).convert()
+		with open(str(Path(targetDir, "Main", "Sub", "Deep.md")), "r", encoding="utf-8") as convertedFile:
+			self.assertEqual(convertedFile.read(), "_Deep_")
+		self.assertEqual(len(Manifest.fromDirectory(targetDir).entries), 7)
+
+class PageStoreTest(unittest.TestCase):
+	
+	PAGE = (b"version=pmwiki-2.2.130 ordered=1 urlencoded=1\n"
+		b"charset=UTF-8\n"
+		b"name=Main.HomePage\n"
+		b"text=!Title%0a''50%25 %3c 100%25'' %e2%80%93 \xc3\xbc\n"
+		b"time=1700000000\n"
+		b"author:1700000000=someone\n"
+		b"diff:1700000000:1690000000:=1c1%0a< old%0a---%0a> new%0a\n"
+		b"text=not the current text\n")
+	
+	def setUp(self):
+		self.tempDir = tempfile.TemporaryDirectory()
+		self.wikiDir = Path(self.tempDir.name, "wiki.d")
+		self.wikiDir.mkdir()
+		pages = {
+			"Main.HomePage": self.__class__.PAGE,
+			# Unordered, so the history may come first, and the old newline encoding.
+			"Site.Old": b"version=pmwiki-1.0\nnewline=\xb2\ndiff:1:0:=x\ncharset=ISO-8859-1\ntext=a\xb2* \xfc\n",
+			"Main.HomePage,del-1700000000": b"text=deleted\n",
+			".flock": b"",
+		}
+		for name, record in pages.items():
+			with open(str(Path(self.wikiDir, name)), "wb") as pageFile:
+				pageFile.write(record)
+	
+	def tearDown(self):
+		self.tempDir.cleanup()
+	
+	def test_read(self):
+		from lib.converter import PmwikiPageFile
+		self.assertEqual(PmwikiPageFile(Path(self.wikiDir, "Main.HomePage")).read(),\
+			"!Title\n''50% < 100%'' – ü")
+		self.assertEqual(PmwikiPageFile(Path(self.wikiDir, "Site.Old")).read(), "a\n* ü")
+		self.assertEqual(PmwikiPageFile.unescape(b"%250a%0a"), b"%0a\n")
+	
+	def test_write(self):
+		from lib.converter import PmwikiPageFile
+		pageFile = PmwikiPageFile(Path(self.wikiDir, "Main.HomePage"))
+		self.assertRaises(TypeError, pageFile.write, "text")
+		self.assertRaises(TypeError, pageFile.writeChunks, ["text"])
+		self.assertEqual(pageFile.read(), "!Title\n''50% < 100%'' – ü")
+	
+	def test_convert(self):
+		from lib.converter import FileConverter, FilePairs, PageStorePairs
+		from lib.pmwiki2md import AllConversions
+		targetDir = Path(self.tempDir.name, "md")
+		pairs = PageStorePairs(FilePairs.DIRECTORY_PATHS(str(self.wikiDir), str(targetDir)), groupDirectories=True)
+		self.assertEqual([pair.source.name for pair in pairs], ["Main.HomePage", "Site.Old"])
+		FileConverter(AllConversions, pairs, chunkSize=4).convert()
+		with open(str(Path(targetDir, "Main", "HomePage.md")), "r", encoding="utf-8") as convertedFile:
+			self.assertEqual(convertedFile.read(), "# Title\n_50% < 100%_ – ü")
+		self.assertTrue(Path(targetDir, "Site", "Old.md").exists())
+
+class StreamConverterTest(unittest.TestCase):
+	
+	def test_convertPage(self):
+		import io
+		from lib.converter import StreamConverter
+		from lib.pmwiki2md import AllConversions
+		outStream = io.StringIO()
+		StreamConverter(AllConversions).convertPage(io.StringIO("!Title\n''x''"), outStream)
+		self.assertEqual(outStream.getvalue(), "# Title\n_x_")
+	
+	def test_convertRecords(self):
+		import io, json
+		from lib.converter import StreamConverter
+		from lib.pmwiki2md import AllConversions
+		records = "".join([json.dumps({"name": str(number), "text": "''{number}''".format(number=number)})+"\n"\
+			for number in range(20)])+"\n[]\nnot json\n"
+		for jobs in [1, 2]:
+			outStream = io.StringIO()
+			failed = StreamConverter(AllConversions, jobs=jobs).convertRecords(io.StringIO(records), outStream)
+			converted = [json.loads(line) for line in outStream.getvalue().splitlines()]
+			self.assertEqual(failed, 2)
+			self.assertEqual(sorted([record["line"] for record in converted if "error" in record]), [22, 23])
+			self.assertEqual({record["name"]: record["text"] for record in converted if "name" in record},\
+				{str(number): "_{number}_".format(number=number) for number in range(20)})
+
+#=======================================================================================
+
+if __name__ == "__main__":
+	unittest.main()
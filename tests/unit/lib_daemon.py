@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+import unittest
+import os, socket, tempfile, threading
+
+# Local
+from lib.client import ConversionClient, DaemonError
+from lib.daemon import ConversionDaemon
+from lib.pmwiki2md import AllConversions, SpanContent
+
+#=======================================================================================
+# Tests
+#=======================================================================================
+
+class DaemonTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.directory = tempfile.TemporaryDirectory()
+		self.socketPath = os.path.join(self.directory.name, "pmwiki2md.sock")
+		self.daemon = ConversionDaemon(socketPath=self.socketPath)
+		self.thread = threading.Thread(target=self.daemon.serve_forever, kwargs={"poll_interval": 0.05})
+		self.thread.start()
+	
+	def tearDown(self):
+		self.daemon.shutdown()
+		self.thread.join()
+		self.daemon.server_close()
+		self.directory.cleanup()
+	
+	def expected(self, text):
+		return AllConversions().convert(SpanContent(text)).string
+	
+	def test_convertText(self):
+		text = "!! Title\n''emphasis'' [[Main.Page|link]]\n"
+		with ConversionClient(self.socketPath) as client:
+			self.assertTrue(client.ping())
+			self.assertEqual(client.convert(text), self.expected(text))
+			self.assertEqual(client.request({"id": 3, "text": "x"})["id"], 3)
+	
+	def test_convertFile(self):
+		source = os.path.join(self.directory.name, "Page.pmwiki")
+		target = os.path.join(self.directory.name, "Page.md")
+		with open(source, "w") as fileObj:
+			fileObj.write("* '''item'''\n")
+		with ConversionClient(self.socketPath) as client:
+			self.assertEqual(client.convertFile(source), self.expected("* '''item'''\n"))
+			self.assertEqual(client.convertFile(source, target), target)
+		with open(target) as fileObj:
+			self.assertEqual(fileObj.read(), self.expected("* '''item'''\n"))
+	
+	def test_errors(self):
+		with ConversionClient(self.socketPath) as client:
+			self.assertRaises(DaemonError, client.request, {"command": "unknown"})
+			self.assertRaises(DaemonError, client.convertFile, os.path.join(self.directory.name, "missing"))
+			# The connection is still usable.
+			self.assertEqual(client.convert("x"), self.expected("x"))
+	
+	def test_concurrentClients(self):
+		texts = ["''{number}'' [[Main.Page{number}]]\n".format(number=number) for number in range(40)]
+		results = {}
+		def convert(offset):
+			with ConversionClient(self.socketPath) as client:
+				for index in range(offset, len(texts), 4):
+					results[index] = client.convert(texts[index])
+		threads = [threading.Thread(target=convert, args=(offset,)) for offset in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual([results[index] for index in range(len(texts))], [self.expected(text) for text in texts])
+	
+	def test_socketInUse(self):
+		self.assertRaises(DaemonError, ConversionDaemon, socketPath=self.socketPath)
+	
+	def test_staleSocketReplaced(self):
+		stalePath = os.path.join(self.directory.name, "stale.sock")
+		stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		stale.bind(stalePath)
+		stale.close()
+		daemon = ConversionDaemon(socketPath=stalePath)
+		daemon.server_close()
+		self.assertFalse(os.path.exists(stalePath))
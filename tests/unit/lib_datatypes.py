@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+import unittest
+import pickle
+
+# Local
+from lib.datatypes import Record
+
+# DEBUG
+from lib.debugging import dprint
+
+#=======================================================================================
+# Tests
+#=======================================================================================
+
+class Pair(Record):
+	ATTRIBUTES = ["source", "target"]
+
+class CachingPair(Pair):
+	__slots__ = ("_cache",)
+
+class RecordTest(unittest.TestCase):
+	
+	def test_init(self):
+		self.assertEqual(Pair("a", target="b").data, ["a", "b"])
+		self.assertEqual(Pair(target="b").data, [None, "b"])
+		with self.assertRaises(TypeError):
+			Pair(nope=1)
+	
+	def test_sequence(self):
+		pair = Pair("a", "b")
+		source, target = pair
+		self.assertEqual((source, target, pair[1], len(pair)), ("a", "b", "b", 2))
+		self.assertEqual(pair, ["a", "b"])
+		self.assertEqual(pickle.loads(pickle.dumps(pair)), pair)
+	
+	def test_slots(self):
+		pair = CachingPair("a", "b")
+		pair.target = "c"
+		pair._cache = 1
+		self.assertEqual(pair.data, ["a", "c"])
+		with self.assertRaises(AttributeError):
+			pair.other = 1
+
+#=======================================================================================
+
+if __name__ == "__main__":
+	unittest.main()
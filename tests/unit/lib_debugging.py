@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+import unittest
+import io
+import os
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+
+# Local
+from lib import debugging
+from lib.debugging import getLogger, configure, configureFromEnvironment, dprint, DISABLED
+
+#=======================================================================================
+# Tests
+#=======================================================================================
+
+class LoggerTest(unittest.TestCase):
+	
+	def setUp(self):
+		self.output = io.StringIO()
+		configure(level="warning", modules={}, output=self.output)
+	
+	def tearDown(self):
+		configure(level=debugging.DEFAULT_LEVEL, modules={}, output="-")
+	
+	def logInMethod(self, log):
+		log.debug("Debug", 1)
+	
+	def test_disabledLevels(self):
+		log = getLogger("tests.disabled")
+		self.assertIs(log.debug, DISABLED)
+		self.assertFalse(log.debug)
+		log.debug("Not logged")
+		dprint("Not logged either")
+		self.assertEqual(self.output.getvalue(), "")
+		self.assertTrue(log.warning)
+	
+	def test_context(self):
+		log = getLogger("tests.context")
+		configure(level="debug")
+		self.logInMethod(log)
+		self.assertRegex(self.output.getvalue(),\
+			r"^\[DEBUG:lib_debugging\.py:\d+:LoggerTest\.logInMethod\] Debug 1\n$")
+	
+	def test_moduleLevels(self):
+		configure(modules={"tests.modules": "trace", "tests.modules.quiet": "off"})
+		self.assertTrue(getLogger("tests.modules.loud").trace)
+		self.assertFalse(getLogger("tests.modules.quiet").error)
+		self.assertFalse(getLogger("tests.other").info)
+		self.assertEqual(debugging._settings.minimumLevel, debugging.LEVELS["trace"])
+	
+	def test_dprintOfEnabledModule(self):
+		configure(modules={__name__: "debug"})
+		dprint("Logged")
+		self.assertIn("] Logged", self.output.getvalue())
+	
+	def test_standardError(self):
+		stdout, stderr = io.StringIO(), io.StringIO()
+		configure(level="debug", output="-")
+		with redirect_stdout(stdout), redirect_stderr(stderr):
+			getLogger("tests.stderr").debug("Logged")
+		self.assertEqual(stdout.getvalue(), "")
+		self.assertIn("] Logged", stderr.getvalue())
+	
+	def test_configureFromEnvironment(self):
+		configureFromEnvironment({debugging.LEVEL_VARIABLE: "error, tests.environment=info"})
+		self.assertFalse(getLogger("tests.other").warning)
+		self.assertTrue(getLogger("tests.environment").info)
+		self.assertRaises(ValueError, configure, level="loud")
+	
+	def test_configureFromEnvironmentNotStrict(self):
+		environment = {debugging.LEVEL_VARIABLE: "loud,tests.lenient=info,tests.other=louder",\
+			debugging.FILE_VARIABLE: os.path.join(tempfile.gettempdir(), "missing", "debug.log")}
+		self.assertRaises(ValueError, configureFromEnvironment, environment)
+		stderr = io.StringIO()
+		with redirect_stderr(stderr):
+			configureFromEnvironment(environment, strict=False)
+		self.assertIn("'loud'", stderr.getvalue())
+		self.assertIn("'louder'", stderr.getvalue())
+		self.assertTrue(getLogger("tests.lenient").info)
+		self.assertEqual(debugging._settings.level, debugging.LEVELS["warning"])
+	
+	def test_outputFileClosed(self):
+		with tempfile.TemporaryDirectory() as directory:
+			configure(output=os.path.join(directory, "first.log"))
+			first = debugging._settings.output
+			configure(output=os.path.join(directory, "second.log"))
+			self.assertTrue(first.closed)
+			second = debugging._settings.output
+			configure(output=self.output)
+			self.assertTrue(second.closed)
+			self.assertFalse(self.output.closed)
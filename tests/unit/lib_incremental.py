@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+#-*- coding: utf-8 -*-
+
+#=======================================================================================
+# Imports
+#=======================================================================================
+
+# Python
+import unittest
+
+# Local
+from lib.incremental import IncrementalConverter, BlockMap, commonPrefixLength, commonSuffixLength
+from lib.pmwiki2md import AllConversions, SpanContent
+
+#=======================================================================================
+# Tests
+#=======================================================================================
+
+class IncrementalConverterTest(unittest.TestCase):
+	
+	PAGE = "!! Title\n\n''first'' paragraph\n\n[@\ncode\n\n''kept''\n@]\n\n* item\n* '''item'''\n\n||!a||b||\n\nlast '^up^'"
+	
+	def setUp(self):
+		self.pipeline = AllConversions().compile()
+		self.converter = IncrementalConverter(self.pipeline)
+	
+	def whole(self, source):
+		return self.pipeline.convert(SpanContent(source)).string
+	
+	def test_commonLengths(self):
+		self.assertEqual(commonPrefixLength("abcx"*3000, "abcx"*2000+"abcy"), 4*2000+3)
+		self.assertEqual(commonPrefixLength("ab", "ab"), 2)
+		self.assertEqual(commonSuffixLength("x"+"ab"*3000, "y"+"ab"*3000, 6001), 6000)
+		self.assertEqual(commonSuffixLength("aab", "ab", 1), 1)
+	
+	def test_convert(self):
+		conversion = self.converter.convert(self.__class__.PAGE)
+		self.assertEqual(conversion.output, self.whole(self.__class__.PAGE))
+		self.assertEqual(conversion.blockMap.sourceEnds[-1], len(self.__class__.PAGE))
+		self.assertEqual(len(conversion.blockMap.sourceEnds), conversion.reconverted)
+		self.assertEqual(conversion.reconverted, 6)
+	
+	def test_reconvert(self):
+		page = self.__class__.PAGE
+		edits = [\
+			page.replace("first", "1st"),\
+			page.replace("''kept''", "'''kept"),\
+			page.replace("@]\n\n* item", "\n* item"),\
+			page.replace("* item\n", "* item\n\n[@\n"),\
+			page+"\n\nappended",\
+			"prepended\n\n"+page,\
+			page.replace("'^up^'", "'^up"),\
+			"",\
+		]
+		for edited in edits:
+			previous = self.converter.convert(page)
+			conversion = self.converter.reconvert(page, previous.output, previous.blockMap, edited)
+			self.assertEqual(conversion.output, self.whole(edited))
+			self.assertEqual(conversion.blockMap, self.converter.convert(edited).blockMap)
+		previous = self.converter.convert(page)
+		self.assertEqual(self.converter.reconvert(page, previous.output, previous.blockMap,\
+			page.replace("first", "1st")).reconverted, 1)
+		self.assertEqual(self.converter.reconvert(page, previous.output, previous.blockMap, page).reconverted, 0)
+		self.assertRaises(ValueError, self.converter.reconvert, page+"x", previous.output, previous.blockMap, page)
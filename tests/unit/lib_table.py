@@ -86,8 +86,22 @@ class TableTest(unittest.TestCase):
 		
 		from lib.table import MdTable, TableTheme
 		
-		#shouldLookLike = "A1 | A2\nB1 | B2"
-		shouldLookLike = "A | B\n--- | ---\nA1 | A2\nB1 | B2"
+		shouldLookLike = "| 1   | 2   |\n| --- | --- |\n| A1  | A2  |\n| B1  | B2  |"
 		renderResult = MdTable(self.basicTestTable).render(TableTheme())
 		self.assertEqual(renderResult, shouldLookLike)
 		
+	
+	def test_PmwikiTableFromCode(self):
+		from lib.table import PmwikiTable, Cell
+		table = PmwikiTable().fromCode("||class=wikitable\n||!A ||! B||\n|| a1 ||a2||ignored")
+		self.assertEqual([[cell.text for cell in row.cells] for row in table.rows], [["A", "B"], ["a1", "a2"]])
+		self.assertEqual([cell.isHeader for cell in table.rows[0].cells], [True, True])
+		self.assertEqual(table.rows[0].cells[0].align, Cell.ALIGN_LEFT)
+		self.assertEqual(table.rows[1].cells[0].align, Cell.ALIGN_CENTER)
+		self.assertIsNot(table.rows[0].cells, table.rows[1].cells)
+	
+	def test_MdTableRenderWidths(self):
+		from lib.table import PmwikiTable, MdTable, TableTheme
+		self.assertEqual(MdTable(PmwikiTable().fromCode("||!Name|| !Value||\n||a|b||1||2||")).render(TableTheme()),\
+			"| Name | Value |     |\n| ---- | ----: | --- |\n| a\\|b | 1     | 2   |")
+		self.assertEqual(MdTable(PmwikiTable().fromCode("||a||")).render(TableTheme()), "|     |\n| --- |\n| a   |")
@@ -140,6 +140,14 @@ class ConversionTests(unittest.TestCase):
 		shouldLookLike = ["", "\n      - ", "Cucumbers might be tomatoes."]
 		self.compareConverted(original, shouldLookLike, Conversion)
 		
+	def test_Pmwiki2MdMixedListConversion(self):
+		from lib.pmwiki2md import Conversions, AllConversions, Pmwiki2MdBulletListConversion, Pmwiki2MdNumberedListConversion
+		original = "\n*a\n*#b\n*#*c\n######d"
+		shouldLookLike = "\n  - a\n    1. b\n      - c\n"+"  "*6+"1. d"
+		conversions = Conversions(Pmwiki2MdBulletListConversion, Pmwiki2MdNumberedListConversion)
+		self.assertEqual(conversions.convert(Content(original)).string, shouldLookLike)
+		self.assertEqual(AllConversions().convert(Content(original)).string, shouldLookLike)
+	
 	def test_ConversionOfBeginEndDelimitedToSomething(self):
 		
 		from lib.pmwiki2md import ConversionOfBeginEndDelimitedToSomething
@@ -190,6 +198,185 @@ class ConversionTests(unittest.TestCase):
 		cdprint(Conversion().convert(original))
 		self.compareConverted(original, shouldLookLike, Conversion)
 		
+	def test_ElementByElementConversionLeavesOriginal(self):
+		from lib.pmwiki2md import Pmwiki2MdItalicConversion as Conversion, ContentElement
+		original = Content([ContentElement("''a''"), ContentElement("''b''", availableForConversion=False)])
+		converted = Conversion().convert(original)
+		self.assertEqual([element.content for element in original], ["''a''", "''b''"])
+		self.assertEqual([element.content for element in converted], ["", "_", "a", "_", "", "''b''"])
+		
+	def test_ContentReplaceElement(self):
+		from lib.pmwiki2md import ContentElement
+		a, b, c = ContentElement("a"), ContentElement("b"), ContentElement("c")
+		content = Content([a, b, c])
+		content.replaceElement(b, [ContentElement("x"), ContentElement("y")])
+		self.assertEqual(content.string, "axyc")
+		
+	def test_ContentStringCache(self):
+		from lib.pmwiki2md import ContentElement
+		content = Content([ContentElement("a\n"), ContentElement("b")])
+		self.assertEqual(content.string, "a\nb")
+		self.assertIs(content.lines, content.lines)
+		content.append(ContentElement("c"))
+		self.assertEqual(content.string, "a\nbc")
+		content.insert(0, ContentElement("x"))
+		self.assertEqual(content.lines, ["xa", "bc"])
+		content.pop()
+		self.assertEqual(content.string, "xa\nb")
+		
+	def test_ContentStringCacheNested(self):
+		from lib.pmwiki2md import ContentElement
+		nested = Content([ContentElement("b")])
+		content = Content([ContentElement("a"), nested])
+		self.assertEqual(content.string, "ab")
+		nested.append(ContentElement("c"))
+		self.assertEqual(content.string, "abc")
+		
+	def test_DelimiterElementShared(self):
+		from lib.pmwiki2md import DelimiterElement
+		delimiter = DelimiterElement.get("~~")
+		self.assertIs(delimiter, DelimiterElement.get("~~"))
+		self.assertFalse(delimiter.availableForConversion)
+		with self.assertRaises(AttributeError):
+			delimiter.content = "__"
+		self.assertEqual(delimiter.copyWithNewContent("__").content, "__")
+		
+	def test_SinglePassConversionsLongestMatch(self):
+		from lib.pmwiki2md import AllConversions
+		original = Content("Cucumbers '''''might''''' be [++tomatoes++].")
+		shouldLookLike = "Cucumbers **_might**_ be <sup>tomatoes</sup>."
+		self.assertEqual(AllConversions().convert(original).string, shouldLookLike)
+	
+	def test_SinglePassConversionsLinkName(self):
+		from lib.pmwiki2md import AllConversions
+		original = Content("%newwin%[[http://example.com | ''Example'']]%%")
+		shouldLookLike = "[_Example_](http://example.com)"
+		self.assertEqual(AllConversions().convert(original).string, shouldLookLike)
+	
+	def test_SinglePassConversionsPreFormatted(self):
+		from lib.pmwiki2md import AllConversions
+		original = Content("a\n*''b''\n[@\n''c''\n*d@]")
+		shouldLookLike = "a\n  - _b_\n```\n''c''\n*d```"
+		self.assertEqual(AllConversions().convert(original).string, shouldLookLike)
+	
+	def test_SinglePassConversionsSpanContent(self):
+		from lib.pmwiki2md import AllConversions, SpanContent, SpanElement
+		original = "Cucumbers ''might'' be [[http://example.com | '_tomatoes_']].\n*Or not."
+		converted = AllConversions().convert(SpanContent(original))
+		self.assertEqual(converted.string, AllConversions().convert(Content(original)).string)
+		spans = [element for element in converted if isinstance(element, SpanElement)]
+		self.assertEqual(spans[0].content, "Cucumbers ")
+		self.assertTrue(all(span.source is original for span in spans))
+		
+	def test_SinglePassConversionsChunks(self):
+		from lib.pmwiki2md import AllConversions
+		original = "''a'' [[x | ''y'']] '''''b'''''\n*** c\n!!d\n[@\nx''y\n@] [[unclosed\n''e''"
+		shouldLookLike = AllConversions().convert(Content(original)).string
+		for chunkSize in range(1, 8):
+			chunks = [original[i:i+chunkSize] for i in range(0, len(original), chunkSize)]
+			self.assertEqual("".join(AllConversions().convertChunks(chunks)), shouldLookLike)
+	
+	def test_SinglePassEngineChunksWaiting(self):
+		from lib.pmwiki2md import AllConversions, SinglePassEngine
+		for original in ["[@\n"+"''a'' b\n"*500, "||a||\n"*500+"''b''", "'^"+"a "*500+"\n''b''", "[@\n"+"a\n"*500+"@] ''b''"]:
+			engine = SinglePassEngine(AllConversions().data)
+			scans = []
+			scan = engine.scan
+			def countingScan(*args, **kwargs):
+				scans.append(args)
+				return scan(*args, **kwargs)
+			engine.scan = countingScan
+			chunks = [original[i:i+8] for i in range(0, len(original), 8)]
+			self.assertEqual("".join(engine.convertChunks(chunks)), AllConversions().convert(Content(original)).string)
+			# The token waiting for its end isn't scanned again with every chunk.
+			self.assertTrue(len(scans) < 10, len(scans))
+			
+	def test_ConversionProfile(self):
+		from lib.pmwiki2md import AllConversions, Conversions, ConversionProfile
+		original = "Cucumbers ''might'' be [[http://example.com | tomatoes]]."
+		for conversions in [AllConversions(), Conversions(*AllConversions().data)]:
+			profile = ConversionProfile()
+			converted = conversions.convert(Content(original), profile=profile)
+			self.assertEqual(converted.string, conversions.convert(Content(original)).string)
+			italic = profile.entries["Pmwiki2MdItalicConversion"]
+			self.assertTrue(italic["elementsSplit"] > 0)
+			self.assertTrue(italic["bytesDelta"] < 0)
+			self.assertEqual(profile.entries["Pmwiki2MdLinkConversion"]["elementsSplit"], 1)
+			total = ConversionProfile().merge(profile).merge(profile)
+			self.assertEqual(total.entries["Pmwiki2MdItalicConversion"]["calls"], italic["calls"]*2)
+	
+	def test_LineStartIndex(self):
+		from lib.pmwiki2md import LineStartIndex, ContentElement, DelimiterElement
+		content = Content([ContentElement("a\nb\n"), DelimiterElement.get("\n"), ContentElement("c"),\
+			DelimiterElement.get("x"), ContentElement("d\n")])
+		self.assertEqual(LineStartIndex(content).positions, [[0, 2], [], [0], [], []])
+	
+	def test_LineStartConversions(self):
+		from lib.pmwiki2md import AllConversions, Conversions
+		original = "!Title\n->a\n-->b\n>>frame<<\n''c''\n>><<\n*d\nx->y !z"
+		shouldLookLike = "# Title\n> a\n> > b\n\n_c_\n\n  - d\nx->y !z"
+		self.assertEqual(AllConversions().convert(Content(original)).string, shouldLookLike)
+		self.assertEqual(Conversions(*AllConversions().data).convert(Content(original)).string, shouldLookLike)
+		for chunkSize in range(1, 5):
+			chunks = [original[i:i+chunkSize] for i in range(0, len(original), chunkSize)]
+			self.assertEqual("".join(AllConversions().convertChunks(chunks)), shouldLookLike)
+	
+	def test_UnclosedDelimiters(self):
+		from lib.pmwiki2md import AllConversions, Conversions, Pmwiki2MdLinkConversion, Pmwiki2MdPreFormattedBlockConversion
+		original = "[[unclosed ''a''\n[[http://example.com]] [[x\n]] [@\n''b''"
+		shouldLookLike = "[[unclosed _a_\n<http://example.com> [[x\n]] [@\n_b_"
+		self.assertEqual(AllConversions().convert(Content(original)).string, shouldLookLike)
+		self.assertEqual(Pmwiki2MdLinkConversion().convert(Content(original)).string,\
+			"[[unclosed ''a''\n<http://example.com> [[x\n]] [@\n''b''")
+		for chunkSize in range(1, 5):
+			chunks = [original[i:i+chunkSize] for i in range(0, len(original), chunkSize)]
+			self.assertEqual("".join(AllConversions().convertChunks(chunks)), shouldLookLike)
+		class ToEnd(Pmwiki2MdPreFormattedBlockConversion):
+			UNCLOSED = Pmwiki2MdPreFormattedBlockConversion.UNCLOSED_TO_END
+		self.assertEqual(Conversions(ToEnd).convert(Content("a [@\nb")).string, "a ```\nb```")
+	
+	def test_ConversionPipeline(self):
+		from lib.pmwiki2md import AllConversions, Conversions, ConversionError, Pmwiki2MdLinkConversion, Pmwiki2MdImageUrlConversion
+		from concurrent.futures import ThreadPoolExecutor
+		pipeline = AllConversions().compile()
+		self.assertIs(pipeline, AllConversions().compile())
+		with self.assertRaises(AttributeError):
+			pipeline.engine = None
+		pages = ["!Page {n}\n* ''a'' [[http://example.com/{n} | '''b''']]\n".format(n=n) for n in range(0, 200)]
+		expected = [pipeline.convert(Content(page)).string for page in pages]
+		with ThreadPoolExecutor(max_workers=4) as executor:
+			converted = list(executor.map(lambda page: pipeline.convert(Content(page)).string, pages))
+		self.assertEqual(converted, expected)
+		with self.assertRaises(ConversionError):
+			Conversions(Pmwiki2MdLinkConversion, Pmwiki2MdImageUrlConversion).compile()
+	
+	def test_Pmwiki2MdTableConversion(self):
+		from lib.pmwiki2md import AllConversions, SpanContent
+		original = "Text\n||class=wikitable\n||!Name||!Link||\n||''a''||[[http://example.com | b]]||\nText"
+		shouldLookLike = "Text\n| Name | Link                    |\n| ---- | ----------------------- |\n"\
+			"| _a_  | [b](http://example.com) |\nText"
+		self.assertEqual(AllConversions().convert(SpanContent(original)).string, shouldLookLike)
+		self.assertEqual("".join(AllConversions().convertChunks(iter(original))), shouldLookLike)
+	
+	def test_convertMany(self):
+		from lib.pmwiki2md import AllConversions, SpanContent, ConversionProfile
+		from lib.benchmark import PmwikiPageGenerator
+		# Including pages ending in unclosed or line beginning tokens, which mustn't reach into the next.
+		pages = PmwikiPageGenerator(seed=1, pageSize=300, markupDensity=0.4).pages(50)+["", "[@", "''a", "!", "* x\n"]
+		self.assertEqual(AllConversions().convertMany(pages),\
+			[AllConversions().convert(SpanContent(page)).string for page in pages])
+		self.assertEqual(AllConversions().convertMany(iter(pages[:5]), profile=ConversionProfile()),\
+			AllConversions().convertMany(pages[:5]))
+	
+	def test_linkPartsParsedOnce(self):
+		from lib.pmwiki2md import Pmwiki2MdLinkConversion, ContentElement
+		Link = Pmwiki2MdLinkConversion.PARTITIONED_BEGIN_END_DELIMITED_ELEMENT_CLASS
+		link = Link(element=ContentElement("http://example.com | Example"))
+		self.assertIs(link.addressAndName, link.addressAndName)
+		self.assertEqual((link.address, link.name, link.isNameless), ("http://example.com", "Example", False))
+		link.element = ContentElement("http://example.com")
+		self.assertEqual((link.address, link.isNameless), ("http://example.com", True))
+	
 	def test_UrlValid(self):
 		from lib.pmwiki2md import Url
 		#NOTE: Libraries used in implementation might